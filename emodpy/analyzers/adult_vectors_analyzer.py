@@ -5,8 +5,6 @@ from typing import Any
 from idmtools.core.interfaces.iitem import IItem
 
 from idmtools.entities.ianalyzer import IAnalyzer as BaseAnalyzer
-import matplotlib as mpl
-mpl.use('Agg')
 
 
 class AdultVectorsAnalyzer(BaseAnalyzer):
@@ -27,6 +25,9 @@ class AdultVectorsAnalyzer(BaseAnalyzer):
         with open(os.path.join(output_dir, "adult_vectors.json"), "w") as fp:
             json.dump({str(s.uid): v for s, v in all_data.items()}, fp)
 
+        # matplotlib is only imported when plotting, it is slow to import
+        import matplotlib as mpl
+        mpl.use('Agg')
         import matplotlib.pyplot as plt
 
         fig = plt.figure()
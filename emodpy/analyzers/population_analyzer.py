@@ -4,9 +4,6 @@ from typing import Any
 
 from idmtools.core.interfaces.iitem import IItem
 from idmtools.entities.ianalyzer import IAnalyzer as BaseAnalyzer
-import matplotlib as mpl
-
-mpl.use('Agg')
 
 
 class PopulationAnalyzer(BaseAnalyzer):
@@ -29,6 +26,9 @@ class PopulationAnalyzer(BaseAnalyzer):
         with open(os.path.join(output_dir, "population.json"), "w") as fp:
             json.dump({str(s.uid): v for s, v in all_data.items()}, fp)
 
+        # matplotlib is only imported when plotting, it is slow to import
+        import matplotlib as mpl
+        mpl.use('Agg')
         import matplotlib.pyplot as plt
 
         fig = plt.figure()
@@ -1,6 +1,5 @@
 import os
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
@@ -97,6 +96,7 @@ class TimeseriesAnalyzer(IAnalyzer):
         channels = data.columns.levels[0]
         self.plot_by_channel(channels, plot_fn)
 
+        import matplotlib.pyplot as plt
         plt.legend()
         # plt.show()
         plt.savefig(os.path.join(output_dir, 'timeseries.png'))
@@ -3,6 +3,7 @@ import warnings
 from emodpy.campaign.common import CommonInterventionParameters
 from emodpy.utils import is_valid_key_value_pair
 from emodpy.utils.distributions import BaseDistribution
+from emodpy.utils.schema_index import get_class_with_defaults
 
 from emod_api import schema_to_class as s2c
 from emod_api import campaign as api_campaign
@@ -35,7 +36,7 @@ class _BaseIntervention:
                  intervention_type: InterventionType,
                  common_intervention_parameters: CommonInterventionParameters = None):
 
-        self._intervention = s2c.get_class_with_defaults(intervention_class_name, schema_json=campaign.get_schema())
+        self._intervention = get_class_with_defaults(intervention_class_name, schema_json=campaign.get_schema())
         self.intervention_class_name = intervention_class_name
         self.intervention_type = intervention_type
         if common_intervention_parameters is not None:
@@ -0,0 +1,214 @@
+"""
+A campaign held by an object instead of the module-global state of `emod_api.campaign`.
+
+The interventions, event coordinators, events and distributors of `emodpy.campaign` take "the campaign" as their
+first argument and only use the functions and attributes of the `emod_api.campaign` module on it. `CampaignContext`
+has the same functions and attributes, so it can be passed to all of them in place of the module, but each context
+has its own events, event lists and implicits. Campaigns built in different contexts do not affect each other, can
+be built concurrently (e.g. in threads), and `EMODTask.create_campaign_from_callback` does not need to copy the
+events out of the module and reset it afterwards.
+
+The schema and the built-in events come from `emodpy.utils.schema_index` and are shared, read-only, by all contexts
+of the same schema.
+
+Example::
+
+    from emodpy.campaign.campaign_context import CampaignContext
+    from emodpy.campaign.distributor import add_intervention_scheduled
+
+    campaign = CampaignContext(schema_path)
+    add_intervention_scheduled(campaign, intervention_list=[vaccine], start_day=2)
+    campaign.save("campaign.json")
+"""
+import json
+from pathlib import Path
+from typing import Union
+
+from emod_api import campaign as api_campaign
+
+from emodpy.utils.schema_index import INDIVIDUAL, NODE, COORDINATOR, load_schema_index
+
+
+class CampaignContext:
+    """
+    A campaign with the interface of the `emod_api.campaign` module.
+
+    Args:
+        schema_path: Path to the schema file. When None, `set_schema` must be called before the campaign is used.
+    """
+
+    # Same as the module-level flags of emod_api.campaign, kept for code that reads them
+    use_old_adhoc_handling = False
+    unsafe = False
+
+    def __init__(self, schema_path: Union[str, Path] = None):
+        self.schema_path = None
+        self._schema_json = None
+        self.campaign_dict = {"Events": [], "Use_Defaults": 1}
+        self.individual_events_listened = []
+        self.individual_events_broadcast = []
+        self.node_events_broadcast = []
+        self.node_events_listened = []
+        self.coordinator_events_broadcast = []
+        self.coordinator_events_listened = []
+        self.implicits = []
+        self.individual_builtin_events = []
+        self.node_builtin_events = []
+        self.coordinator_builtin_events = []
+        if schema_path is not None:
+            self.set_schema(schema_path)
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(schema_path={self.schema_path!r}, "
+                f"events={len(self.campaign_dict['Events'])})")
+
+    def reset(self) -> None:
+        """
+        Clear the events, the event lists and the implicits. Unlike `emod_api.campaign.reset`, the schema stays set
+        and the schema caches shared with other campaigns are not cleared.
+        """
+        self.campaign_dict["Events"].clear()
+        self.individual_events_listened.clear()
+        self.individual_events_broadcast.clear()
+        self.node_events_broadcast.clear()
+        self.node_events_listened.clear()
+        self.coordinator_events_broadcast.clear()
+        self.coordinator_events_listened.clear()
+        self.implicits.clear()
+
+    def set_schema(self, schema_path: Union[str, Path]) -> None:
+        """
+        Clear the campaign and set its schema and the built-in events of the schema.
+
+        Args:
+            schema_path: Path to the schema file.
+        """
+        self.reset()
+        schema_index = load_schema_index(schema_path)
+        self.schema_path = schema_path
+        self._schema_json = schema_index.schema_json
+        self.individual_builtin_events = schema_index.get_builtin_events(INDIVIDUAL)
+        self.node_builtin_events = schema_index.get_builtin_events(NODE)
+        self.coordinator_builtin_events = schema_index.get_builtin_events(COORDINATOR)
+
+    def get_schema(self) -> dict:
+        """
+        Return the schema of the campaign, or None if no schema is set.
+
+        The schema is shared with every CampaignContext and task through the schema cache, it must not be modified.
+        """
+        return self._schema_json
+
+    def add(self, event, note: str = None) -> None:
+        """
+        Finalize a campaign event and add it to the campaign.
+
+        Args:
+            event: A complete campaign event object, e.g. a ReadOnlyDict.
+            note: An optional note added to the event in the campaign.json.
+        """
+        event.finalize()
+        if note is not None:
+            event["Note"] = note
+        self.campaign_dict["Events"].append(event)
+
+    def save(self, filename: str = "campaign.json") -> str:
+        """
+        Write the campaign to a json file.
+
+        Args:
+            filename: Path of the file to write.
+
+        Returns:
+            filename
+        """
+        with open(filename, "w") as camp_file:
+            json.dump(self.campaign_dict, camp_file, sort_keys=True, indent=4)
+        return filename
+
+    def validate_custom_individual_events(self) -> list[str]:
+        """
+        Check that the individual events listened to are broadcast and return the custom individual events broadcast.
+
+        Raises:
+            ValueError: If an event is listened to but never broadcast.
+        """
+        return api_campaign._validate_custom_events(self.individual_events_listened, self.individual_events_broadcast,
+                                                    self.individual_builtin_events, "individual")
+
+    def validate_custom_node_events(self) -> list[str]:
+        """
+        Check that the node events listened to are broadcast and return the custom node events broadcast.
+
+        Raises:
+            ValueError: If an event is listened to but never broadcast.
+        """
+        return api_campaign._validate_custom_events(self.node_events_listened, self.node_events_broadcast,
+                                                    self.node_builtin_events, "node")
+
+    def validate_custom_coordinator_events(self) -> list[str]:
+        """
+        Check that the coordinator events listened to are broadcast and return the custom coordinator events
+        broadcast.
+
+        Raises:
+            ValueError: If an event is listened to but never broadcast.
+        """
+        return api_campaign._validate_custom_events(self.coordinator_events_listened,
+                                                    self.coordinator_events_broadcast,
+                                                    self.coordinator_builtin_events, "coordinator")
+
+    def get_recv_trigger(self, trigger: str, old: bool = False) -> str:
+        """
+        Register an individual event as listened to and return it. old is ignored.
+        """
+        self.individual_events_listened.append(_check_event(trigger))
+        return trigger
+
+    def get_send_trigger(self, trigger: str, old: bool = False) -> str:
+        """
+        Register an individual event as broadcast and return it. old is ignored.
+        """
+        self.individual_events_broadcast.append(_check_event(trigger))
+        return trigger
+
+    def set_listened_node_event(self, event: str) -> str:
+        """
+        Register a node event as listened to and return it.
+        """
+        self.node_events_listened.append(_check_event(event))
+        return event
+
+    def set_broadcast_node_event(self, event: str) -> str:
+        """
+        Register a node event as broadcast and return it.
+        """
+        self.node_events_broadcast.append(_check_event(event))
+        return event
+
+    def set_listened_coordinator_event(self, event: str) -> str:
+        """
+        Register a coordinator event as listened to and return it.
+        """
+        self.coordinator_events_listened.append(_check_event(event))
+        return event
+
+    def set_broadcast_coordinator_event(self, event: str) -> str:
+        """
+        Register a coordinator event as broadcast and return it.
+        """
+        self.coordinator_events_broadcast.append(_check_event(event))
+        return event
+
+
+def _check_event(event: str) -> str:
+    if not event:
+        raise ValueError("Event name must not be None or empty.")
+    return event
+
+
+def is_campaign(campaign) -> bool:
+    """
+    Return True if campaign is the `emod_api.campaign` module or a `CampaignContext`.
+    """
+    return isinstance(campaign, CampaignContext) or getattr(campaign, '__name__', None) == 'emod_api.campaign'
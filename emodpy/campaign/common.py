@@ -2,6 +2,7 @@ from emod_api import schema_to_class as s2c
 
 from emodpy.utils import validate_key_value_pair
 from emodpy.utils.emod_constants import MAX_AGE_YEARS
+from emodpy.utils.schema_index import get_class_with_defaults
 from typing import List, Union
 from enum import Enum
 import warnings
@@ -532,7 +533,7 @@ class ValueMap:
         """
         A function that converts the ValueMap object to a schema dictionary.
         """
-        value_map = s2c.get_class_with_defaults("idmType:InterpolatedValueMap", schema_json=campaign.get_schema())
+        value_map = get_class_with_defaults("idmType:InterpolatedValueMap", schema_json=campaign.get_schema())
         value_map.Times = self._times
         value_map.Values = self._values
         value_map.pop('schema', None)
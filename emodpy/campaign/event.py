@@ -4,6 +4,7 @@ from emod_api import campaign as api_campaign, schema_to_class as s2c
 
 from emodpy.campaign.event_coordinator import BaseEventCoordinator
 from emodpy.utils import validate_value_range
+from emodpy.utils.schema_index import get_class_with_defaults, get_schema_index
 
 
 class BaseEvent:
@@ -52,14 +53,14 @@ class BaseEvent:
         Returns:
             s2c.ReadOnlyDict: The CampaignEvent or CampaignEventByYear event.
         """
-        self._event = s2c.get_class_with_defaults(self.event_class_name, schema_json=campaign.get_schema())
+        self._event = get_class_with_defaults(self.event_class_name, schema_json=campaign.get_schema())
         self._event.Event_Coordinator_Config = self.coordinator.to_schema_dict()
 
         if self.node_ids:
-            node_conf = s2c.get_class_with_defaults("NodeSetNodeList", schema_json=campaign.get_schema())
+            node_conf = get_class_with_defaults("NodeSetNodeList", schema_json=campaign.get_schema())
             node_conf.Node_List = self.node_ids
         else:
-            node_conf = s2c.get_class_with_defaults("NodeSetAll", schema_json=campaign.get_schema())
+            node_conf = get_class_with_defaults("NodeSetAll", schema_json=campaign.get_schema())
         self._event.Nodeset_Config = node_conf
 
         if self.event_name:
@@ -128,12 +129,7 @@ class CampaignEventByYear(BaseEvent):
         Returns:
             bool: True if the year is supported, otherwise False.
         """
-        try:
-            event = s2c.get_class_with_defaults(self.event_class_name, schema_json=campaign.get_schema())
-        except ValueError:
-            return False
-
-        return hasattr(event, 'Start_Year')
+        return get_schema_index(campaign.get_schema()).class_has_parameter(self.event_class_name, 'Start_Year')
 
 
 class CampaignEvent(BaseEvent):
@@ -10,6 +10,7 @@ from emodpy.campaign.utils import get_trigger_conditions
 from emodpy.utils import validate_value_range
 from emodpy.utils.distributions import BaseDistribution
 from emodpy.utils.emod_enum import ThresholdType, EventType
+from emodpy.utils.schema_index import get_class_with_defaults
 from emodpy.utils.targeting_config import AbstractTargetingConfig
 
 
@@ -28,7 +29,7 @@ class BaseEventCoordinator:
             event_coordinator_class_name (str):
                 - The name of the event coordinator class to be used. This should match the schema.
         """
-        self._coordinator = s2c.get_class_with_defaults(event_coordinator_class_name, schema_json=campaign.get_schema())
+        self._coordinator = get_class_with_defaults(event_coordinator_class_name, schema_json=campaign.get_schema())
 
     def to_schema_dict(self) -> s2c.ReadOnlyDict:
         """
@@ -173,7 +174,7 @@ class NodeIdAndCoverage:
         self._coverage = float(validate_value_range(coverage, 'coverage', min_value=0, max_value=1, param_type=float))
 
     def to_schema_dict(self, campaign: api_campaign) -> s2c.ReadOnlyDict:
-        obj = s2c.get_class_with_defaults("idmType:NodeIdAndCoverage", schema_json=campaign.get_schema())
+        obj = get_class_with_defaults("idmType:NodeIdAndCoverage", schema_json=campaign.get_schema())
         obj.Node_Id = self._node_id
         obj.Coverage = self._coverage
         obj.pop("schema", None)
@@ -460,7 +461,7 @@ class Action:
         self._event_type = event_type
 
     def to_schema_dict(self, campaign: api_campaign) -> s2c.ReadOnlyDict:
-        obj = s2c.get_class_with_defaults("idmType:Action", schema_json=campaign.get_schema())
+        obj = get_class_with_defaults("idmType:Action", schema_json=campaign.get_schema())
         obj.Threshold = self._threshold
         if self._event_type == EventType.INDIVIDUAL:
             obj.Event_To_Broadcast = campaign.get_send_trigger(self._event_to_broadcast, old=True)
@@ -530,7 +531,7 @@ class Responder:
         self._threshold_type = threshold_type
 
     def to_schema_dict(self, campaign: api_campaign) -> s2c.ReadOnlyDict:
-        obj = s2c.get_class_with_defaults("idmType:Responder", schema_json=campaign.get_schema())
+        obj = get_class_with_defaults("idmType:Responder", schema_json=campaign.get_schema())
         obj.Threshold_Type = self._threshold_type
         obj.Action_List = [a.to_schema_dict(campaign) for a in self._action_list]
         obj.pop("schema", None)
@@ -593,7 +594,7 @@ class IncidenceCounter:
         self._targeting_config = targeting_config
 
     def to_schema_dict(self, campaign: api_campaign) -> s2c.ReadOnlyDict:
-        obj = s2c.get_class_with_defaults("idmType:IncidenceCounter", schema_json=campaign.get_schema())
+        obj = get_class_with_defaults("idmType:IncidenceCounter", schema_json=campaign.get_schema())
         obj.Trigger_Condition_List = get_trigger_conditions(campaign, self._trigger_condition_list)
         obj.Count_Events_For_Num_Timesteps = self._count_events_for_num_timesteps
         if self._target_demographics_config is not None:
@@ -767,7 +768,7 @@ class IncidenceCounterSurveillance(IncidenceCounter):
         # self._counter_type = counter_type
 
     def to_schema_dict(self, campaign: api_campaign) -> s2c.ReadOnlyDict:
-        obj = s2c.get_class_with_defaults(
+        obj = get_class_with_defaults(
             "idmType:IncidenceCounterSurveillance", schema_json=campaign.get_schema())
         if self._counter_event_type == EventType.INDIVIDUAL:
             obj.Trigger_Condition_List = get_trigger_conditions(campaign, self._trigger_condition_list)
@@ -869,7 +870,7 @@ class ResponderSurveillance(Responder):
         self._counter_event_type = counter_event_type
 
     def to_schema_dict(self, campaign: api_campaign) -> s2c.ReadOnlyDict:
-        obj = s2c.get_class_with_defaults(
+        obj = get_class_with_defaults(
             "idmType:ResponderSurveillance", schema_json=campaign.get_schema())
         obj.Threshold_Type = self._threshold_type
         obj.Action_List = [a.to_schema_dict(campaign) for a in self._action_list]
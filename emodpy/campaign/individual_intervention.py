@@ -5,6 +5,7 @@ from emodpy.campaign.utils import set_event
 from emodpy.campaign.waning_config import AbstractWaningConfig
 from emodpy.utils.emod_enum import NodeSelectionType, VaccineType, EventOrConfig
 from emodpy.utils.distributions import BaseDistribution
+from emodpy.utils.schema_index import get_class_with_defaults
 
 from emod_api import campaign as api_campaign
 from emod_api import schema_to_class as s2c
@@ -381,7 +382,7 @@ class IVCalendar(IndividualIntervention):
             """
             A function that converts the AgeAndProbability object to a schema dictionary.
             """
-            aap = s2c.get_class_with_defaults("idmType:AgeAndProbability", schema_json=campaign.get_schema())
+            aap = get_class_with_defaults("idmType:AgeAndProbability", schema_json=campaign.get_schema())
             aap.Age = self.age_days
             aap.Probability = self.probability
             aap.finalize()
@@ -9,6 +9,7 @@ from emod_api.demographics.mortality_distribution import MortalityDistribution
 from emod_api.demographics.susceptibility_distribution import SusceptibilityDistribution
 
 from emodpy.demographics.demographics import Demographics
+from emodpy.demographics.node_table import NodeTable
 
 # __all_exports: A list of classes that are intended to be exported from this module.
 __all_exports = [
@@ -22,7 +23,8 @@ __all_exports = [
     FertilityDistribution,
     MortalityDistribution,
     SusceptibilityDistribution,
-    Demographics
+    Demographics,
+    NodeTable
 ]
 
 # The following loop sets the __module__ attribute of each class in __all_exports to the name of the current module.
@@ -1,15 +1,27 @@
 from functools import partial
+import hashlib
+from itertools import islice
+import json
 import logging
+import os
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Iterable, Iterator, List, Optional, TextIO, Union
 
+import numpy as np
+from emod_api.demographics.demographic_exceptions import InvalidNodeIdException
 from emod_api.demographics.demographics import Demographics as EMODAPIDemographics
 from emod_api.demographics.node import Node
 
+from emodpy.demographics.node_table import NodeTable
 from emodpy.utils.emod_enum import MigrationType, MigrationPattern, InterpolationType
 
 logger = logging.getLogger(__name__)
 
+# Number of hex digits of the hash in the names of the cached migration files
+_CACHE_KEY_LENGTH = 16
+# Number of nodes encoded at once by to_file
+_NODES_PER_WRITE = 1000
+
 
 def _set_migration_config(config, migration_type, filename, x_modifier,
                           migration_pattern,
@@ -50,11 +62,259 @@ def _set_migration_config(config, migration_type, filename, x_modifier,
     return config
 
 
+def _cached_migration_file(data, cache_dir: Path, stem: str, **write_args) -> Path:
+    """Return the path of the migration file of data in cache_dir, writing it only if it is not there yet.
+
+    The file name ends with a hash of the data and of the to_migration_file arguments, so the files written for
+    identical data are identical, down to their DateCreated.
+    """
+    key = hashlib.sha256(json.dumps([data.content_hash(), sorted((name, str(value)) for name, value in
+                                                                 write_args.items())]).encode()).hexdigest()
+    path = (cache_dir / f"{stem}_{key[:_CACHE_KEY_LENGTH]}.bin").absolute()
+    metafile = path.parent / (path.name + ".json")
+    if path.is_file() and metafile.is_file():
+        logger.debug(f"Reusing migration file {path}.")
+        return path
+
+    # Written under temporary names then renamed, so that other processes sharing cache_dir never see partial files
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    temporary = path.parent / f"{path.stem}.{os.getpid()}.tmp"
+    data.to_migration_file(temporary, **write_args)
+    os.replace(temporary.parent / (temporary.name + ".json"), metafile)
+    os.replace(temporary, path)
+    return path
+
+
+def _round_floats(value, float_precision: int):
+    """Return value with its floats, in nested dicts and lists too, rounded to float_precision significant digits."""
+    if isinstance(value, float):
+        return float(f"{value:.{float_precision}g}")
+    if isinstance(value, dict):
+        return {key: _round_floats(item, float_precision) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round_floats(item, float_precision) for item in value]
+    return value
+
+
+def _write_json(output: TextIO, header: dict, nodes: Optional[Iterable[dict]], indent: Optional[int] = 4,
+                separators: Optional[tuple] = None, float_precision: Optional[int] = None) -> None:
+    """Write the json of a demographics file, streaming its Nodes.
+
+    The text is the same as ``json.dump(demographics_dict, output, indent=indent, separators=separators,
+    sort_keys=True)`` with ``demographics_dict`` the header with the nodes as its "Nodes" list, but only one node
+    is encoded at a time.
+
+    Args:
+        output: text file to write to
+        header: the demographics json without its Nodes
+        nodes: the json of each node, or None if the header has the Nodes
+        indent: number of spaces per nesting level, None for one line
+        separators: (item separator, key separator), by default those of json.dump
+        float_precision: number of significant digits of the floats, None to write them exactly
+    """
+    if separators is None:
+        separators = (",", ": ") if indent is not None else (", ", ": ")
+    item_separator, key_separator = separators
+    encoder = json.JSONEncoder(indent=indent, separators=separators, sort_keys=True)
+
+    def newline(depth: int) -> str:
+        return "" if indent is None else "\n" + " " * (indent * depth)
+
+    def encode(value, depth: int) -> str:
+        if float_precision is not None:
+            value = _round_floats(value, float_precision)
+        # The lines of a nested value are indented by its depth, json strings have no raw newlines
+        return encoder.encode(value).replace("\n", newline(depth))
+
+    if nodes is None:
+        output.write(encode(header, 0))
+        return
+
+    output.write("{")
+    keys = sorted(list(header) + ["Nodes"])
+    for i, key in enumerate(keys):
+        output.write((item_separator if i else "") + newline(1) + json.dumps(key) + key_separator)
+        if key != "Nodes":
+            output.write(encode(header[key], 1))
+            continue
+        # The nodes are encoded in batches, as a list without its brackets, per-call overhead dominates otherwise
+        output.write("[")
+        nodes = iter(nodes)
+        written = False
+        batch = list(islice(nodes, _NODES_PER_WRITE))
+        while batch:
+            text = encode(batch, 1)
+            output.write((item_separator if written else "") + text[1:len(text) - 1 - len(newline(1))])
+            written = True
+            batch = list(islice(nodes, _NODES_PER_WRITE))
+        output.write((newline(1) if written else "") + "]")
+    output.write(newline(0) + "}")
+
+
 class Demographics(EMODAPIDemographics):
 
     def __init__(self, nodes: List[Node], default_node: Node = None, idref: str = None, set_defaults: bool = True):
+        self._node_table = None
         super().__init__(nodes=nodes, default_node=default_node, idref=idref, set_defaults=set_defaults)
 
+    @classmethod
+    def from_arrays(cls, node_ids, lats, lons, pops, names=None, areas=None, attributes: Optional[dict] = None,
+                    default_node: Node = None, idref: str = None) -> "Demographics":
+        """
+        Create a Demographics object from one array (or sequence) per node field, without creating Node objects.
+
+        The nodes are kept as a NodeTable, available with ``node_table``. Node objects are created the first time
+        ``nodes`` is used, they then replace the table. Writing the demographics file does not keep them.
+
+        Args:
+            node_ids: node IDs, > 0 and unique
+            lats: latitudes in degrees
+            lons: longitudes in degrees
+            pops: initial populations
+            names: optional unique node names, None for a node without name
+            areas: optional node areas
+            attributes: optional dict of other NodeAttributes columns by attribute name, see NodeTable.ATTRIBUTES
+            default_node: (Node, optional) Represents default values for all nodes
+            idref: (str, optional) Identifier of the node set
+
+        Returns:
+            a Demographics object
+
+        Example:
+            >>> demographics = Demographics.from_arrays(node_ids=np.arange(1, 100_001), lats=lats, lons=lons,
+            ...                                         pops=pops, attributes={"birth_rate": birth_rates})
+        """
+        table = NodeTable(ids=node_ids, lats=lats, lons=lons, pops=pops, names=names, areas=areas,
+                          attributes=attributes)
+        return cls._from_node_table(table, default_node=default_node, idref=idref)
+
+    @classmethod
+    def from_dataframe(cls, dataframe, default_node: Node = None, idref: str = None) -> "Demographics":
+        """
+        Create a Demographics object from a pandas DataFrame with one row per node, like ``from_arrays``.
+
+        Args:
+            dataframe: DataFrame with the columns ``id``, ``lat``, ``lon`` and ``pop``, and optionally ``name``,
+                ``area`` and any of NodeTable.ATTRIBUTES
+            default_node: (Node, optional) Represents default values for all nodes
+            idref: (str, optional) Identifier of the node set
+
+        Returns:
+            a Demographics object
+        """
+        return cls._from_node_table(NodeTable.from_dataframe(dataframe), default_node=default_node, idref=idref)
+
+    @classmethod
+    def _from_node_table(cls, table: NodeTable, default_node: Node, idref: str) -> "Demographics":
+        if len(table) and table.ids.min() <= 0:
+            raise InvalidNodeIdException(f"Non-default nodes must have integer ids > 0 . Found id: "
+                                         f"{table.ids.min()}")
+        demographics = cls(nodes=[], default_node=default_node, idref=idref)
+        demographics._nodes = None
+        demographics._node_table = table
+        demographics.verify_demographics_integrity()
+        return demographics
+
+    @property
+    def nodes(self) -> List[Node]:
+        if self._nodes is None:
+            # From now on the Node objects are the data, they may be modified
+            self._nodes = self._node_table.to_nodes()
+            self._node_table = None
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, value: List[Node]):
+        self._nodes = value
+        self._node_table = None
+
+    @property
+    def node_table(self) -> NodeTable:
+        """
+        The IDs, latitudes, longitudes, populations and other columns of the nodes, as arrays.
+
+        For a Demographics created from Node objects, the table is built from the nodes on each call and changing the
+        nodes does not change it.
+        """
+        if self._node_table is not None:
+            return self._node_table
+        return NodeTable.from_nodes(self._nodes)
+
+    @property
+    def node_ids(self) -> List[int]:
+        """
+        Return the list of (geographic) node ids.
+        """
+        if self._node_table is not None:
+            return self._node_table.ids.tolist()
+        return super().node_ids
+
+    def verify_demographics_integrity(self):
+        if self._node_table is None:
+            super().verify_demographics_integrity()
+            return
+        table = self._node_table
+        ids, counts = np.unique(np.append(table.ids, self.default_node.id), return_counts=True)
+        if np.any(counts > 1):
+            raise self.DuplicateNodeIdException(f"Duplicate node ids detected: "
+                                                f"{', '.join(str(item) for item in ids[counts > 1].tolist())}")
+        if table.names is not None:
+            names = [name for name in table.names.tolist() + [self.default_node.name] if name is not None]
+            duplicates = self._duplicates_check(items=names)
+            if duplicates:
+                raise self.DuplicateNodeNameException(f"Duplicate node names detected: "
+                                                      f"{', '.join(str(item) for item in duplicates)}")
+
+    def _iter_nodes(self) -> Iterator[Node]:
+        # The Node objects of a node table are only created for their json and not kept
+        return iter(self._nodes) if self._node_table is None else self._node_table.iter_nodes()
+
+    def _header_dict(self) -> dict:
+        """Return the json of the demographics without its Nodes."""
+        self.verify_demographics_integrity()
+        demographics_dict = {
+            'Defaults': self.default_node.to_dict(),
+            'Metadata': self.metadata
+        }
+        demographics_dict["Metadata"]["NodeCount"] = len(self._nodes if self._node_table is None else self._node_table)
+        if self.node_properties:
+            demographics_dict["NodeProperties"] = self.node_properties.to_dict()
+        return demographics_dict
+
+    def to_dict(self) -> dict:
+        demographics_dict = self._header_dict()
+        demographics_dict['Nodes'] = [node.to_dict() for node in self._iter_nodes()]
+        return demographics_dict
+
+    def to_file(self, path: Union[str, Path] = "demographics.json", indent: Optional[int] = 4, compact: bool = False,
+                float_precision: Optional[int] = None) -> None:
+        """
+        Write the Demographics object to an EMOD demographics json file.
+
+        The file is written one node at a time, so the json of all the nodes is never held in memory at once. It
+        parses to the same json as ``to_dict()``.
+
+        Args:
+            path: (str) the filepath to write the file to. Default is "demographics.json".
+            indent: (int, optional) The number of spaces to indent for nested JSON elements (Default is 4, None means
+                no nesting (one line printing)).
+            compact: (bool, optional) Separate items with ',' and keys from values with ':', without spaces. With
+                indent=None the file has no whitespace at all. Default is False.
+            float_precision: (int, optional) Number of significant digits of the floats written, for smaller files.
+                Default is None, floats are written exactly.
+        Returns:
+            Nothing
+        """
+        if float_precision is not None and float_precision < 1:
+            raise ValueError(f"float_precision must be at least 1, got {float_precision}.")
+        separators = (",", ":") if compact else None
+        if type(self).to_dict is not Demographics.to_dict:
+            # A subclass changing the json is written from its to_dict, in one piece
+            header, nodes = self.to_dict(), None
+        else:
+            header, nodes = self._header_dict(), (node.to_dict() for node in self._iter_nodes())
+        with open(path, "w") as output:
+            _write_json(output, header, nodes, indent=indent, separators=separators, float_precision=float_precision)
     # Forces emodpy-layer Demographics instantiation to use Node object-route for default node . Cannot use
     # the old self.raw dict representation of a default node.
 
@@ -74,7 +334,8 @@ class Demographics(EMODAPIDemographics):
                       roundtrip_probability: Optional[float] = None,
                       roundtrip_waypoints: Optional[int] = None,
                       filename: Optional[str] = None,
-                      user_notes: Optional[str] = None):
+                      user_notes: Optional[str] = None,
+                      cache_dir: Optional[Union[str, Path]] = None):
         """Assign migration data to a migration type, write the file, and set config params.
 
         Args:
@@ -97,6 +358,10 @@ class Demographics(EMODAPIDemographics):
                 assumptions, etc. We encourage you to record why this file was created so
                 the context is preserved for future reference. Stored in the JSON metadata
                 sidecar as USER_NOTES.
+            cache_dir: if provided, the file is written to this directory, named after filename and a hash of the
+                data, the migration_type, interpolation_type and user_notes. A file already written there with the same
+                hash is reused instead of being written again, so identical migration files built for several
+                simulations are one shared asset. Default None, the file is written to filename.
         """
         if not isinstance(migration_type, MigrationType):
             try:
@@ -126,11 +391,10 @@ class Demographics(EMODAPIDemographics):
                 raise ValueError("roundtrip_waypoints is only valid "
                                  "with migration_pattern=WAYPOINTS_HOME.")
 
-        valid_ids = {n.id for n in self.nodes if n.id != 0}
-        data_ids = set(data.node_ids)
-        unknown = data_ids - valid_ids
-        if unknown:
-            raise ValueError(f"Migration data contains node IDs not in demographics: {sorted(unknown)}")
+        valid_ids = np.asarray(self.node_ids, dtype=np.int64)
+        unknown = np.setdiff1d(np.asarray(data.node_ids, dtype=np.int64), valid_ids[valid_ids != 0])
+        if len(unknown):
+            raise ValueError(f"Migration data contains node IDs not in demographics: {unknown.tolist()}")
 
         if data.idref != self.idref:
             logger.warning(f"MigrationData idref '{data.idref}' does not match demographics "
@@ -139,10 +403,13 @@ class Demographics(EMODAPIDemographics):
 
         if filename is None:
             filename = f"{str(migration_type).lower()}_migration.bin"
-        path = Path(filename).absolute()
-
-        data.to_migration_file(path, migration_type=migration_type, interpolation_type=interpolation_type,
-                               user_notes=user_notes)
+        if cache_dir is None:
+            path = Path(filename).absolute()
+            data.to_migration_file(path, migration_type=migration_type, interpolation_type=interpolation_type,
+                                   user_notes=user_notes)
+        else:
+            path = _cached_migration_file(data, Path(cache_dir), Path(filename).stem, migration_type=migration_type,
+                                          interpolation_type=interpolation_type, user_notes=user_notes)
         self.migration_files.append(path)
 
         bin_filename = path.name
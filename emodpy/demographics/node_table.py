@@ -0,0 +1,149 @@
+"""Columnar storage of the nodes of a Demographics.
+
+A ``NodeTable`` holds one array per node field (ID, latitude, longitude, population, name, area and a few scalar
+NodeAttributes) instead of one ``Node`` object per node. A Demographics built with ``Demographics.from_arrays`` or
+``Demographics.from_dataframe`` keeps its nodes in a NodeTable and builds ``Node`` objects only when they are needed.
+"""
+import math
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from emod_api.demographics.node import Node
+from emod_api.demographics.properties_and_attributes import NodeAttributes
+
+
+def _python_values(column: np.ndarray) -> list:
+    """Return the values of a column as Python objects, None for the missing (None or NaN) values."""
+    return [None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+            for value in column.tolist()]
+
+
+def _read_only(column) -> np.ndarray:
+    column = np.array(column)
+    column.flags.writeable = False
+    return column
+
+
+class NodeTable:
+    """
+    Columns of the nodes of a Demographics, entry i of every column being node i.
+
+    The columns are read-only arrays. Missing values of the optional columns are None, or NaN for numbers.
+
+    Args:
+        ids: node IDs
+        lats: latitudes in degrees
+        lons: longitudes in degrees
+        pops: initial populations
+        names: optional node names
+        areas: optional node areas
+        attributes: optional dict of other NodeAttributes columns, by attribute name. The supported attributes are
+            listed in ``NodeTable.ATTRIBUTES``.
+    """
+
+    # Scalar NodeAttributes, besides those with their own column
+    ATTRIBUTES = ("altitude", "birth_rate", "country", "growth_rate", "infectivity_multiplier")
+    # Columns of the DataFrames read by from_dataframe
+    COLUMNS = ("id", "lat", "lon", "pop", "name", "area")
+
+    __slots__ = ("ids", "lats", "lons", "pops", "names", "areas", "attributes")
+
+    def __init__(self, ids: Sequence[int], lats: Sequence[float], lons: Sequence[float], pops: Sequence[float],
+                 names: Optional[Sequence[str]] = None, areas: Optional[Sequence[float]] = None,
+                 attributes: Optional[Dict[str, Sequence]] = None):
+        self.ids = _read_only(np.asarray(ids))
+        if self.ids.ndim != 1 or (len(self.ids) and not np.issubdtype(self.ids.dtype, np.integer)):
+            raise ValueError("ids must be a 1D sequence of integers.")
+        self.ids = _read_only(self.ids.astype(np.int64))
+        self.lats = _read_only(np.asarray(lats, dtype=np.float64))
+        self.lons = _read_only(np.asarray(lons, dtype=np.float64))
+        self.pops = _read_only(pops)
+        self.names = None if names is None else _read_only(np.asarray(names, dtype=object))
+        self.areas = None if areas is None else _read_only(areas)
+        attributes = attributes or {}
+        unknown = sorted(set(attributes) - set(self.ATTRIBUTES))
+        if unknown:
+            raise ValueError(f"Unknown node attributes {unknown}. Valid options: {list(self.ATTRIBUTES)}")
+        self.attributes = {name: _read_only(column) for name, column in attributes.items()}
+
+        columns = {"lats": self.lats, "lons": self.lons, "pops": self.pops, "names": self.names, "areas": self.areas}
+        columns.update(self.attributes)
+        for name, column in columns.items():
+            if column is not None and column.shape != self.ids.shape:
+                raise ValueError(f"{name} has shape {column.shape}, expected {self.ids.shape} like the ids.")
+
+    @classmethod
+    def from_nodes(cls, nodes: List[Node]) -> "NodeTable":
+        """Return the columns of a list of nodes. The attribute columns are those set on at least one node."""
+        names = [node.name for node in nodes]
+        areas = [node.node_attributes.area for node in nodes]
+        attributes = {}
+        for name in cls.ATTRIBUTES:
+            column = [getattr(node.node_attributes, name) for node in nodes]
+            if any(value is not None for value in column):
+                attributes[name] = column
+        return cls(ids=np.array([node.id for node in nodes], dtype=np.int64),
+                   lats=[node.lat for node in nodes],
+                   lons=[node.lon for node in nodes],
+                   pops=[node.pop for node in nodes],
+                   names=names if any(name is not None for name in names) else None,
+                   areas=areas if any(area is not None for area in areas) else None,
+                   attributes=attributes)
+
+    @classmethod
+    def from_dataframe(cls, dataframe) -> "NodeTable":
+        """
+        Return the columns of a pandas DataFrame.
+
+        The DataFrame has the columns ``id``, ``lat``, ``lon`` and ``pop``, and optionally ``name``, ``area`` and any
+        of ``NodeTable.ATTRIBUTES``.
+        """
+        columns = set(dataframe.columns)
+        missing = [column for column in cls.COLUMNS[:4] if column not in columns]
+        if missing:
+            raise ValueError(f"The DataFrame has no column {missing}.")
+        unknown = sorted(columns - set(cls.COLUMNS) - set(cls.ATTRIBUTES), key=str)
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}. Valid options: {list(cls.COLUMNS + cls.ATTRIBUTES)}")
+        return cls(ids=dataframe["id"].to_numpy(),
+                   lats=dataframe["lat"].to_numpy(),
+                   lons=dataframe["lon"].to_numpy(),
+                   pops=dataframe["pop"].to_numpy(),
+                   names=dataframe["name"].to_numpy() if "name" in columns else None,
+                   areas=dataframe["area"].to_numpy() if "area" in columns else None,
+                   attributes={name: dataframe[name].to_numpy() for name in cls.ATTRIBUTES if name in columns})
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays, without the objects referenced by the object arrays."""
+        columns = [self.ids, self.lats, self.lons, self.pops, self.names, self.areas, *self.attributes.values()]
+        return sum(column.nbytes for column in columns if column is not None)
+
+    def take(self, rows: Sequence[int]) -> "NodeTable":
+        """Return a new table of the given entries, in the given order."""
+        return NodeTable(ids=self.ids[rows], lats=self.lats[rows], lons=self.lons[rows], pops=self.pops[rows],
+                         names=None if self.names is None else self.names[rows],
+                         areas=None if self.areas is None else self.areas[rows],
+                         attributes={name: column[rows] for name, column in self.attributes.items()})
+
+    def iter_nodes(self) -> Iterator[Node]:
+        """Yield a new Node for each entry of the table, in order."""
+        count = len(self)
+        names = [None] * count if self.names is None else _python_values(self.names)
+        areas = [None] * count if self.areas is None else _python_values(self.areas)
+        attributes = {name: _python_values(column) for name, column in self.attributes.items()}
+        for i, (node_id, lat, lon, pop) in enumerate(zip(self.ids.tolist(), self.lats.tolist(), self.lons.tolist(),
+                                                         self.pops.tolist())):
+            node_attributes = None
+            if attributes:
+                node_attributes = NodeAttributes(**{name: column[i] for name, column in attributes.items()})
+            yield Node(lat=lat, lon=lon, pop=pop, name=names[i], area=areas[i], forced_id=node_id,
+                       node_attributes=node_attributes)
+
+    def to_nodes(self) -> List[Node]:
+        """Return a new Node for each entry of the table, in order."""
+        return list(self.iter_nodes())
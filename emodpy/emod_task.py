@@ -3,10 +3,10 @@ import json
 import os
 import sys
 import tempfile
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from functools import partial
 from logging import getLogger, DEBUG
-from typing import Union, Optional, Any, Dict, List, Type, Callable
+from typing import Union, Optional, Any, Dict, Iterator, List, Type, Callable
 import pathlib
 from pathlib import Path
 import warnings
@@ -14,18 +14,29 @@ import warnings
 from idmtools import IdmConfigParser
 from idmtools.assets import Asset
 from idmtools.assets import AssetCollection
+from idmtools.core.interfaces.entity_container import EntityContainer
 from idmtools.entities.command_line import CommandLine
+from idmtools.entities.experiment import Experiment
 from idmtools.entities.itask import ITask
 from idmtools.entities.iworkflow_item import IWorkflowItem
 from idmtools.entities.simulation import Simulation
+from idmtools.entities.templated_simulation import TemplatedSimulations
 from idmtools.registry.task_specification import TaskSpecification
 from idmtools.utils.json import load_json_file
 from idmtools.entities.iplatform import IPlatform
 
-from emodpy.demographics.demographics import Demographics
 from emodpy.emod_file import ClimateFiles, DemographicsFiles, MigrationFiles
+from emodpy.campaign.campaign_context import CampaignContext, is_campaign
 from emodpy.campaign.emod_campaign import EMODCampaign
 from emodpy.reporters.base import Reporters
+from emodpy.utils.asset_deduplication import AssetDeduplicationReport, TransientAssetStore
+from emodpy.utils.build_cache import BuildCache
+from emodpy.utils.config_template import ConfigTemplate
+from emodpy.utils.copy_on_write import (COPY_ON_WRITE, COPY_ON_WRITE_FIELDS, DEEP_COPY, CopyTimer, DeferredCopy,
+                                        SimulationCopyReport, deepcopy_sharing_schema, set_config_parameters,
+                                        share_schema_nodes)
+from emodpy.utils.schema_cache import load_schema_entry
+from emodpy.utils.schema_index import INDIVIDUAL, NODE, COORDINATOR, SchemaIndex, load_schema_index
 
 import datetime
 import random
@@ -40,6 +51,33 @@ logger = getLogger(__name__)
 dev_mode = False
 
 
+def _default_config_json_from_schema(schema_json: dict) -> str:
+    """
+    Serialize the default config for a schema, the same way dfs.get_default_config_from_schema() builds it.
+    """
+    default_config = {"parameters": {"schema": {}}}
+    for group in schema_json["config"]:
+        dfs._set_defaults_for_schema_group(default_config["parameters"], schema_json["config"][group], schema_json)
+    return json.dumps(default_config)
+
+
+def _default_config_schema(schema_path: Union[str, Path]) -> ReadOnlyDict:
+    """
+    Return the "schema" node of the default config of a schema, parsed once and shared (read-only) by the tasks
+    restored from the build cache.
+    """
+    entry = load_schema_entry(schema_path)
+
+    def parse(schema_json):
+        default_config_text = entry.derived("default_config_json", _default_config_json_from_schema)
+        return json.loads(default_config_text, object_hook=ReadOnlyDict)["parameters"]["schema"]
+    return entry.derived("default_config_schema", parse)
+
+
+def _finalize_config(config: ReadOnlyDict) -> None:
+    config.parameters.finalize()
+
+
 @dataclass
 class EMODTask(ITask):
     """
@@ -98,6 +136,24 @@ class EMODTask(ITask):
         sif_filename (str): Filename of the Singularity image (.sif) used on COMPS to create the
             execution environment.
         sif_path: Filesystem path to the Singularity image, used on SLURM/File/Process platforms.
+        copy_on_write (bool): When True, `copy_simulation` shares the config, campaign, reporters and input file
+            lists with the base simulation and copies each of them the first time the new task accesses it. The
+            base task copies the fields it shares the next time it accesses them, so changing it does not change the
+            simulations copied before. Objects taken from these fields before copying must not be modified after.
+        copy_report (SimulationCopyReport): Set on tasks made by `copy_simulation`; time and memory spent copying.
+        use_config_template (bool): When True, the config is finalized and serialized once, when the experiment
+            gathers the common assets or on the first `copy_simulation`, and `gather_transient_assets` renders the
+            config.json of each simulation copied from this task by splicing the changed parameters into it, see
+            `emodpy.utils.config_template`. The config.json is the same.
+        config_template (ConfigTemplate): The template shared by the simulations copied with `use_config_template`.
+        deduplicate_transient_assets (bool): When True, the simulations copied from this task share one
+            `TransientAssetStore` and hold each distinct transient asset (campaign.json, custom_reports.json, ...)
+            once, see `emodpy.utils.asset_deduplication`. `promote_shared_transient_assets` also moves the assets
+            identical in all simulations to the common assets.
+        asset_store (TransientAssetStore): The store shared by the simulations copied with
+            `deduplicate_transient_assets`. ``asset_store.report()`` summarizes the bytes saved.
+        prepared_transient_assets (list): Transient assets rendered ahead of time by `prepare_experiment_simulations`
+            or `emodpy.utils.parallel_preparation.prepare_simulations`, used by the next `gather_transient_assets`.
     """
     eradication_path: str = field(default=None, compare=False, metadata={"md": True})
     demographics: DemographicsFiles = field(default_factory=lambda: DemographicsFiles(''))
@@ -115,7 +171,15 @@ class EMODTask(ITask):
     is_linux: bool = False
     implicit_configs: list = field(default_factory=lambda: [])
     sif_filename: str = None
+    copy_on_write: bool = field(default=False, compare=False)
+    use_config_template: bool = field(default=False, compare=False)
+    deduplicate_transient_assets: bool = field(default=False, compare=False)
     sif_path = None
+    copy_report = None
+    config_template = None
+    asset_store = None
+    prepared_transient_assets = None
+    _transient_assets_promoted = False
 
     def __post_init__(self):
         """Initialize derived state after dataclass field assignment.
@@ -137,7 +201,106 @@ class EMODTask(ITask):
                 self.eradication_path = eradication_path
                 self.executable_name = os.path.basename(self.eradication_path)
 
-    def create_campaign_from_callback(self, builder: Callable, verbose: bool = False, bootstrapped: bool = False) -> None:
+    def __getattr__(self, name: str) -> Any:
+        # Only called when the attribute is not set: copy a field still shared by copy-on-write on first access
+        deferred = self.__dict__.get("_deferred_copies")
+        if deferred is None or name not in deferred:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+        return self._materialize_field(name)
+
+    def __repr__(self) -> str:
+        # The dataclass __repr__, showing the fields copy-on-write still defers without copying them
+        deferred = self.__dict__.get("_deferred_copies") or {}
+        values = ", ".join(f"{f.name}={deferred[f.name] if f.name in deferred else getattr(self, f.name)!r}"
+                           for f in fields(self) if f.repr)
+        return f"{self.__class__.__qualname__}({values})"
+
+    def __eq__(self, other: Any) -> bool:
+        # The dataclass __eq__, without copying the fields both tasks still share
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        deferred = self.__dict__.get("_deferred_copies") or {}
+        other_deferred = other.__dict__.get("_deferred_copies") or {}
+        for f in fields(self):
+            if not f.compare or (f.name in deferred and deferred[f.name] is other_deferred.get(f.name)):
+                continue
+            if getattr(self, f.name) != getattr(other, f.name):
+                return False
+        return True
+
+    def _materialize_field(self, name: str) -> Any:
+        """
+        Copy field name, which copy-on-write still defers, set the copy on the task and return it.
+        """
+        deferred_copy = self._deferred_copies.pop(name)
+        with CopyTimer() as timer:
+            value = deferred_copy.materialize()
+        self.__dict__[name] = value
+        report = self.__dict__.get("copy_report")
+        if report is not None and deferred_copy.copies:
+            report.shared_fields.discard(name)
+            report.materialized_seconds[name] = timer.seconds
+            if timer.bytes is not None:
+                report.materialized_bytes[name] = timer.bytes
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        deferred = self.__dict__.get("_deferred_copies")
+        if deferred and name in deferred:
+            # Replaced before it was ever copied, the shared value is not needed anymore
+            del deferred[name]
+            report = self.__dict__.get("copy_report")
+            if report is not None:
+                report.shared_fields.discard(name)
+        super().__setattr__(name, value)
+
+    def _read_field(self, name: str) -> Any:
+        """
+        Return field name for reading. While copy-on-write still defers the field, this is the object it shares, which
+        must not be modified, and reading it must not depend on the pending steps of the DeferredCopy.
+        """
+        deferred = self.__dict__.get("_deferred_copies")
+        if deferred and name in deferred:
+            return deferred[name].shared
+        return getattr(self, name)
+
+    def _share_field(self, name: str) -> DeferredCopy:
+        """
+        Return the DeferredCopy a copy of this task shares field name through. A field the task holds is frozen
+        first: the task defers it too and copies it the next time it accesses it, so that changing the task does not
+        change its copies.
+        """
+        deferred = self.__dict__.setdefault("_deferred_copies", {})
+        if name in self.__dict__:
+            deferred[name] = DeferredCopy(self.__dict__.pop(name))
+        # A field still shared is shared again, pending steps on a field the task owns are copied
+        return copy.deepcopy(deferred[name])
+
+    def _update_field(self, name: str, update: Callable[[Any], Any], defer: bool = False) -> None:
+        """
+        Call update with field name, or, while copy-on-write still defers the field, when it is copied. With defer,
+        the update of a field that is not deferred waits until the field is next accessed too.
+        """
+        deferred = self.__dict__.get("_deferred_copies")
+        if deferred and name in deferred:
+            deferred[name] = DeferredCopy(deferred[name], update=update)
+        elif defer:
+            deferred = self.__dict__.setdefault("_deferred_copies", {})
+            deferred[name] = DeferredCopy(self.__dict__.pop(name), update=update, copy=False)
+        else:
+            update(getattr(self, name))
+
+    def __deepcopy__(self, memo):
+        # The schema nodes of the config are read-only, copies share them
+        config = self._read_field("config") if "_deferred_copies" in self.__dict__ else self.__dict__.get("config")
+        if config:
+            share_schema_nodes(config, memo)
+        result = super().__deepcopy__(memo)
+        result.__dict__.pop("_transient_assets_promoted", None)  # a copy is prepared again
+        return result
+
+    def create_campaign_from_callback(self, builder: Callable, verbose: bool = False, bootstrapped: bool = False,
+                                      campaign_context: bool = False) -> None:
         """
         This function is responsible for generating and configuring a campaign using a provided
         builder function. It also handles the custom events that are generated by the campaign by
@@ -170,6 +333,10 @@ class EMODTask(ITask):
             verbose: If True, prints debug information about the generated file.
             bootstrapped: Set to True if the campaign builder will build a campaign from scratch itself. False if it
                 will accept an initialized campaign from this function instead and then modify it. Default False.
+            campaign_context: Set to True to pass the builder a new `CampaignContext` instead of the
+                `emod_api.campaign` module. The campaign is then not shared with other campaigns being built and does
+                not need to be copied and reset. A bootstrapped builder may return a `CampaignContext` either way.
+                Default False.
 
         Returns:
             None
@@ -179,22 +346,28 @@ class EMODTask(ITask):
 
         if bootstrapped:
             campaign = builder()
+        elif campaign_context:
+            campaign = builder(CampaignContext(schema_path=self.schema_path))
         else:
             default_campaign = self.build_default_campaign(schema_path=self.schema_path)
             campaign = builder(default_campaign)
 
-        if getattr(campaign, '__name__', None) != 'emod_api.campaign':
-            # verify the campaign is an emod_api.campaign module
+        if not is_campaign(campaign):
+            # verify the campaign is an emod_api.campaign module or a CampaignContext
             raise ValueError("Something went wrong with campaign_builder, "
                              "please make sure that the campaign_builder function returns the campaign module.")
 
         if "implicits" in dir(campaign) and campaign.implicits:
             self.implicit_configs.extend(campaign.implicits)
 
-        # TODO: this is very bad. This is necessary due to the fact that emod-api campaigns are modules with
-        # global module scope, NOT objects! They must be serialize/deserialized to prevent different campaigns
-        # from mucking with each other.
-        campaign_dict = json.loads(json.dumps(campaign.campaign_dict))
+        if isinstance(campaign, CampaignContext):
+            # The context belongs to this campaign only, its events can be taken as they are
+            campaign_dict = dict(campaign.campaign_dict, Events=list(campaign.campaign_dict["Events"]))
+        else:
+            # TODO: this is very bad. This is necessary due to the fact that emod-api campaigns are modules with
+            # global module scope, NOT objects! They must be serialize/deserialized to prevent different campaigns
+            # from mucking with each other.
+            campaign_dict = json.loads(json.dumps(campaign.campaign_dict))
         self.campaign = EMODCampaign.load_from_dict(campaign_dict)
         if dev_mode:
             campaign.save()
@@ -213,7 +386,8 @@ class EMODTask(ITask):
             campaign.validate_custom_node_events()
 
         # This might be a great place to reset the campaign module so users don't have to.
-        campaign.reset()
+        if not isinstance(campaign, CampaignContext):
+            campaign.reset()
 
     def create_demographics_from_callback(self, builder: Callable,
                                           from_sweep: bool = False,
@@ -250,6 +424,9 @@ class EMODTask(ITask):
         if verbose:
             print(f"Generating demographics file {demog_path}.")
 
+        # Imported here, it pulls in emod_api.demographics and its geospatial dependencies
+        from emodpy.demographics.demographics import Demographics
+
         # Generate and save the demographics file.
         demographics = builder()
         if not demographics or not isinstance(demographics, Demographics):
@@ -300,20 +477,20 @@ class EMODTask(ITask):
 
         has_custom_events = "Custom_Individual_Events" in self.config.parameters
 
-        builtin = self.reporters.get_builtin_events()
+        schema_index = self.reporters.get_schema_index()
 
         checks = [
-            ("individual", self.reporters.listening_individual_events,
+            (INDIVIDUAL, self.reporters.listening_individual_events,
              "Custom_Individual_Events"),
-            ("node", self.reporters.listening_node_events,
+            (NODE, self.reporters.listening_node_events,
              "Custom_Node_Events"),
-            ("coordinator", self.reporters.listening_coordinator_events,
+            (COORDINATOR, self.reporters.listening_coordinator_events,
              "Custom_Coordinator_Events"),
         ]
         for level, listening_events, config_key in checks:
             if not listening_events:
                 continue
-            builtin_set = set(builtin.get(level, []))
+            builtin_set = schema_index.builtin_event_set(level)
             if has_custom_events:
                 custom_set = set(getattr(self.config.parameters, config_key, []))
             else:
@@ -337,7 +514,11 @@ class EMODTask(ITask):
         Returns:
             ReadOnlyDict: The default config based on the schema.
         """
-        default_config = dfs.get_default_config_from_schema(path_to_schema=schema_path, as_rod=True)
+        # The schema is parsed and the plain default config serialized once per schema (see
+        # emodpy.utils.schema_cache); every call still gets its own fresh ReadOnlyDict.
+        entry = load_schema_entry(schema_path)
+        default_config_text = entry.derived("default_config_json", _default_config_json_from_schema)
+        default_config = json.loads(default_config_text, object_hook=ReadOnlyDict)
         # needed by emodpy_hiv.country_model.build_config
         default_config["schema_path"] = schema_path
         return default_config
@@ -353,7 +534,18 @@ class EMODTask(ITask):
         Returns:
             Fresh initialized campaign module with schema_path set
         """
-        api_campaign.set_schema(schema_path_in=schema_path)
+        # Equivalent to api_campaign.set_schema(), but the schema and its built-in events come from the
+        # process-wide schema cache instead of being re-read from disk. emod_api has no entry point taking a parsed
+        # schema. Like set_schema(), the module gets a schema of its own: builders may modify what get_schema()
+        # returns, the cached schema is shared by every task.
+        schema_entry = load_schema_entry(schema_path)
+        schema_index = schema_entry.derived("schema_index", SchemaIndex)
+        api_campaign.reset()
+        api_campaign.schema_path = schema_path
+        api_campaign._schema_json = schema_entry.copy_schema()
+        api_campaign.individual_builtin_events.extend(schema_index.get_builtin_events(INDIVIDUAL))
+        api_campaign.node_builtin_events.extend(schema_index.get_builtin_events(NODE))
+        api_campaign.coordinator_builtin_events.extend(schema_index.get_builtin_events(COORDINATOR))
         return api_campaign
 
     @classmethod
@@ -366,7 +558,9 @@ class EMODTask(ITask):
                       report_builder: Callable[[Reporters], Reporters] = None,
                       embedded_python_scripts_path: Union[str, Path, List[Union[str, Path]]] = None,
                       serialized_population_files: Union[str, List[str]] = None,
-                      bootstrapped: bool = False) -> "EMODTask":
+                      bootstrapped: bool = False,
+                      campaign_context: bool = False,
+                      build_cache: Union[BuildCache, str, Path] = None) -> "EMODTask":
         """
         Create a task from emod-api defaults and functions to update them.
 
@@ -455,10 +649,34 @@ class EMODTask(ITask):
                 experiment.
             bootstrapped: Set to True if the campaign builder will build a campaign from scratch itself. False if it
                 will accept an initialized campaign from this function instead and then modify it. Default False.
+            campaign_context: Set to True to pass campaign_builder a new
+                `emodpy.campaign.campaign_context.CampaignContext` instead of the `emod_api.campaign` module, so tasks
+                can be built concurrently. Default False.
+            build_cache: A `emodpy.utils.build_cache.BuildCache`, or the path of its directory. When set, a task
+                built before from the same schema, builder functions and arguments is restored from the cache
+                without running the builders, and a new build is stored in it. Default None, no cache.
 
         Returns:
             EMODTask
         """
+        cache_key = None
+        if build_cache is not None:
+            if not isinstance(build_cache, BuildCache):
+                build_cache = BuildCache(build_cache)
+            cache_key = build_cache.make_key(
+                schema_path=schema_path,
+                builders={"config_builder": config_builder, "campaign_builder": campaign_builder,
+                          "demographics_builder": demographics_builder, "report_builder": report_builder},
+                arguments={"class": cls, "eradication_path": eradication_path, "bootstrapped": bootstrapped,
+                           "campaign_context": campaign_context},
+                files={"embedded_python_scripts_path": embedded_python_scripts_path,
+                       "serialized_population_files": serialized_population_files})
+            if cache_key is not None:
+                task = build_cache.load(cache_key, schema_path,
+                                        shared_objects={"config_schema": _default_config_schema(schema_path)})
+                if task is not None:
+                    return task
+
         task = cls(eradication_path=eradication_path, schema_path=schema_path)
         # We do not regenerate the schema from the Eradication binary because we can't guarantee this code is running
         # on a matching platform, so we use a schema file.
@@ -471,11 +689,16 @@ class EMODTask(ITask):
                              "the config_builder function returns a config object.")
 
         # Let's do the demographics building here...
+        generated_assets = []
         if demographics_builder:
+            existing_assets = {id(asset) for asset in task.common_assets.assets + task.transient_assets.assets}
             task.create_demographics_from_callback(demographics_builder)
+            generated_assets = [asset for asset in task.common_assets.assets + task.transient_assets.assets
+                                if id(asset) not in existing_assets]
 
         if campaign_builder:
-            task.create_campaign_from_callback(builder=campaign_builder, bootstrapped=bootstrapped)
+            task.create_campaign_from_callback(builder=campaign_builder, bootstrapped=bootstrapped,
+                                               campaign_context=campaign_context)
 
         if embedded_python_scripts_path:
             task.add_embedded_python_scripts_from_path(path=embedded_python_scripts_path)
@@ -493,6 +716,11 @@ class EMODTask(ITask):
 
         task.handle_implicit_configs()
 
+        if cache_key is not None:
+            schema_node = task.config.get("parameters", {}).get("schema")
+            build_cache.store(cache_key, task, schema_path,
+                              shared_objects={"config_schema": schema_node} if schema_node else None,
+                              generated_assets=generated_assets)
         return task
 
     @classmethod
@@ -570,44 +798,74 @@ class EMODTask(ITask):
 
     def pre_creation(self, parent: Union[Simulation, IWorkflowItem], platform: 'IPlatform'):
         """
-        Call before a task is executed. This ensures our configuration is properly done
+        Call before a task is executed. This ensures our configuration is properly done. Once
+        `promote_shared_transient_assets` prepared the simulation, calls do nothing.
+
+        """
+        if self._transient_assets_promoted:
+            return
+        self._prepare_inputs()
+
+        # Gather the custom coordinator, individual, and node events
+        self.set_command_line()
+        super().pre_creation(parent, platform)
+        if not platform.is_windows_platform():
+            # print( "Target is LINUX!" )
+            self.is_linux = True
 
+    def _prepare_inputs(self) -> None:
+        """
+        The part of pre_creation() the transient assets depend on.
         """
         # Set the demographics
         # self.demographics.set_task_config(self)
         # self.simulation_demographics.set_task_config(self, extend=True)
 
         # Set the migrations
-        self.simulation_migrations.merge_with(self.migrations)
+        deferred = self.__dict__.get("_deferred_copies") or {}
+        if "simulation_migrations" in deferred and "migrations" in deferred:
+            # Merged when simulation_migrations is copied
+            deferred["simulation_migrations"] = DeferredCopy(deferred["simulation_migrations"],
+                                                             merge=("merge_with", deferred["migrations"]))
+        else:
+            self.simulation_migrations.merge_with(self.migrations)
         # self.simulation_migrations.set_task_config(self)
 
         # Set the climate
         # self.climate.set_task_config(self)
 
+        parameters = self._reporter_and_campaign_parameters()
+        if "config" in deferred:
+            # Set when the config is copied, _render_config_template() renders them without copying it
+            deferred["config"] = DeferredCopy(deferred["config"], parameters=parameters)
+        else:
+            set_config_parameters(parameters, self.config)
+
+    def _reporter_and_campaign_parameters(self) -> Dict[str, Any]:
+        """
+        Return the parameters of the config that point EMOD to the reporters and the campaign of this task.
+        """
+        parameters = {}
         # Set the reporters
         # this only runs for when using from_defaults,
         # because with "from_files" we bypass Reporters object creation
-        if self.reporters.builtin_reporters:
-            self.config.parameters.Custom_Reports_Filename = "custom_reports.json"
-        for reporter in self.reporters.config_reporters:
-            for i in reporter.parameters:
-                setattr(self.config.parameters, i, reporter.parameters[i])
+        reporters = self._read_field("reporters")
+        if reporters.builtin_reporters:
+            parameters["Custom_Reports_Filename"] = "custom_reports.json"
+        for reporter in reporters.config_reporters:
+            parameters.update(reporter.parameters)
 
         # Set the campaign filename
-        if self.campaign:
-            if type(self.config) is dict:  # when "from_files" was used
-                self.config["Campaign_Filename"] = "campaign.json"
-                self.config["Enable_Interventions"] = 1  # implicit?
-            else:    # when using from_defaults
-                self.config.parameters.Campaign_Filename = "campaign.json"
-                self.config.parameters.Enable_Interventions = 1  # implicit
+        if self._read_field("campaign"):
+            parameters["Campaign_Filename"] = "campaign.json"
+            parameters["Enable_Interventions"] = 1  # implicit
+        return parameters
 
-        # Gather the custom coordinator, individual, and node events
-        self.set_command_line()
-        super().pre_creation(parent, platform)
-        if not platform.is_windows_platform():
-            # print( "Target is LINUX!" )
-            self.is_linux = True
+    def _set_reporter_and_campaign_parameters(self, config: Union[dict, ReadOnlyDict]) -> None:
+        """
+        Set the parameters of config that point EMOD to the reporters and the campaign of this task.
+        """
+        set_config_parameters(self._reporter_and_campaign_parameters(), config)
 
     def set_command_line(self) -> None:
         """
@@ -742,6 +1000,12 @@ class EMODTask(ITask):
         if self.climate.assets:
             self.common_assets.extend(self.climate.gather_assets())
 
+        # The simulations of the experiment are copied from this task after this point and share these
+        if self.use_config_template:
+            self._get_config_template(self)
+        if self.deduplicate_transient_assets:
+            self._get_asset_store()
+
         return self.common_assets
 
     def _enforce_non_schema_coherence(self) -> None:
@@ -753,11 +1017,12 @@ class EMODTask(ITask):
         Returns:
             None
         """
-        if "Miminum_End_Time" in self.config:  # only present when we enable Enable_Termination_On_Zero_Total_Infectivity
-            if (self.config['Start_Time'] + self.config['Simulation_Duration']) < self.config['Minimum_End_Time']:
-                raise ValueError(f"{self.config['Start_Time']} + {self.config['Simulation_Duration']} "
+        config = self._read_field("config")
+        if "Miminum_End_Time" in config:  # only present when we enable Enable_Termination_On_Zero_Total_Infectivity
+            if (config['Start_Time'] + config['Simulation_Duration']) < config['Minimum_End_Time']:
+                raise ValueError(f"{config['Start_Time']} + {config['Simulation_Duration']} "
                                  f"(Start_Time + Simulation_Duration) < "
-                                 f"{self.config['Minimum_End_Time']} (Minimum_End_Time)")
+                                 f"{config['Minimum_End_Time']} (Minimum_End_Time)")
 
     def gather_transient_assets(self) -> AssetCollection:
         """
@@ -766,6 +1031,14 @@ class EMODTask(ITask):
             AssetCollection
         """
 
+        if self.prepared_transient_assets is not None:
+            # Rendered ahead of time, see emodpy.utils.parallel_preparation
+            self.transient_assets.add_assets(self.prepared_transient_assets, fail_on_duplicate=False)
+            self.prepared_transient_assets = None
+            if self.asset_store is not None:
+                self.asset_store.deduplicate(self.transient_assets)
+            return self.transient_assets
+
         # This config code needs to be rewritten
         # task.config contains emod-api version of config i.e., with schema. Needs to be finalized and written.
         if logger.isEnabledFor(DEBUG) and dev_mode:
@@ -773,20 +1046,31 @@ class EMODTask(ITask):
 
         # Add config and campaign to assets as needed
 
-        if self.config:
-            if type(self.config) is dict:  # old/basic style, when "from_files" is used
+        # Fields copy-on-write still defers are read without copying them
+        if self._read_field("config"):
+            content = None
+            if type(self._read_field("config")) is dict:  # old/basic style, when "from_files" is used
                 self.config = {"parameters": self.config}
             else:
-                self.config.parameters.finalize()
+                if self.config_template is not None:
+                    # The template holds the finalized base config, the config is finalized when it is next accessed
+                    content = self._render_config_template()
+                    if content is not None:
+                        self._update_field("config", _finalize_config, defer=True)
+                if content is None:
+                    self.config.parameters.finalize()
             self._enforce_non_schema_coherence()
+            if content is None:
+                content = json.dumps(self.config, sort_keys=True)
             if dev_mode:
                 with open(self.config_file_name, "w") as fp:
-                    json.dump(self.config, fp, sort_keys=True, indent=4)
-            asset = Asset(filename=self.config_file_name, content=json.dumps(self.config, sort_keys=True))
+                    json.dump(json.loads(content), fp, sort_keys=True, indent=4)
+            asset = Asset(filename=self.config_file_name, content=content)
             self.transient_assets.add_asset(asset=asset, fail_on_duplicate=False)
 
-        if self.campaign:
-            asset = Asset(filename="campaign.json", content=self.campaign.json)
+        campaign = self._read_field("campaign")
+        if campaign:
+            asset = Asset(filename="campaign.json", content=campaign.json)
             self.transient_assets.add_asset(asset=asset, fail_on_duplicate=False)
 
             if dev_mode:
@@ -801,24 +1085,51 @@ class EMODTask(ITask):
                     print(data[i].strip())
 
         # Add custom_reporters.json if needed
-        if self.reporters.builtin_reporters:
+        # Reporters.json finalizes the parameters of the reporters, it needs the copy
+        if self._read_field("reporters").builtin_reporters:
             asset = Asset(filename="custom_reports.json", content=self.reporters.json)
             self.transient_assets.add_asset(asset=asset, fail_on_duplicate=False)
 
-        # Add demographics files to assets
-        if self.simulation_demographics.assets:
+        # Add demographics files to assets, gathering them marks them as persisted
+        if self._read_field("simulation_demographics").assets:
             self.transient_assets.extend(self.simulation_demographics.gather_assets())
 
-        # Add the migrations
-        if self.simulation_migrations.assets:
+        # Add the migrations, merge_with() does not change the assets
+        if self._read_field("simulation_migrations").assets:
             self.transient_assets.extend(self.simulation_migrations.gather_assets())
 
+        # Share the assets whose content another simulation already has
+        if self.asset_store is not None:
+            self.asset_store.deduplicate(self.transient_assets)
+
         return self.transient_assets
 
+    def _render_config_template(self) -> Optional[str]:
+        """
+        Render config.json from the config template, or return None when the config cannot be rendered from it.
+        While copy-on-write still defers the config, the config it shares is rendered with the parameters pre_creation()
+        set on it, without copying it.
+        """
+        deferred = self.__dict__.get("_deferred_copies")
+        if deferred and "config" in deferred:
+            parameters = deferred["config"].pending_parameters
+            if parameters is not None:
+                return self.config_template.render(deferred["config"].shared, parameters)
+        return self.config_template.render(self.config)
+
     def copy_simulation(self, base_simulation: 'Simulation') -> 'Simulation':
         """
         Called when making copies of a simulation. We deep copy parts of the simulation to ensure we don't
-        accidentally share objects between simulations.
+        accidentally share objects between simulations. Read-only schema data is shared.
+
+        When `copy_on_write` is True, the config, campaign, reporters and input file lists are not copied here but
+        the first time the new task accesses them, see `emodpy.utils.copy_on_write`.
+
+        When `use_config_template` is True, the new task gets the `ConfigTemplate` of the base simulation's config,
+        which is built on the first copy.
+
+        The time (and, while tracemalloc is tracing, the memory) spent copying is recorded in
+        ``simulation.task.copy_report``.
 
         Args:
             base_simulation: Base Simulation
@@ -826,6 +1137,145 @@ class EMODTask(ITask):
         Returns:
             New Simulation
         """
+        with CopyTimer() as timer:
+            if self.copy_on_write:
+                simulation = self._copy_simulation_on_write(base_simulation)
+                report = SimulationCopyReport(mode=COPY_ON_WRITE,
+                                              shared_fields={name for name, deferred_copy in
+                                                             simulation.task._deferred_copies.items()
+                                                             if deferred_copy.copies})
+            else:
+                simulation = self._deep_copy_simulation(base_simulation)
+                report = SimulationCopyReport(mode=DEEP_COPY)
+        report.copy_seconds = timer.seconds
+        report.copy_bytes = timer.bytes
+        simulation.task.copy_report = report
+        if self.use_config_template:
+            simulation.task.config_template = self._get_config_template(base_simulation.task)
+        if self.deduplicate_transient_assets:
+            simulation.task.asset_store = self._get_asset_store()
+        return simulation
+
+    def _get_asset_store(self) -> TransientAssetStore:
+        if self.asset_store is None:
+            self.asset_store = TransientAssetStore()
+        return self.asset_store
+
+    def promote_shared_transient_assets(self, experiment: Experiment, platform: IPlatform) -> AssetDeduplicationReport:
+        """
+        Gather the transient assets of all simulations of an experiment now, and move the ones that are identical in
+        every simulation to the experiment's common assets. Call it on the base task of the experiment, after the
+        sweep is defined and before the experiment is run.
+
+        The config file always stays with the simulations. EMOD finds the promoted files (e.g. campaign.json,
+        custom_reports.json) in the Assets directory through the input path of the command line.
+
+        The simulations of a TemplatedSimulations are generated here, and the experiment holds them as a list
+        afterward.
+
+        Args:
+            experiment: The experiment, not created yet.
+            platform: The platform the experiment will run on.
+
+        Returns:
+            The summary of the transient assets, including the bytes saved.
+        """
+        self.deduplicate_transient_assets = True
+        store = self._get_asset_store()
+        simulations = list(self._iter_experiment_simulations(experiment))
+
+        for simulation in simulations:
+            simulation.task.asset_store = store
+            simulation.task.pre_creation(simulation, platform)
+            simulation.gather_assets()
+            # The platform calls pre_creation() again when the experiment is created
+            simulation.task._transient_assets_promoted = True
+
+        for asset in store.shared_assets(excluded=(self.config_file_name,)):
+            store.promote(asset)
+            experiment.assets.add_asset(asset, fail_on_duplicate=False)
+        for simulation in simulations:
+            for assets in (simulation.task.transient_assets, simulation.assets):
+                assets.assets = [asset for asset in assets.assets if not store.is_promoted(asset)]
+
+        report = store.report()
+        user_logger.info(f"Transient assets: {report}")
+        return report
+
+    def prepare_experiment_simulations(self, experiment: Experiment, max_workers: Optional[int] = None,
+                                       chunk_size: Optional[int] = None) -> List[Simulation]:
+        """
+        Render the transient assets of all simulations of an experiment in a pool of worker processes, instead of
+        one at a time while the experiment is created. Call it on the base task of the experiment, after the sweep
+        is defined and before the experiment is run. See `emodpy.utils.parallel_preparation`.
+
+        The simulations of a TemplatedSimulations are generated here, one chunk at a time as the pool renders
+        them, and the experiment holds them as a list afterward.
+
+        Args:
+            experiment: The experiment, not created yet.
+            max_workers: Number of worker processes. Defaults to the number of CPUs.
+            chunk_size: Number of simulations generated and sent to the pool at a time, to bound the memory used by
+                the task pickles and rendered assets in flight. Defaults to all of them.
+
+        Returns:
+            The simulations of the experiment, in order.
+        """
+        from emodpy.utils.parallel_preparation import prepare_simulations
+        simulations = self._iter_experiment_simulations(experiment)
+        return list(prepare_simulations(simulations, max_workers=max_workers, chunk_size=chunk_size, base_task=self))
+
+    def _iter_experiment_simulations(self, experiment: Experiment) -> Iterator[Simulation]:
+        """
+        Yield the simulations of experiment. A TemplatedSimulations is replaced by a list, to which the simulations
+        it generates are added as they are yielded, and the common assets it would have gathered are added to the
+        experiment. Consume the whole iterator, the experiment only holds the simulations yielded so far.
+
+        This relies on ``Experiment.gather_common_assets_from_task`` of idmtools: when it is True, the default,
+        Experiment.pre_creation() gathers the common assets of every task of a list of simulations and fails if
+        they differ, instead of using those of the template's base task. It is set to False, since the common assets
+        were gathered here.
+        """
+        templated = experiment.simulations.items
+        if not isinstance(templated, TemplatedSimulations):
+            yield from experiment.simulations
+            return
+
+        # Experiment.pre_creation() only gathers common assets from the template's base task
+        self.gather_common_assets()
+        experiment.assets.add_assets(self.common_assets, fail_on_duplicate=False)
+        for simulation in templated.extra_simulations():
+            experiment.assets.add_assets(simulation.task.gather_common_assets(), fail_on_duplicate=False)
+        task_class = templated.base_task.__class__
+        experiment.tags.setdefault("task_type", f'{task_class.__module__}.{task_class.__name__}')
+
+        generated = experiment.simulations
+        simulations = EntityContainer()
+        experiment.simulations = simulations
+        experiment.gather_common_assets_from_task = False
+        for simulation in generated:
+            simulations.append(simulation)
+            yield simulation
+
+    def _get_config_template(self, base_task: 'EMODTask') -> Optional[ConfigTemplate]:
+        """
+        Return the ConfigTemplate of the base task's config, building it the first time. Returns None when the
+        config has no schema (e.g. when "from_files" was used) or cannot be finalized.
+
+        The template is built from the config as pre_creation() leaves it, so that the parameters it sets in every
+        simulation do not count as changes.
+        """
+        if self.config_template is None and type(base_task._read_field("config")) is not dict:
+            try:
+                config = deepcopy_sharing_schema(base_task._read_field("config"))
+                base_task._set_reporter_and_campaign_parameters(config)
+                self.config_template = ConfigTemplate(config)
+            except ValueError as ex:
+                logger.debug(f"Not using a config template: {ex}")
+                self.use_config_template = False
+        return self.config_template
+
+    def _deep_copy_simulation(self, base_simulation: 'Simulation') -> 'Simulation':
         simulation = copy.deepcopy(base_simulation)
 
         # Copy the experiment demographics and set them as persisted to prevent change
@@ -850,6 +1300,38 @@ class EMODTask(ITask):
 
         return simulation
 
+    def _copy_simulation_on_write(self, base_simulation: 'Simulation') -> 'Simulation':
+        """
+        Same result as _deep_copy_simulation(), but the fields in COPY_ON_WRITE_FIELDS are left as DeferredCopy
+        objects that the task materializes on first access.
+        """
+        base_task = base_simulation.task
+        deferred = {name: base_task._share_field(name) for name in COPY_ON_WRITE_FIELDS}
+
+        # Same steps as in _deep_copy_simulation(), done when the field is materialized
+        deferred["demographics"] = DeferredCopy(deferred["demographics"],
+                                                merge=("extend", DeferredCopy(self._share_field("demographics"),
+                                                                              persisted=True)))
+        deferred["climate"] = DeferredCopy(self._share_field("climate"), persisted=True)
+        deferred["simulation_migrations"] = DeferredCopy(deferred["simulation_migrations"],
+                                                         merge=("merge_with",
+                                                                DeferredCopy(self._share_field("migrations"),
+                                                                             persisted=True)))
+        deferred["reporters"] = DeferredCopy(self._share_field("reporters"), persisted=True)
+
+        # Copy everything else like ITask.__deepcopy__() does
+        task = base_task.__class__.__new__(base_task.__class__)
+        memo = {id(base_task): task}
+        task.__dict__["_deferred_copies"] = deferred
+        for key, value in base_task.__dict__.items():
+            if key in COPY_ON_WRITE_FIELDS or key in ("_deferred_copies", "copy_report", "_task_log",
+                                                      "_transient_assets_promoted"):
+                continue
+            task.__dict__[key] = value if key == "common_assets" else copy.deepcopy(value, memo)
+
+        # The simulation refers to the new task through the memo
+        return copy.deepcopy(base_simulation, memo)
+
     def set_parameter(self, name: str, value: any) -> dict:
         """
         Set a value in the EMOD config.json file. This will be deprecated in the future in favour of emod_api.config.
@@ -866,13 +1348,22 @@ class EMODTask(ITask):
                              " or create a new one using from_defaults.")
         if type(self.config) is dict:  # old style, when "from_files" is used
             self.config[name] = value  # no checks against the schema
-        elif hasattr(self.config.parameters, name):
+        elif self._is_config_parameter(name):
             setattr(self.config.parameters, name, value)
         else:
             raise ValueError(f"Parameter '{name}' not a valid parameter based on schema.")
 
         return {name: value}
 
+    def _is_config_parameter(self, name: str) -> bool:
+        """
+        Check name against the schema's config parameters, then against the keys of the config itself, which may
+        hold parameters the schema index does not know about.
+        """
+        if self.schema_path and load_schema_index(self.schema_path).has_config_parameter(name):
+            return True
+        return hasattr(self.config.parameters, name)
+
     @staticmethod
     def set_parameter_sweep_callback(simulation: Simulation, param: str, value: Any) -> Dict[str, Any]:
         """
@@ -1 +1,6 @@
 from emodpy.migration.migration_data import MigrationData  # noqa: F401
+from emodpy.migration.gravity import GravityModel  # noqa: F401
+from emodpy.migration.migration_file import MigrationFile  # noqa: F401
+from emodpy.migration.analytics import MigrationAnalytics  # noqa: F401
+from emodpy.migration.coarsening import coarsen, NodeMapping  # noqa: F401
+from emodpy.migration.distance_cache import DistanceCache  # noqa: F401
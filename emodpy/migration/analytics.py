@@ -0,0 +1,214 @@
+"""Sanity checks of migration networks on sparse matrices.
+
+``MigrationAnalytics`` turns each layer of a MigrationData into a ``scipy.sparse`` rate matrix, rows being the source
+nodes and columns the destination nodes, and computes from it:
+
+- the strongly connected components and the isolated nodes,
+- the total out-rate of each node,
+- the expected daily flows out of and into each node, given the node populations of a Demographics,
+- the stationary distribution of the population under migration alone,
+- the rate of each node that ``MigrationData.to_migration_file`` drops when it keeps only the ``value_limit``
+  largest rates of the node.
+
+``summary`` reports these for every layer.
+"""
+from collections import namedtuple
+from typing import List, Tuple
+
+import numpy as np
+
+from emodpy.migration.migration_data import MigrationData, ONE_FOR_EACH_GENDER, _node_columns
+from emodpy.migration.migration_layers import INDEX_DTYPE, NODE_ID_DTYPE
+
+LayerSummary = namedtuple("LayerSummary", ["gender", "age", "num_pairs", "num_components", "largest_component",
+                                           "isolated_nodes", "max_out_rate", "daily_flow", "truncated_nodes",
+                                           "max_truncated_rate"])
+LayerSummary.__doc__ = """Metrics of one layer returned by ``MigrationAnalytics.summary``.
+
+gender, age: the gender and age (None without age dependence) of the layer
+num_pairs: number of (source, destination) pairs with a positive rate
+num_components: number of strongly connected components, isolated nodes included
+largest_component: number of nodes of the largest strongly connected component
+isolated_nodes: number of nodes without any rate in or out
+max_out_rate: largest total out-rate of a node
+daily_flow: expected number of people migrating per day, None without populations
+truncated_nodes: number of nodes losing rates to the value_limit of the migration file
+max_truncated_rate: largest total rate a node loses to the value_limit of the migration file
+"""
+
+
+class MigrationAnalytics:
+    """Network metrics of the layers of a MigrationData.
+
+    Each method takes the gender and age index of the layer, like ``MigrationData.get_layer``, and returns arrays
+    aligned with ``node_ids``.
+
+    Args:
+        data: MigrationData to analyze
+        demographics: optional Demographics whose nodes are included, with or without rates, and whose populations
+            are used for the daily flows
+
+    Example:
+        >>> analytics = MigrationAnalytics(data, demographics)
+        >>> for layer in analytics.summary(value_limit=100):
+        ...     print(layer)
+    """
+
+    def __init__(self, data: MigrationData, demographics=None):
+        self._data = data
+        self._layers = data._sparse()
+        node_ids = self._layers.node_ids
+        self.populations = None
+        if demographics is not None:
+            demographics_ids, _, _, populations = _node_columns(demographics)
+            node_ids = np.union1d(node_ids, demographics_ids).astype(NODE_ID_DTYPE)
+            self.populations = np.zeros(len(node_ids), dtype=np.float64)
+            self.populations[np.searchsorted(node_ids, demographics_ids)] = populations
+        self.node_ids = node_ids
+        # Index in node_ids of the nodes of the layers
+        self._node_index = np.searchsorted(node_ids, self._layers.node_ids)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def _layer_index(self, gender: int, age_index: int) -> int:
+        num_ages = max(len(self._data.ages), 1)
+        if not 0 <= age_index < num_ages or not 0 <= gender * num_ages < self._layers.num_layers:
+            raise IndexError(f"No layer for gender={gender}, age_index={age_index}.")
+        return gender * num_ages + age_index
+
+    def rate_matrix(self, gender: int = 0, age_index: int = 0):
+        """Return the rates of a layer as a ``scipy.sparse.csr_matrix`` of shape (num_nodes, num_nodes).
+
+        Entry [i, j] is the rate from node ``node_ids[i]`` to node ``node_ids[j]``. Pairs without a positive rate
+        are not stored.
+        """
+        from scipy.sparse import csr_matrix
+
+        rates = self._layers.rates[self._layer_index(gender, age_index)]
+        present = rates > 0
+        rows = self._node_index[self._layers.entry_rows()[present]]
+        indptr = np.zeros(self.num_nodes + 1, dtype=INDEX_DTYPE)
+        np.cumsum(np.bincount(rows, minlength=self.num_nodes), out=indptr[1:])
+        return csr_matrix((rates[present], self._node_index[self._layers.indices[present]], indptr),
+                          shape=(self.num_nodes, self.num_nodes))
+
+    def out_rates(self, gender: int = 0, age_index: int = 0) -> np.ndarray:
+        """Return the total rate out of each node."""
+        return np.asarray(self.rate_matrix(gender, age_index).sum(axis=1)).ravel()
+
+    def isolated_nodes(self, gender: int = 0, age_index: int = 0) -> np.ndarray:
+        """Return the IDs of the nodes without any rate in or out."""
+        return self.node_ids[~self._connected(self.rate_matrix(gender, age_index))]
+
+    def _connected(self, matrix) -> np.ndarray:
+        return (np.diff(matrix.indptr) > 0) | (np.bincount(matrix.indices, minlength=self.num_nodes) > 0)
+
+    def strongly_connected_components(self, gender: int = 0, age_index: int = 0) -> List[np.ndarray]:
+        """Return the node IDs of each strongly connected component, largest first.
+
+        Migration can take people from any node of a component to any other node of the same component. Isolated
+        nodes are components of one node.
+        """
+        labels = self._component_labels(self.rate_matrix(gender, age_index))
+        order = np.argsort(labels, kind="stable")
+        components = np.split(self.node_ids[order], np.flatnonzero(np.diff(labels[order])) + 1)
+        return sorted(components, key=len, reverse=True)
+
+    @staticmethod
+    def _component_labels(matrix) -> np.ndarray:
+        from scipy.sparse.csgraph import connected_components
+
+        if matrix.shape[0] == 0:
+            return np.zeros(0, dtype=np.int32)
+        return connected_components(matrix, directed=True, connection="strong")[1]
+
+    def daily_flows(self, gender: int = 0, age_index: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the expected number of people leaving and arriving at each node per day.
+
+        The flow from node i to node j is ``population[i] * rate[i, j]``. Requires the demographics.
+
+        Returns:
+            (outflows, inflows) arrays
+        """
+        if self.populations is None:
+            raise ValueError("Daily flows need the populations of the nodes, create the MigrationAnalytics with the "
+                             "demographics.")
+        flows = self.rate_matrix(gender, age_index).multiply(self.populations[:, None]).tocsr()
+        return np.asarray(flows.sum(axis=1)).ravel(), np.asarray(flows.sum(axis=0)).ravel()
+
+    def stationary_distribution(self, gender: int = 0, age_index: int = 0) -> np.ndarray:
+        """Return the long-run share of the population at each node under migration alone.
+
+        The layer is the generator of a continuous-time Markov chain. Its stationary distribution is unique when the
+        nodes with rates have only one closed strongly connected component, i.e. one component that migration does
+        not leave. The isolated nodes are left out and get 0.
+
+        Raises:
+            ValueError: if the layer has no pair or more than one closed component
+        """
+        from scipy.sparse import diags
+        from scipy.sparse.linalg import spsolve
+
+        matrix = self.rate_matrix(gender, age_index)
+        labels = self._component_labels(matrix)
+        rows = np.repeat(np.arange(self.num_nodes), np.diff(matrix.indptr))
+        connected = self._connected(matrix)
+        # Components with a rate to another component
+        leaving = np.zeros(labels.max() + 1 if len(labels) else 0, dtype=bool)
+        leaving[labels[rows[labels[rows] != labels[matrix.indices]]]] = True
+        closed = np.unique(labels[connected & ~leaving[labels]])
+        if len(closed) != 1:
+            raise ValueError(f"The layer (gender={gender}, age_index={age_index}) has {len(closed)} closed strongly "
+                             f"connected components, its stationary distribution is not unique.")
+
+        # pi Q = 0 on the closed component, Q the generator restricted to it. With pi = 1 at its first node, the
+        # equations of the other nodes are a sparse system, then pi is normalized.
+        members = np.flatnonzero(labels == closed[0])
+        distribution = np.zeros(self.num_nodes, dtype=np.float64)
+        distribution[members[0]] = 1.0
+        if len(members) > 1:
+            rates = matrix[members][:, members]
+            generator_t = (rates - diags(np.asarray(rates.sum(axis=1)).ravel())).T.tocsc()
+            rhs = -generator_t[1:, 0].toarray().ravel()
+            distribution[members[1:]] = np.maximum(spsolve(generator_t[1:, 1:], rhs), 0.0)
+        return distribution / distribution.sum()
+
+    def truncated_rates(self, value_limit: int = 100, gender: int = 0, age_index: int = 0) -> np.ndarray:
+        """Return the total rate of each node dropped by ``to_migration_file(..., value_limit=value_limit)``.
+
+        The migration file keeps the ``value_limit`` largest rates of each node and drops the others.
+        """
+        if value_limit < 1:
+            raise ValueError(f"value_limit must be positive, got {value_limit}.")
+        matrix = self.rate_matrix(gender, age_index)
+        rows = np.repeat(np.arange(self.num_nodes), np.diff(matrix.indptr))
+        order = np.lexsort((-matrix.data, rows))
+        rank = np.arange(len(rows)) - matrix.indptr[rows[order]]
+        dropped = order[rank >= value_limit]
+        return np.bincount(rows[dropped], weights=matrix.data[dropped], minlength=self.num_nodes)
+
+    def summary(self, value_limit: int = 100) -> List[LayerSummary]:
+        """Return the metrics of every layer, in the order of the migration file (gender-major, age-minor)."""
+        num_genders = 2 if self._data.gender_data_type == ONE_FOR_EACH_GENDER else 1
+        ages = self._data.ages or [None]
+        summaries = []
+        for gender in range(num_genders):
+            for age_index, age in enumerate(ages):
+                matrix = self.rate_matrix(gender, age_index)
+                component_sizes = np.bincount(self._component_labels(matrix))
+                truncated = self.truncated_rates(value_limit, gender, age_index)
+                out_rates = np.asarray(matrix.sum(axis=1)).ravel()
+                summaries.append(LayerSummary(
+                    gender=gender,
+                    age=age,
+                    num_pairs=matrix.nnz,
+                    num_components=len(component_sizes),
+                    largest_component=int(component_sizes.max()) if len(component_sizes) else 0,
+                    isolated_nodes=int(np.count_nonzero(~self._connected(matrix))),
+                    max_out_rate=float(out_rates.max()) if len(out_rates) else 0.0,
+                    daily_flow=None if self.populations is None else float(out_rates @ self.populations),
+                    truncated_nodes=int(np.count_nonzero(truncated)),
+                    max_truncated_rate=float(truncated.max()) if len(truncated) else 0.0))
+        return summaries
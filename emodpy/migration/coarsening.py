@@ -0,0 +1,270 @@
+"""Coarsening of Demographics and their MigrationData to fewer, larger nodes.
+
+Simulations cost in proportion to their number of nodes, so early calibration passes can run on merged nodes:
+
+- ``CoarseningMethod.GRID``: the nodes in the same cell of a ``cell_size`` degrees latitude/longitude grid are merged,
+- ``CoarseningMethod.ADMIN``: the nodes with the same admin code are merged,
+- ``CoarseningMethod.KMEANS``: the nodes are clustered in ``num_clusters`` groups by k-means on their location.
+
+A merged node has the total population of its nodes, at their population-weighted centroid. The rate from a merged
+node C to a merged node D is the population-weighted mean of the rates of the original nodes, so that the expected
+number of people migrating from C to D per day is conserved (unless the rate is capped at 1.0):
+
+    rate(C, D) = sum over i in C, j in D of pop(i) * rate(i, j) / pop(C)
+
+Migration between the nodes of a merged node is dropped. ``NodeMapping`` records which merged node each original node
+went to, to project results of the coarse simulations back on the original nodes.
+"""
+import copy
+import csv
+from collections import namedtuple
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
+import numpy as np
+
+from emodpy.migration.migration_data import MigrationData
+from emodpy.migration.migration_layers import INDEX_DTYPE, NODE_ID_DTYPE, RATE_DTYPE, MigrationLayers
+from emodpy.utils.emod_enum import CoarseningMethod
+
+CoarseningResult = namedtuple("CoarseningResult", ["demographics", "migration_data", "node_mapping"])
+
+
+class NodeMapping:
+    """Merged node of each original node.
+
+    Args:
+        node_ids: IDs of the original nodes
+        coarse_node_ids: ID of the merged node of each original node
+        populations: population of each original node
+    """
+
+    def __init__(self, node_ids: np.ndarray, coarse_node_ids: np.ndarray, populations: np.ndarray):
+        self.node_ids = np.asarray(node_ids, dtype=NODE_ID_DTYPE)
+        self.coarse_node_ids = np.asarray(coarse_node_ids, dtype=NODE_ID_DTYPE)
+        self.populations = np.asarray(populations, dtype=np.float64)
+        coarse_ids, self._coarse_index = np.unique(self.coarse_node_ids, return_inverse=True)
+        coarse_populations = np.bincount(self._coarse_index, weights=self.populations, minlength=len(coarse_ids))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shares = self.populations / coarse_populations[self._coarse_index]
+        # Merged nodes without population are shared equally
+        sizes = np.bincount(self._coarse_index, minlength=len(coarse_ids))
+        self.population_shares = np.where(coarse_populations[self._coarse_index] > 0, shares,
+                                          1.0 / sizes[self._coarse_index])
+        self._coarse_ids = coarse_ids
+
+    def to_dict(self) -> Dict[int, int]:
+        """Return the mapping as a dict of ``{node_id: coarse_node_id}``."""
+        return dict(zip(self.node_ids.tolist(), self.coarse_node_ids.tolist()))
+
+    def project(self, coarse_values: Dict[int, float]) -> Dict[int, float]:
+        """Split values of the merged nodes, e.g. case counts, over their original nodes by population share.
+
+        Args:
+            coarse_values: dict of ``{coarse_node_id: value}``
+
+        Returns:
+            dict of ``{node_id: value}`` with the same total per merged node
+        """
+        values = np.array([coarse_values.get(node_id, 0.0) for node_id in self._coarse_ids.tolist()],
+                          dtype=np.float64)
+        return dict(zip(self.node_ids.tolist(), (values[self._coarse_index] * self.population_shares).tolist()))
+
+    def to_csv(self, path: Union[str, Path]) -> Path:
+        """Write the mapping table with columns node_id, coarse_node_id, population, population_share."""
+        path = Path(path)
+        with path.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["node_id", "coarse_node_id", "population", "population_share"])
+            writer.writerows(zip(self.node_ids.tolist(), self.coarse_node_ids.tolist(), self.populations.tolist(),
+                                 self.population_shares.tolist()))
+        return path
+
+
+def _cluster_labels(lats: np.ndarray, lons: np.ndarray, method: CoarseningMethod, cell_size: float,
+                    codes: Optional[list], num_clusters: Optional[int], seed: int, xyz: np.ndarray) -> np.ndarray:
+    """Return a cluster index for each node, clusters numbered in the order of their first node."""
+    if method == CoarseningMethod.GRID:
+        if not cell_size > 0:
+            raise ValueError(f"cell_size must be positive, got {cell_size}.")
+        cells = np.floor(np.column_stack([lats, lons]) / cell_size)
+        _, first, labels = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+    elif method == CoarseningMethod.ADMIN:
+        index = {}
+        return np.array([index.setdefault(code, len(index)) for code in codes], dtype=np.int64)
+    else:
+        if num_clusters is None or not (int(num_clusters) == num_clusters and 1 <= num_clusters):
+            raise ValueError(f"num_clusters must be a positive integer, got {num_clusters}.")
+        from scipy.cluster.vq import kmeans2
+
+        num_clusters = min(int(num_clusters), len(lats))
+        # On the unit sphere, clusters across the antimeridian are not split
+        _, labels = kmeans2(xyz, num_clusters, minit="++", seed=np.random.default_rng(seed))
+        _, first, labels = np.unique(labels, return_index=True, return_inverse=True)
+    # Number the clusters in the order of their first node
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(first))
+    return rank[labels.ravel()]
+
+
+def _merged_node(node, population: float, xyz: np.ndarray, node_id: int, name, area):
+    """Move node, a copy of the most populous node of a cluster, to xyz with the population and area of the cluster.
+
+    The node keeps its name unless name is given.
+    """
+    node.forced_id = node_id
+    node.node_attributes.latitude = float(np.degrees(np.arcsin(np.clip(xyz[2], -1.0, 1.0))))
+    node.node_attributes.longitude = float(np.degrees(np.arctan2(xyz[1], xyz[0])))
+    node.node_attributes.initial_population = int(round(population))
+    node.node_attributes.area = area
+    if name is not None:
+        node.name = name
+    return node
+
+
+def _coarsen_migration(data: MigrationData, labels: Dict[int, int], populations: Dict[int, float],
+                       coarse_ids: np.ndarray, coarse_populations: np.ndarray) -> MigrationData:
+    """Aggregate the rates of data between clusters, weighted by the population of the source nodes."""
+    layers = data._sparse()
+    unknown = set(layers.node_ids.tolist()) - set(labels)
+    if unknown:
+        raise ValueError(f"Migration data contains node IDs not in demographics: {sorted(unknown)[:10]}")
+    node_labels = np.array([labels[node_id] for node_id in layers.node_ids.tolist()], dtype=INDEX_DTYPE)
+    node_pops = np.array([populations[node_id] for node_id in layers.node_ids.tolist()], dtype=np.float64)
+
+    sources = node_labels[layers.entry_rows()]
+    destinations = node_labels[layers.indices]
+    between = sources != destinations
+    keys = sources[between] * len(coarse_ids) + destinations[between]
+    pair_keys, pair_of_entry = np.unique(keys, return_inverse=True)
+
+    rates = layers.rates[:, between]
+    present = ~np.isnan(rates)
+    flows = np.where(present, rates, 0.0) * node_pops[layers.entry_rows()[between]]
+    coarse_rates = np.full((layers.num_layers, len(pair_keys)), np.nan, dtype=RATE_DTYPE)
+    pair_sources = pair_keys // max(len(coarse_ids), 1)
+    for layer in range(layers.num_layers):
+        has_rate = np.bincount(pair_of_entry, weights=present[layer], minlength=len(pair_keys)) > 0
+        total = np.bincount(pair_of_entry, weights=flows[layer], minlength=len(pair_keys))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            layer_rates = np.minimum(1.0, total / coarse_populations[pair_sources])
+        # Merged nodes without population have no migration
+        coarse_rates[layer] = np.where(has_rate & (coarse_populations[pair_sources] > 0), layer_rates, np.nan)
+
+    indptr = np.zeros(len(coarse_ids) + 1, dtype=INDEX_DTYPE)
+    np.cumsum(np.bincount(pair_sources, minlength=len(coarse_ids)), out=indptr[1:])
+    coarse_layers = MigrationLayers(coarse_ids.astype(NODE_ID_DTYPE), indptr,
+                                    (pair_keys % max(len(coarse_ids), 1)).astype(INDEX_DTYPE), coarse_rates)
+    result = MigrationData._from_layers(coarse_layers.compact(), idref=data.idref,
+                                        gender_data_type=data.gender_data_type, ages=data.ages)
+    result._user_notes = data.user_notes
+    return result
+
+
+def coarsen(demographics, migration_data: Optional[MigrationData] = None,
+            method: Union[CoarseningMethod, str] = CoarseningMethod.GRID, cell_size: float = 1.0,
+            admin_codes: Union[Dict[int, Hashable], Callable[[Any], Hashable], None] = None,
+            num_clusters: Optional[int] = None,
+            seed: int = 0, idref: Optional[str] = None) -> CoarseningResult:
+    """Merge the nodes of demographics, and the rates of their migration data, into fewer nodes.
+
+    The merged nodes are numbered 1, 2, ... in the order of their first original node. Each is a copy of its most
+    populous original node, with the name and attributes it sets, moved to the population-weighted centroid of the
+    original nodes, with their total population (rounded) and area. The nodes are read from ``node_table``, so the
+    Node objects of a Demographics created from arrays are only created for the merged nodes.
+
+    Args:
+        demographics: Demographics to coarsen
+        migration_data: optional MigrationData between the nodes of demographics, to aggregate
+        method: CoarseningMethod enum or string ("GRID", "ADMIN", "KMEANS"). Default GRID.
+        cell_size: size of the grid cells in degrees, for GRID
+        admin_codes: for ADMIN, dict of ``{node_id: admin code}`` or function returning the admin code of a Node,
+            e.g. ``lambda node: node.name.rsplit(":", 1)[0]``. The merged nodes are named after their admin code.
+        num_clusters: number of merged nodes for KMEANS
+        seed: seed of the k-means initialization, for KMEANS
+        idref: IdReference of the coarse demographics and migration data. Default the one of demographics with
+            "_coarse" appended.
+
+    Returns:
+        CoarseningResult(demographics, migration_data, node_mapping), migration_data None if not provided
+
+    Example:
+        >>> coarse = coarsen(demographics, migration_data, method="KMEANS", num_clusters=500)
+        >>> coarse.demographics.add_migration(coarse.migration_data, "REGIONAL")
+        >>> coarse.node_mapping.to_csv("node_mapping.csv")
+    """
+    # Imported here, it pulls in emod_api.demographics
+    from emodpy.demographics.demographics import Demographics
+
+    try:
+        method = CoarseningMethod(method)
+    except ValueError:
+        raise ValueError(f"Invalid method '{method}'. Valid options: {list(CoarseningMethod)}")
+    table = demographics.node_table
+    rows = np.flatnonzero(table.ids != 0)
+    if not len(rows):
+        raise ValueError("Demographics has no nodes to coarsen.")
+    node_ids = table.ids[rows].astype(NODE_ID_DTYPE)
+    lats = table.lats[rows]
+    lons = table.lons[rows]
+
+    phi = np.radians(lats)
+    lam = np.radians(lons)
+    xyz = np.column_stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)])
+    codes = None
+    if method == CoarseningMethod.ADMIN:
+        if admin_codes is None:
+            raise ValueError("admin_codes is required for the ADMIN method.")
+        if callable(admin_codes):
+            codes = [admin_codes(node) for node in demographics._iter_nodes() if node.id != 0]
+        else:
+            codes = [admin_codes.get(node_id) for node_id in node_ids.tolist()]
+        missing = [node_id for node_id, code in zip(node_ids.tolist(), codes) if code is None]
+        if missing:
+            raise ValueError(f"No admin code for nodes {missing[:10]}{'...' if len(missing) > 10 else ''}.")
+    labels = _cluster_labels(lats, lons, method, cell_size, codes, num_clusters, seed, xyz)
+    num_coarse = int(labels.max()) + 1
+    populations = np.asarray(table.pops[rows], dtype=np.float64)
+    coarse_populations = np.bincount(labels, weights=populations, minlength=num_coarse)
+    coarse_ids = np.arange(1, num_coarse + 1, dtype=NODE_ID_DTYPE)
+
+    # Population-weighted centroids, plain centroids for clusters without population
+    weights = np.where(coarse_populations[labels] > 0, populations, 1.0)
+    centroids = np.column_stack([np.bincount(labels, weights=weights * xyz[:, axis], minlength=num_coarse)
+                                 for axis in range(3)])
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+
+    # First node of each cluster with the largest population
+    order = np.lexsort((np.arange(len(rows)), -populations, labels))
+    largest = rows[order[np.searchsorted(labels[order], np.arange(num_coarse))]]
+    if demographics._node_table is not None:
+        largest_nodes = table.take(largest).iter_nodes()
+    else:
+        largest_nodes = (copy.deepcopy(demographics.nodes[row]) for row in largest.tolist())
+
+    coarse_areas = [None] * num_coarse
+    if table.areas is not None:
+        areas = np.array([np.nan if area is None else area for area in table.areas[rows].tolist()], dtype=np.float64)
+        has_area = np.bincount(labels, weights=np.isnan(areas), minlength=num_coarse) == 0
+        totals = np.bincount(labels, weights=np.nan_to_num(areas), minlength=num_coarse)
+        coarse_areas = [float(total) if complete else None for total, complete in zip(totals, has_area)]
+    names = [None] * num_coarse
+    if codes is not None:
+        for code, label in zip(codes, labels.tolist()):
+            names[label] = str(code)
+    coarse_nodes = [_merged_node(node, float(coarse_populations[label]), centroids[label], int(coarse_ids[label]),
+                                 names[label], coarse_areas[label])
+                    for label, node in enumerate(largest_nodes)]
+
+    idref = idref if idref is not None else f"{demographics.idref}_coarse"
+    coarse_demographics = Demographics(nodes=coarse_nodes, default_node=copy.deepcopy(demographics.default_node),
+                                       idref=idref)
+    mapping = NodeMapping(node_ids, coarse_ids[labels], populations)
+
+    coarse_migration = None
+    if migration_data is not None:
+        coarse_migration = _coarsen_migration(migration_data, dict(zip(node_ids.tolist(), labels.tolist())),
+                                              dict(zip(node_ids.tolist(), populations.tolist())), coarse_ids,
+                                              coarse_populations)
+        coarse_migration._idref = idref
+    return CoarseningResult(coarse_demographics, coarse_migration, mapping)
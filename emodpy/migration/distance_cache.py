@@ -0,0 +1,262 @@
+"""On-disk cache of the distances between nodes.
+
+Gravity models are built again and again on the same nodes: for every parameter set, sweep point or process. With a
+``DistanceCache`` the distances computed by ``pairwise_distance_blocks`` and ``nearby_pair_blocks`` are stored in a
+directory and read back, memory-mapped, by the next computation on the same nodes, in any process.
+
+An entry is keyed by a hash of the latitudes and longitudes of the nodes (in order), the DistanceMethod and, for the
+nearby pairs, ``max_distance_km`` and ``max_neighbors``. It is a folder of ``.npy`` files:
+
+- all the distances: ``distances.npy``, a dense ``(num_nodes, num_nodes)`` matrix,
+- the nearby pairs: ``indptr.npy``, ``indices.npy`` and ``distances.npy``, the CSR arrays of the pairs of each node.
+
+Entries are written under a temporary name and renamed, so several processes can share the directory. The cache is
+bounded: the least recently used entries are removed once the entries take more than ``max_bytes``, and a dense
+matrix larger than ``max_bytes`` is not stored.
+
+An entry another process is reading may be removed, since the entries are read memory-mapped. This is harmless on
+POSIX systems, where the mapped files stay readable until they are closed, and fails on Windows, where the entry is
+then left in place. To make it unlikely, the entries used in the last ``EVICTION_GRACE_SECONDS`` are not removed,
+even if the cache is over ``max_bytes``.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from logging import getLogger
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from emodpy.migration.distances import DEFAULT_BLOCK_SIZE, distance_function, nearby_pair_blocks, \
+    pairwise_distance_blocks
+from emodpy.migration.migration_layers import INDEX_DTYPE
+from emodpy.utils.emod_enum import DistanceMethod
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+EVICTION_GRACE_SECONDS = 60
+_FORMAT_VERSION = 1
+_TEMPORARY_SUFFIX = ".tmp"
+
+DistanceCacheInfo = namedtuple("DistanceCacheInfo", ["hits", "misses", "entries", "bytes", "max_bytes"])
+
+
+class DistanceCache:
+    """
+    Directory of the distances between sets of nodes, bounded in size.
+
+    Its methods ``pairwise_distance_blocks`` and ``nearby_pair_blocks`` yield the same blocks as the functions of
+    ``emodpy.migration.distances``, computing and storing them the first time.
+
+    Args:
+        directory: Folder holding the entries. It is created if needed and may be shared by several processes.
+        max_bytes: Size above which the least recently used entries are removed.
+
+    Example:
+        >>> cache = DistanceCache("~/.cache/emodpy/distances")
+        >>> for params in gravity_params:
+        ...     data = MigrationData.from_gravity_model(demographics, params, max_destinations=100,
+        ...                                             distance_cache=cache)
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be at least 1, got {max_bytes}.")
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+
+    def make_key(self, lats: np.ndarray, lons: np.ndarray, method: Union[DistanceMethod, str],
+                 max_distance_km: Optional[float] = None, max_neighbors: Optional[int] = None,
+                 nearby: bool = False) -> str:
+        """
+        Return the key of the distances between the points at lats, lons.
+
+        Args:
+            lats: latitudes in degrees
+            lons: longitudes in degrees
+            method: DistanceMethod
+            max_distance_km: ``max_distance_km`` of the nearby pairs
+            max_neighbors: ``max_neighbors`` of the nearby pairs
+            nearby: True for the nearby pairs, False for all the distances
+        """
+        distance_function(method)
+        content = hashlib.sha256()
+        content.update(json.dumps([_FORMAT_VERSION, str(DistanceMethod(method)), nearby,
+                                   None if max_distance_km is None else float(max_distance_km),
+                                   None if max_neighbors is None else int(max_neighbors)]).encode())
+        content.update(np.ascontiguousarray(lats, dtype="<f8").tobytes())
+        content.update(np.ascontiguousarray(lons, dtype="<f8").tobytes())
+        return content.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def _load(self, key: str, names: Tuple[str, ...]) -> Optional[List[np.ndarray]]:
+        path = self._path(key)
+        try:
+            arrays = [np.load(path / f"{name}.npy", mmap_mode="r") for name in names]
+        except FileNotFoundError:
+            self._misses += 1
+            return None
+        except Exception as error:  # a truncated or stale entry is computed again
+            logger.warning(f"Ignoring distance cache entry {path}: {error}")
+            self._misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # removed by another process, the mapped arrays are still readable
+            pass
+        self._hits += 1
+        return arrays
+
+    def _new_entry(self) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(dir=self.directory, suffix=_TEMPORARY_SUFFIX))
+
+    def _commit(self, temporary: Path, key: str) -> None:
+        try:
+            os.rename(temporary, self._path(key))
+        except OSError:  # stored by another process meanwhile
+            shutil.rmtree(temporary, ignore_errors=True)
+            return
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:  # removed by another process meanwhile
+            return
+        self._evict()
+
+    def pairwise_distance_blocks(self, lats: np.ndarray, lons: np.ndarray,
+                                 method: Union[DistanceMethod, str] = DistanceMethod.ELLIPSOIDAL,
+                                 block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield the distances in km between all the points, like ``distances.pairwise_distance_blocks``."""
+        if block_size < 1:
+            raise ValueError(f"block_size must be positive, got {block_size}.")
+        key = self.make_key(lats, lons, method)
+        stored = self._load(key, ("distances",))
+        if stored is not None:
+            distances, = stored
+            for start in range(0, len(distances), block_size):
+                yield start, np.array(distances[start:start + block_size])
+            return
+
+        num_points = len(lats)
+        if 8 * num_points ** 2 > self.max_bytes:
+            yield from pairwise_distance_blocks(lats, lons, method, block_size)
+            return
+        temporary = self._new_entry()
+        try:
+            distances = np.lib.format.open_memmap(temporary / "distances.npy", mode="w+", dtype=np.float64,
+                                                  shape=(num_points, num_points))
+            for start, block in pairwise_distance_blocks(lats, lons, method, block_size):
+                distances[start:start + len(block)] = block
+                yield start, block
+            distances.flush()
+            del distances
+            self._commit(temporary, key)
+        finally:
+            # Left over if the blocks were not all consumed
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    def nearby_pair_blocks(self, lats: np.ndarray, lons: np.ndarray,
+                           method: Union[DistanceMethod, str] = DistanceMethod.ELLIPSOIDAL,
+                           block_size: int = DEFAULT_BLOCK_SIZE,
+                           max_distance_km: Optional[float] = None,
+                           max_neighbors: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Yield the pairs of nearby points and their distances in km, like ``distances.nearby_pair_blocks``."""
+        if block_size < 1:
+            raise ValueError(f"block_size must be positive, got {block_size}.")
+        key = self.make_key(lats, lons, method, max_distance_km, max_neighbors, nearby=True)
+        stored = self._load(key, ("indptr", "indices", "distances"))
+        if stored is not None:
+            indptr, indices, distances = stored
+            for start in range(0, len(indptr) - 1, block_size):
+                stop = min(start + block_size, len(indptr) - 1)
+                sources = np.repeat(np.arange(start, stop, dtype=INDEX_DTYPE), np.diff(indptr[start:stop + 1]))
+                yield (sources, np.array(indices[indptr[start]:indptr[stop]]),
+                       np.array(distances[indptr[start]:indptr[stop]]))
+            return
+
+        row_counts, indices, distances = [], [], []
+        for sources, destinations, block_distances in nearby_pair_blocks(lats, lons, method, block_size,
+                                                                         max_distance_km, max_neighbors):
+            start = len(row_counts) * block_size
+            row_counts.append(np.bincount(sources - start, minlength=min(block_size, len(lats) - start)))
+            indices.append(destinations.astype(INDEX_DTYPE, copy=False))
+            distances.append(block_distances)
+            yield sources, destinations, block_distances
+
+        indptr = np.zeros(len(lats) + 1, dtype=INDEX_DTYPE)
+        np.cumsum(np.concatenate([np.zeros(0, dtype=INDEX_DTYPE)] + row_counts), out=indptr[1:])
+        temporary = self._new_entry()
+        try:
+            np.save(temporary / "indptr.npy", indptr)
+            np.save(temporary / "indices.npy", np.concatenate([np.zeros(0, dtype=INDEX_DTYPE)] + indices))
+            np.save(temporary / "distances.npy", np.concatenate([np.zeros(0)] + distances))
+            self._commit(temporary, key)
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    def _entries(self) -> List[tuple]:
+        """Return (path, last use, size) of the entries."""
+        entries = []
+        if self.directory.is_dir():
+            for path in self.directory.iterdir():
+                if not path.is_dir() or path.name.endswith(_TEMPORARY_SUFFIX):
+                    continue
+                try:
+                    size = sum(file.stat().st_size for file in path.iterdir())
+                    entries.append((path, path.stat().st_mtime_ns, size))
+                except FileNotFoundError:  # removed by another process
+                    pass
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        recent = time.time_ns() - EVICTION_GRACE_SECONDS * 10 ** 9
+        for path, last_use, size in entries[:-1]:  # the newest entry is kept even if it is larger than max_bytes
+            if total <= self.max_bytes or last_use > recent:  # may be read by another process
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def info(self) -> DistanceCacheInfo:
+        """
+        Return the hit/miss counters of this object and the current size of the cache directory.
+
+        Returns:
+            DistanceCacheInfo(hits, misses, entries, bytes, max_bytes)
+        """
+        entries = self._entries()
+        return DistanceCacheInfo(self._hits, self._misses, len(entries), sum(size for _, _, size in entries),
+                                 self.max_bytes)
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the hit/miss counters.
+        """
+        for path, _, _ in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+        self._hits = 0
+        self._misses = 0
+
+
+def distance_blocks(distance_cache: Union[DistanceCache, str, Path, None]):
+    """Return the (pairwise_distance_blocks, nearby_pair_blocks) functions to use with an optional cache.
+
+    Args:
+        distance_cache: a DistanceCache, the path of its directory, or None for no cache
+    """
+    if distance_cache is None:
+        return pairwise_distance_blocks, nearby_pair_blocks
+    if not isinstance(distance_cache, DistanceCache):
+        distance_cache = DistanceCache(distance_cache)
+    return distance_cache.pairwise_distance_blocks, distance_cache.nearby_pair_blocks
@@ -0,0 +1,155 @@
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+from emodpy.migration.distance_cache import DistanceCache, distance_blocks
+from emodpy.migration.distances import DEFAULT_BLOCK_SIZE
+from emodpy.migration.migration_data import MigrationData, SAME_FOR_BOTH_GENDERS, ONE_FOR_EACH_GENDER, _node_columns
+from emodpy.migration.migration_layers import INDEX_DTYPE, RATE_DTYPE, MigrationLayers
+from emodpy.utils.emod_enum import DistanceMethod
+
+
+class GravityModel:
+    """Gravity model rates of one set of nodes, for many gravity parameter sets.
+
+    The node pairs, log-populations and log-distances are computed once when the GravityModel is created. The rates
+    of one or more parameter sets are then a single matrix product:
+
+        log(rate) = log(g0) + g1 * log(from_pop) + g2 * log(to_pop) + g3 * log(distance_km), rate capped at 1.0
+
+    The rates match ``MigrationData.from_gravity_model`` with the same nodes and options within 1e-12 relative.
+
+    Args:
+        demographics: Demographics object with .nodes and .idref
+        distance_method: DistanceMethod enum or string ("ELLIPSOIDAL", "HAVERSINE"). Default ELLIPSOIDAL.
+        block_size: number of source nodes whose distances are computed at once
+        max_distance_km: if provided, no migration between nodes farther apart than this distance
+        max_destinations: if provided, migration from each node only to its ``max_destinations`` nearest
+            populated nodes
+        distance_cache: a DistanceCache, or the path of its directory, storing the distances between the nodes
+            for the next models built on the same nodes. Default None, no cache.
+
+    Example:
+        >>> model = GravityModel(demographics, max_destinations=100)
+        >>> params = [[1e-4, 1, 1, -1], [2e-4, 1, 1, -1.5], [1e-4, 0.8, 1, -2]]
+        >>> for i, data in enumerate(model.migration_data_batch(params)):
+        ...     data.to_migration_file(f"migration_{i}.bin")
+    """
+
+    def __init__(self, demographics, distance_method: Union[DistanceMethod, str] = DistanceMethod.ELLIPSOIDAL,
+                 block_size: int = DEFAULT_BLOCK_SIZE, max_distance_km: Optional[float] = None,
+                 max_destinations: Optional[int] = None,
+                 distance_cache: Union[DistanceCache, str, Path, None] = None):
+        ids, lats, lons, pops = _node_columns(demographics)
+        if len(ids) < 2:
+            raise ValueError(f"Need at least 2 non-default nodes for migration, got {len(ids)}")
+
+        # Nodes without population have no rate
+        populated = pops != 0
+        ids, lats, lons = ids[populated], lats[populated], lons[populated]
+        with np.errstate(invalid="ignore"):
+            log_pops = np.log(pops[populated])
+
+        row_counts, indices, log_distances = [np.zeros(0, dtype=INDEX_DTYPE)], [np.zeros(0, dtype=INDEX_DTYPE)], []
+        pairwise_distance_blocks, nearby_pair_blocks = distance_blocks(distance_cache)
+        if max_distance_km is None and max_destinations is None:
+            for start, distances_km in pairwise_distance_blocks(lats, lons, distance_method, block_size):
+                np.fill_diagonal(distances_km[:, start:], 0.0)
+                rows, columns = np.nonzero(distances_km > 0)
+                row_counts.append(np.bincount(rows, minlength=len(distances_km)))
+                indices.append(columns.astype(INDEX_DTYPE))
+                log_distances.append(np.log(distances_km[rows, columns]))
+        else:
+            start = 0
+            for sources, destinations, distances_km in nearby_pair_blocks(lats, lons, distance_method, block_size,
+                                                                          max_distance_km, max_destinations):
+                row_counts.append(np.bincount(sources - start, minlength=min(block_size, len(ids) - start)))
+                indices.append(destinations.astype(INDEX_DTYPE))
+                log_distances.append(np.log(distances_km))
+                start += block_size
+
+        self.idref = demographics.idref
+        self.node_ids = ids
+        self.indptr = np.zeros(len(ids) + 1, dtype=INDEX_DTYPE)
+        np.cumsum(np.concatenate(row_counts), out=self.indptr[1:])
+        self.indices = np.concatenate(indices)
+        rows = np.repeat(np.arange(len(ids)), np.diff(self.indptr))
+        # One row per exponent g1, g2, g3
+        self._log_features = np.vstack([log_pops[rows], log_pops[self.indices],
+                                        np.concatenate([np.zeros(0)] + log_distances)])
+
+    @property
+    def num_pairs(self) -> int:
+        """Number of (source, destination) pairs whose rates are computed."""
+        return len(self.indices)
+
+    def rates(self, gravity_params: Union[Sequence[float], Sequence[Sequence[float]]]) -> np.ndarray:
+        """Compute the rates of the node pairs for one or more gravity parameter sets.
+
+        Args:
+            gravity_params: list of 4 floats [g0, g1, g2, g3], or a matrix with one such row per parameter set
+
+        Returns:
+            rates of the pairs, shape ``(num_pairs,)`` for one parameter set or ``(num_sets, num_pairs)`` for a
+            matrix, in the order of the pairs of the CSR arrays ``node_ids``, ``indptr`` and ``indices``
+        """
+        params = np.asarray(gravity_params, dtype=np.float64)
+        if params.shape[-1:] != (4,) or params.ndim > 2:
+            raise ValueError(f"gravity_params must have exactly 4 values per parameter set, got shape {params.shape}")
+        matrix = np.atleast_2d(params)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            # No migration where g0 <= 0
+            log_g0 = np.where(matrix[:, 0] > 0, np.log(matrix[:, 0]), -np.inf)
+            log_rates = matrix[:, 1:] @ self._log_features
+            log_rates += log_g0[:, None]
+            rates = np.exp(np.minimum(log_rates, 0.0, out=log_rates), out=log_rates)
+        return rates[0] if params.ndim == 1 else rates
+
+    def migration_data(self, gravity_params: Sequence[float], female_multiplier: Optional[float] = None):
+        """Return the MigrationData of one gravity parameter set, like ``MigrationData.from_gravity_model``.
+
+        Args:
+            gravity_params: list of 4 floats [g0, g1, g2, g3]
+            female_multiplier: if provided, creates ONE_FOR_EACH_GENDER data where
+                female_rate = male_rate * female_multiplier
+
+        Returns:
+            MigrationData
+        """
+        if len(gravity_params) != 4:
+            raise ValueError(f"gravity_params must have exactly 4 values, got {len(gravity_params)}")
+        return self._to_migration_data(self.rates(gravity_params), female_multiplier)
+
+    def migration_data_batch(self, gravity_params: Sequence[Sequence[float]], female_multiplier: Optional[float] = None,
+                             chunk_size: int = 16) -> Iterator[MigrationData]:
+        """Yield the MigrationData of each row of a gravity parameter matrix.
+
+        Args:
+            gravity_params: matrix with one row [g0, g1, g2, g3] per parameter set
+            female_multiplier: if provided, creates ONE_FOR_EACH_GENDER data where
+                female_rate = male_rate * female_multiplier
+            chunk_size: number of parameter sets whose rates are computed at once, bounds the memory to
+                ``chunk_size * num_pairs`` rates
+
+        Yields:
+            MigrationData, in the order of the rows of gravity_params
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}.")
+        params = np.asarray(gravity_params, dtype=np.float64)
+        if params.ndim != 2:
+            raise ValueError(f"gravity_params must be a matrix with one parameter set per row, got shape "
+                             f"{params.shape}")
+        for start in range(0, len(params), chunk_size):
+            for rates in self.rates(params[start:start + chunk_size]):
+                yield self._to_migration_data(rates, female_multiplier)
+
+    def _to_migration_data(self, rates: np.ndarray, female_multiplier: Optional[float]) -> MigrationData:
+        rates = np.where(rates > 0, rates, np.nan).astype(RATE_DTYPE, copy=False)[None, :]
+        gender_data_type = SAME_FOR_BOTH_GENDERS
+        if female_multiplier is not None:
+            gender_data_type = ONE_FOR_EACH_GENDER
+            rates = np.vstack([rates, np.minimum(1.0, rates * female_multiplier)])
+        layers = MigrationLayers(self.node_ids, self.indptr, self.indices, rates).compact()
+        return MigrationData._from_layers(layers, idref=self.idref, gender_data_type=gender_data_type)
@@ -1,5 +1,6 @@
-from collections import defaultdict
 from datetime import datetime
+import hashlib
+from itertools import chain, islice, repeat
 import json
 import logging
 from os import environ
@@ -8,9 +9,11 @@ from platform import system
 from typing import Optional, Union
 
 import numpy as np
-from geographiclib.geodesic import Geodesic
 
-from emodpy.utils.emod_enum import MigrationType, InterpolationType
+from emodpy.migration.distance_cache import DistanceCache, distance_blocks
+from emodpy.migration.distances import DEFAULT_BLOCK_SIZE
+from emodpy.migration.migration_layers import INDEX_DTYPE, NODE_ID_DTYPE, RATE_DTYPE, MigrationLayers
+from emodpy.utils.emod_enum import DistanceMethod, MigrationType, InterpolationType
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +31,9 @@ _MIGRATION_TYPE_STRINGS = {
     MigrationType.FAMILY: "FAMILY_MIGRATION",
 }
 
+# Version of the content hashed by MigrationData.content_hash, changed when the content changes
+_CONTENT_HASH_VERSION = 1
+
 
 def _author():
     """Return the current OS username for metadata authorship."""
@@ -36,28 +42,155 @@ def _author():
     return environ.get("USER", "Unknown")
 
 
-def _compute_gravity_rate(grav_params, from_pop, to_pop, distance_km):
-    """Compute a single migration rate using the gravity model formula.
+def _gravity_rates(grav_params, from_pop, to_pop, distance_km):
+    """Compute migration rates using the gravity model formula, element-wise on broadcast arrays.
 
     rate = g[0] * from_pop^g[1] * to_pop^g[2] * distance_km^g[3], capped at 1.0.
-    Returns 0.0 if any of from_pop, to_pop, or distance_km is zero.
+    The rate is 0.0 where any of from_pop, to_pop, or distance_km is zero.
 
     Args:
         grav_params: list of 4 floats [g0, g1, g2, g3]
-        from_pop: population of the source node
-        to_pop: population of the destination node
-        distance_km: geodesic distance between nodes in kilometers
+        from_pop: populations of the source nodes
+        to_pop: populations of the destination nodes
+        distance_km: distances between the nodes in kilometers
 
     Returns:
-        float migration rate in [0.0, 1.0]
+        numpy array of migration rates in [0.0, 1.0]
     """
-    if from_pop == 0 or to_pop == 0 or distance_km == 0:
-        return 0.0
-    rate = (grav_params[0]
-            * (from_pop ** grav_params[1])
-            * (to_pop ** grav_params[2])
-            * (distance_km ** grav_params[3]))
-    return float(min(1.0, rate))
+    from_pop, to_pop, distance_km = np.broadcast_arrays(from_pop, to_pop, distance_km)
+    valid = (from_pop != 0) & (to_pop != 0) & (distance_km != 0)
+    with np.errstate(divide="ignore", over="ignore", invalid="ignore"):
+        rates = (grav_params[0]
+                 * np.power(from_pop, grav_params[1])
+                 * np.power(to_pop, grav_params[2])
+                 * np.power(distance_km, grav_params[3]))
+    return np.where(valid, np.minimum(1.0, rates), 0.0)
+
+
+def _radiation_rates(leaving_rate, from_pop, to_pop, surrounding_pop, total_pop, distance_km):
+    """Compute migration rates using the radiation model formula, element-wise on broadcast arrays.
+
+    rate = leaving_rate * m * n / ((m + s) * (m + n + s)) / (1 - m / M), capped at 1.0, with m = from_pop,
+    n = to_pop, s = surrounding_pop and M = total_pop. The rate is 0.0 where from_pop, to_pop or distance_km is zero.
+
+    Args:
+        leaving_rate: fraction of the population of a node migrating per day
+        from_pop: populations of the source nodes
+        to_pop: populations of the destination nodes
+        surrounding_pop: populations within the distance of the destination from the source, without the source
+            and destination nodes
+        total_pop: total population of the nodes
+        distance_km: distances between the nodes in kilometers
+
+    Returns:
+        numpy array of migration rates in [0.0, 1.0]
+    """
+    from_pop, to_pop, surrounding_pop, distance_km = np.broadcast_arrays(from_pop, to_pop, surrounding_pop,
+                                                                         distance_km)
+    valid = (from_pop != 0) & (to_pop != 0) & (distance_km != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Finite-size normalization: the probabilities of all the destinations of a node sum to 1
+        rates = (leaving_rate * from_pop * to_pop
+                 / ((from_pop + surrounding_pop) * (from_pop + to_pop + surrounding_pop))
+                 / (1 - from_pop / total_pop))
+    return np.where(valid, np.minimum(1.0, rates), 0.0)
+
+
+def _tie_totals(cumulative: np.ndarray, run_ends: np.ndarray) -> np.ndarray:
+    """Return the non-decreasing cumulative values at the end of the run of each element, along the last axis."""
+    ends = np.where(run_ends, cumulative, np.inf)
+    return np.minimum.accumulate(ends[..., ::-1], axis=-1)[..., ::-1]
+
+
+def _node_columns(demographics):
+    """Return the (IDs, latitudes, longitudes, populations) arrays of the nodes of demographics, sorted by ID.
+
+    The default node is left out. The arrays come from the node table of an emodpy Demographics, so the nodes of a
+    Demographics created from arrays are not built.
+    """
+    if hasattr(demographics, "node_table"):
+        table = demographics.node_table
+        ids, lats, lons, pops = table.ids, table.lats, table.lons, table.pops
+    else:
+        nodes = demographics.nodes
+        ids = np.array([node.id for node in nodes], dtype=np.int64)
+        lats, lons, pops = (np.array([getattr(node, field) for node in nodes]) for field in ("lat", "lon", "pop"))
+    keep = np.flatnonzero(ids != 0)
+    order = keep[np.argsort(ids[keep], kind="stable")]
+    return (ids[order].astype(NODE_ID_DTYPE), lats[order].astype(np.float64), lons[order].astype(np.float64),
+            pops[order].astype(np.float64))
+
+
+# Number of padded entries sorted at once by to_migration_file
+_WRITE_CHUNK_ENTRIES = 1 << 22
+
+
+def _row_chunks(row_lengths, max_entries=_WRITE_CHUNK_ENTRIES):
+    """Split rows into chunks of rows of similar lengths, each with at most about max_entries once padded.
+
+    Yields:
+        (rows, width): indices of the rows of a chunk and the length of its longest row
+    """
+    order = np.argsort(row_lengths, kind="stable")
+    widths = np.maximum(row_lengths[order], 1)
+    start = 0
+    while start < len(order):
+        # The rows are sorted by length, the padded size grows with the number of rows
+        fits = np.arange(1, len(order) - start + 1) * widths[start:] <= max_entries
+        stop = start + max(len(fits) if fits.all() else int(np.argmin(fits)), 1)
+        yield order[start:stop], int(widths[stop - 1])
+        start = stop
+
+
+class _LayerDict(dict):
+    """A layer handed out by ``MigrationData.get_layer``. Writing to it makes the dicts of its data the rates."""
+
+    def _attach(self, data: "MigrationData", layers: list):
+        self._data = data
+        self._group = layers
+        return self
+
+    def _written(self):
+        data = getattr(self, "_data", None)
+        # Dicts replaced since, e.g. by a copy being built, no longer hold the data
+        if data is not None and data.__dict__.get("_layer_dicts") is self._group:
+            data._arrays = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._written()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._written()
+
+    def __ior__(self, other):
+        result = super().__ior__(other)
+        self._written()
+        return result
+
+    def clear(self):
+        super().clear()
+        self._written()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self._written()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._written()
+        return result
+
+    def setdefault(self, key, default=None):
+        result = super().setdefault(key, default)
+        self._written()
+        return result
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._written()
 
 
 class MigrationData:
@@ -66,7 +199,11 @@ class MigrationData:
     Holds rates as (from_node, to_node) -> rate with optional gender and age layers.
     The layer order mirrors EMOD binary format: gender-major, age-minor.
 
-    Create via classmethods: ``from_gravity_model``, ``from_rates``, ``from_migration_file``,
+    The rates of all layers are stored in one `MigrationLayers` (compressed sparse rows sharing one sparsity
+    pattern). ``get_layer`` returns a layer as a dict of ``{(from_id, to_id): rate}``; changes made to the dicts are
+    used by the methods called afterwards. The arrays are only rebuilt from the dicts once they are written to.
+
+    Create via classmethods: ``from_gravity_model``, ``from_radiation_model``, ``from_rates``, ``from_migration_file``,
     ``from_csv``, ``combine``.
     Modify via ``apply_modifier``.
     Assign to a simulation via ``Demographics.add_migration``.
@@ -79,9 +216,47 @@ class MigrationData:
         self._idref = ""
         self._gender_data_type = SAME_FOR_BOTH_GENDERS
         self._ages = []
-        self._layers = [{}]
+        self._arrays = MigrationLayers.empty()
+        self._layer_dicts = None
         self._user_notes = None
 
+    @property
+    def _layers(self):
+        """The layers as dicts of {(from_id, to_id): rate}, made from the arrays on first access."""
+        if self._layer_dicts is None:
+            self._set_dicts(self._arrays.to_dicts())
+        return self._layer_dicts
+
+    @_layers.setter
+    def _layers(self, layers):
+        self._set_dicts(layers)
+        self._arrays = None
+
+    def _set_dicts(self, layers):
+        group = []
+        group.extend(_LayerDict(layer)._attach(self, group) for layer in layers)
+        self._layer_dicts = group
+
+    def _sparse(self) -> MigrationLayers:
+        """The layers as MigrationLayers, made from the dicts if they were written to since the last call."""
+        if self._arrays is None:
+            # Kept until the dicts are written to again
+            self._arrays = MigrationLayers.from_dicts(self._layer_dicts)
+        return self._arrays
+
+    def _set_sparse(self, layers: MigrationLayers):
+        self._arrays = layers
+        self._layer_dicts = None
+
+    @classmethod
+    def _from_layers(cls, layers: MigrationLayers, idref="", gender_data_type=SAME_FOR_BOTH_GENDERS, ages=None):
+        data = cls()
+        data._idref = idref
+        data._gender_data_type = gender_data_type
+        data._ages = list(ages) if ages else []
+        data._set_sparse(layers)
+        return data
+
     @property
     def idref(self):
         """The IdReference string, must match the demographics idref."""
@@ -105,8 +280,10 @@ class MigrationData:
     @property
     def node_ids(self):
         """Sorted list of all unique node IDs (source and destination) across all layers."""
+        if self._arrays is not None:
+            return self._arrays.node_ids.tolist()
         ids = set()
-        for layer in self._layers:
+        for layer in self._layer_dicts:
             for from_id, to_id in layer:
                 ids.add(from_id)
                 ids.add(to_id)
@@ -115,7 +292,7 @@ class MigrationData:
     @property
     def num_layers(self):
         """Total number of rate layers: num_genders * max(len(ages), 1)."""
-        return len(self._layers)
+        return self._arrays.num_layers if self._arrays is not None else len(self._layer_dicts)
 
     def get_layer(self, gender=0, age_index=0):
         """Get the rate dict for a specific gender/age combination.
@@ -131,16 +308,60 @@ class MigrationData:
         index = gender * num_ages + age_index
         return self._layers[index]
 
+    def content_hash(self) -> str:
+        """Return a SHA-256 hex digest of the idref, gender data type, ages and rates of all layers.
+
+        Equal data gives the same hash, however it was created and in any process, so the hash identifies the
+        migration files written from the data (with the same ``to_migration_file`` arguments).
+        """
+        layers = self._sparse().compact()
+        content = hashlib.sha256()
+        content.update(json.dumps([_CONTENT_HASH_VERSION, self._idref, self._gender_data_type, self._ages]).encode())
+        for array, dtype in [(layers.node_ids, "<u4"), (layers.indptr, "<i8"), (layers.indices, "<i8")]:
+            content.update(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        # One NaN bit pattern for the missing rates
+        rates = np.where(np.isnan(layers.rates), np.nan, layers.rates)
+        content.update(np.ascontiguousarray(rates, dtype="<f8").tobytes())
+        return content.hexdigest()
+
     @classmethod
-    def from_gravity_model(cls, demographics, gravity_params, female_multiplier=None):
+    def from_gravity_model(cls, demographics, gravity_params, female_multiplier=None,
+                           distance_method: Union[DistanceMethod, str] = DistanceMethod.ELLIPSOIDAL,
+                           block_size: int = DEFAULT_BLOCK_SIZE,
+                           max_distance_km: Optional[float] = None,
+                           max_destinations: Optional[int] = None,
+                           distance_cache: Union[DistanceCache, str, Path, None] = None):
         """Generate migration rates from a gravity model using demographics node data.
 
+        The rates are computed with NumPy on blocks of ``block_size`` source nodes by all destination nodes, so
+        memory stays proportional to ``block_size * len(nodes)`` plus the rates kept.
+
+        With ``max_distance_km`` and/or ``max_destinations`` only the rates between nearby nodes are computed: the
+        candidate destinations of each node are found with a spatial index, so the time and memory grow with the
+        number of rates kept instead of the square of the number of nodes. This makes networks of 100k nodes
+        practical. Note that ``max_destinations`` keeps the nearest destinations of each node, while
+        ``to_migration_file`` keeps the ``value_limit`` destinations with the highest rates. The rates also depend
+        on the destination populations, so the two can keep different destinations: choose ``max_destinations``
+        larger than ``value_limit`` to leave ``to_migration_file`` the choice among enough candidates.
+
+        With ``DistanceMethod.ELLIPSOIDAL`` the distances match ``Geodesic.WGS84.Inverse`` within 1e-9 relative,
+        so the rates match the pair-by-pair geographiclib computation within about ``abs(g3) * 1e-9`` relative.
+        ``DistanceMethod.HAVERSINE`` uses a spherical Earth: faster, but the distances differ by up to 0.6%,
+        so the rates differ by up to about ``abs(g3) * 0.6%``.
+
         Args:
             demographics: Demographics object with .nodes and .idref
             gravity_params: list of 4 floats [g0, g1, g2, g3].
                 rate = g0 * from_pop^g1 * to_pop^g2 * distance_km^g3, capped at 1.0
             female_multiplier: if provided, creates ONE_FOR_EACH_GENDER data where
                 female_rate = male_rate * female_multiplier
+            distance_method: DistanceMethod enum or string ("ELLIPSOIDAL", "HAVERSINE"). Default ELLIPSOIDAL.
+            block_size: number of source nodes whose rates are computed at once
+            max_distance_km: if provided, no migration between nodes farther apart than this distance
+            max_destinations: if provided, migration from each node only to its ``max_destinations`` nearest
+                populated nodes (by distance, not by rate)
+            distance_cache: a DistanceCache, or the path of its directory, storing the distances between the nodes
+                for the next models built on the same nodes. Default None, no cache.
 
         Returns:
             MigrationData
@@ -148,32 +369,159 @@ class MigrationData:
         if len(gravity_params) != 4:
             raise ValueError(f"gravity_params must have exactly 4 values, got {len(gravity_params)}")
 
-        nodes = [n for n in demographics.nodes if n.id != 0]
-        if len(nodes) < 2:
-            raise ValueError(f"Need at least 2 non-default nodes for migration, got {len(nodes)}")
+        ids, lats, lons, pops = _node_columns(demographics)
+        if len(ids) < 2:
+            raise ValueError(f"Need at least 2 non-default nodes for migration, got {len(ids)}")
+
+        # Nodes without population have no rate, they are not candidate destinations either
+        populated = pops != 0
+        ids, lats, lons, pops = ids[populated], lats[populated], lons[populated], pops[populated]
+
+        # The blocks are rows of the CSR arrays, in node ID order
+        row_counts, indices, male_rates = [np.zeros(0, dtype=INDEX_DTYPE)], [np.zeros(0, dtype=INDEX_DTYPE)], []
+        pairwise_distance_blocks, nearby_pair_blocks = distance_blocks(distance_cache)
+        if max_distance_km is None and max_destinations is None:
+            for start, distances_km in pairwise_distance_blocks(lats, lons, distance_method, block_size):
+                block_rates = _gravity_rates(gravity_params, pops[start:start + len(distances_km), None],
+                                             pops[None, :], distances_km)
+                # A node does not migrate to itself, even where the distance is not exactly 0
+                np.fill_diagonal(block_rates[:, start:], 0.0)
+                rows, columns = np.nonzero(block_rates > 0)
+                row_counts.append(np.bincount(rows, minlength=len(block_rates)))
+                indices.append(columns.astype(INDEX_DTYPE))
+                male_rates.append(block_rates[rows, columns])
+        else:
+            start = 0
+            for sources, destinations, distances_km in nearby_pair_blocks(lats, lons, distance_method, block_size,
+                                                                          max_distance_km, max_destinations):
+                block_rates = _gravity_rates(gravity_params, pops[sources], pops[destinations], distances_km)
+                kept = block_rates > 0
+                row_counts.append(np.bincount(sources[kept] - start, minlength=min(block_size, len(ids) - start)))
+                indices.append(destinations[kept].astype(INDEX_DTYPE))
+                male_rates.append(block_rates[kept])
+                start += block_size
+
+        return cls._from_rate_blocks(demographics.idref, ids, row_counts, indices, male_rates, female_multiplier)
 
-        geodesic = Geodesic.WGS84
-        male_rates = {}
+    @classmethod
+    def from_radiation_model(cls, demographics, leaving_rate: float, female_multiplier=None,
+                             distance_method: Union[DistanceMethod, str] = DistanceMethod.ELLIPSOIDAL,
+                             block_size: int = DEFAULT_BLOCK_SIZE,
+                             max_distance_km: Optional[float] = None,
+                             max_destinations: Optional[int] = None,
+                             distance_cache: Union[DistanceCache, str, Path, None] = None):
+        """Generate migration rates from the radiation model using demographics node data.
 
-        for src in nodes:
-            for dst in nodes:
-                if src is dst:
-                    continue
-                dist_m = geodesic.Inverse(src.lat, src.lon, dst.lat, dst.lon, Geodesic.DISTANCE)['s12']
-                dist_km = dist_m / 1000.0
-                rate = _compute_gravity_rate(gravity_params, src.pop, dst.pop, dist_km)
-                if rate > 0:
-                    male_rates[(src.id, dst.id)] = rate
+        The rate from node i to node j is ``leaving_rate`` times the radiation model probability that a trip from i
+        ends at j, normalized so that the probabilities of all the destinations of i sum to 1:
+
+            rate = leaving_rate * m * n / ((m + s) * (m + n + s)) / (1 - m / M), capped at 1.0
+
+        with m and n the populations of i and j, s the population within the distance from i to j of node i (nodes
+        at that distance included, i and j excluded) and M the total population.
+
+        The destinations of each block of ``block_size`` source nodes are sorted by distance once and s is a
+        cumulative sum of the populations along them, so the cost is O(N^2 log N) for N nodes instead of the O(N^3)
+        of summing the populations within each circle, and memory stays proportional to ``block_size * len(nodes)``.
+
+        With ``max_distance_km`` and/or ``max_destinations`` only the rates between nearby nodes are computed, with
+        a spatial index like ``from_gravity_model``. s is then summed over the nearby destinations, which holds all
+        the nodes nearer than a destination, except that nodes at exactly the distance of the farthest destination
+        of a node are only counted if they are among its ``max_destinations`` destinations.
+
+        Args:
+            demographics: Demographics object with .nodes and .idref
+            leaving_rate: fraction of the population of a node migrating per day
+            female_multiplier: if provided, creates ONE_FOR_EACH_GENDER data where
+                female_rate = male_rate * female_multiplier
+            distance_method: DistanceMethod enum or string ("ELLIPSOIDAL", "HAVERSINE"). Default ELLIPSOIDAL.
+            block_size: number of source nodes whose rates are computed at once
+            max_distance_km: if provided, no migration between nodes farther apart than this distance
+            max_destinations: if provided, migration from each node only to its ``max_destinations`` nearest
+                populated nodes
+            distance_cache: a DistanceCache, or the path of its directory, storing the distances between the nodes
+                for the next models built on the same nodes. Default None, no cache.
+
+        Returns:
+            MigrationData
+        """
+        if not 0 < leaving_rate <= 1:
+            raise ValueError(f"leaving_rate must be in (0.0, 1.0], got {leaving_rate}")
+
+        ids, lats, lons, pops = _node_columns(demographics)
+        if len(ids) < 2:
+            raise ValueError(f"Need at least 2 non-default nodes for migration, got {len(ids)}")
+
+        # Nodes without population have no rate and add nothing to the surrounding populations
+        populated = pops != 0
+        ids, lats, lons, pops = ids[populated], lats[populated], lons[populated], pops[populated]
+        total_pop = pops.sum()
+
+        row_counts, indices, male_rates = [np.zeros(0, dtype=INDEX_DTYPE)], [np.zeros(0, dtype=INDEX_DTYPE)], []
+        pairwise_distance_blocks, nearby_pair_blocks = distance_blocks(distance_cache)
+        if max_distance_km is None and max_destinations is None:
+            for start, distances_km in pairwise_distance_blocks(lats, lons, distance_method, block_size):
+                from_pops = pops[start:start + len(distances_km), None]
+                order = np.argsort(distances_km, axis=1, kind="stable")
+                sorted_km = np.take_along_axis(distances_km, order, axis=1)
+                sorted_pops = pops[order]
+                run_ends = np.ones(sorted_km.shape, dtype=bool)
+                run_ends[:, :-1] = sorted_km[:, 1:] != sorted_km[:, :-1]
+                # The population within the distance includes the source node, at distance 0
+                within = _tie_totals(np.cumsum(sorted_pops, axis=1), run_ends)
+                block_rates = np.empty_like(distances_km)
+                np.put_along_axis(block_rates, order, _radiation_rates(leaving_rate, from_pops, sorted_pops,
+                                                                       within - from_pops - sorted_pops, total_pop,
+                                                                       sorted_km), axis=1)
+                np.fill_diagonal(block_rates[:, start:], 0.0)
+                rows, columns = np.nonzero(block_rates > 0)
+                row_counts.append(np.bincount(rows, minlength=len(block_rates)))
+                indices.append(columns.astype(INDEX_DTYPE))
+                male_rates.append(block_rates[rows, columns])
+        else:
+            # Population of the other nodes at the location of each node, left out of the nearby pairs
+            _, location = np.unique(np.column_stack([lats, lons]), axis=0, return_inverse=True)
+            location = location.ravel()
+            colocated_pops = np.bincount(location, weights=pops)[location] - pops
+            start = 0
+            for sources, destinations, distances_km in nearby_pair_blocks(lats, lons, distance_method, block_size,
+                                                                          max_distance_km, max_destinations):
+                order = np.lexsort((distances_km, sources))
+                sorted_km, to_pops = distances_km[order], pops[destinations[order]]
+                run_ends = np.ones(len(order), dtype=bool)
+                run_ends[:-1] = (sorted_km[1:] != sorted_km[:-1]) | (sources[order][1:] != sources[order][:-1])
+                cumulative = np.cumsum(to_pops)
+                # Pairs are sorted by source: the cumulative population before the first pair of each source
+                first = np.searchsorted(sources[order], sources[order])
+                surrounding = (_tie_totals(cumulative, run_ends) - (cumulative - to_pops)[first] - to_pops
+                               + colocated_pops[sources[order]])
+                block_rates = np.empty(len(order))
+                block_rates[order] = _radiation_rates(leaving_rate, pops[sources[order]], to_pops, surrounding,
+                                                      total_pop, sorted_km)
+                kept = block_rates > 0
+                row_counts.append(np.bincount(sources[kept] - start, minlength=min(block_size, len(ids) - start)))
+                indices.append(destinations[kept].astype(INDEX_DTYPE))
+                male_rates.append(block_rates[kept])
+                start += block_size
+
+        return cls._from_rate_blocks(demographics.idref, ids, row_counts, indices, male_rates, female_multiplier)
+
+    @classmethod
+    def _from_rate_blocks(cls, idref, ids, row_counts, indices, male_rates, female_multiplier):
+        """Assemble the CSR row blocks of a generated model, in node ID order, into a MigrationData."""
+        indptr = np.zeros(len(ids) + 1, dtype=INDEX_DTYPE)
+        np.cumsum(np.concatenate(row_counts), out=indptr[1:])
+        indices = np.concatenate(indices)
+        rates = np.concatenate([np.zeros(0, dtype=RATE_DTYPE)] + male_rates)[None, :]
 
         data = cls()
-        data._idref = demographics.idref
+        data._idref = idref
 
         if female_multiplier is not None:
             data._gender_data_type = ONE_FOR_EACH_GENDER
-            female_rates = {k: min(1.0, v * female_multiplier) for k, v in male_rates.items()}
-            data._layers = [male_rates, female_rates]
-        else:
-            data._layers = [male_rates]
+            rates = np.vstack([rates, np.minimum(1.0, rates * female_multiplier)])
+        # Nodes without any rate are dropped
+        data._set_sparse(MigrationLayers(ids, indptr, indices, rates).compact())
 
         return data
 
@@ -229,7 +577,7 @@ class MigrationData:
 
         data = cls()
         data._idref = idref
-        data._layers = [dict(layer) for layer in all_layers]
+        data._set_sparse(MigrationLayers.from_dicts(all_layers))
         data._ages = ages if ages else []
 
         if female_rates is not None:
@@ -237,7 +585,7 @@ class MigrationData:
 
         return data
 
-    def apply_modifier(self, ages, modifier_fn):
+    def apply_modifier(self, ages, modifier_fn, vectorized: bool = False):
         """Create age (and optionally gender) dependent rates from base rates.
 
         Args:
@@ -246,9 +594,18 @@ class MigrationData:
                 Called for each (from, to, age, gender) combination.
                 gender is 0 (MALE) or 1 (FEMALE).
                 If base data is SAME_FOR_BOTH_GENDERS, gender is always 0.
+            vectorized: if True, modifier_fn is instead
+                callable(base_rates, age, gender, from_ids, to_ids) -> modified_rates
+                and is called once per (age, gender) layer with read-only arrays of the base rates and node IDs of
+                all the pairs. It returns an array of the same length (or a value broadcast to it).
 
         Returns:
             New MigrationData with age layers (and gender layers if base had them)
+
+        Example:
+            >>> def age_mod(rates, age, gender, from_ids, to_ids):
+            ...     return rates * (0.5 if age < 15 else 1.0)
+            >>> modified = base.apply_modifier(ages=[0, 15, 65], modifier_fn=age_mod, vectorized=True)
         """
         if not ages:
             raise ValueError("ages must be a non-empty list")
@@ -257,23 +614,41 @@ class MigrationData:
         ages = sorted(ages)
 
         num_genders = 2 if self._gender_data_type == ONE_FOR_EACH_GENDER else 1
-        new_layers = []
+        base = self._sparse()
+        new_rates = np.full((num_genders * len(ages), base.nnz), np.nan, dtype=RATE_DTYPE)
+        if vectorized:
+            entry_rows = base.entry_rows()
 
         for gender in range(num_genders):
-            base_layer = self._layers[gender] if len(self._layers) > gender else self._layers[0]
-            for age in ages:
-                new_layer = {}
-                for (from_id, to_id), base_rate in base_layer.items():
-                    new_rate = modifier_fn(base_rate, age, gender)
-                    if new_rate > 0:
-                        new_layer[(from_id, to_id)] = min(1.0, new_rate)
-                new_layers.append(new_layer)
+            base_rates = base.rates[gender] if base.num_layers > gender else base.rates[0]
+            present = np.flatnonzero(~np.isnan(base_rates))
+            if vectorized:
+                arrays = (base_rates[present], base.node_ids[entry_rows[present]], base.node_ids[base.indices[present]])
+                for array in arrays:
+                    array.setflags(write=False)
+            for age_index, age in enumerate(ages):
+                new_layer = new_rates[gender * len(ages) + age_index]
+                if vectorized:
+                    modified = np.asarray(modifier_fn(arrays[0], age, gender, arrays[1], arrays[2]), dtype=RATE_DTYPE)
+                    try:
+                        modified = np.broadcast_to(modified, present.shape)
+                    except ValueError:
+                        raise ValueError(f"modifier_fn returned shape {modified.shape} for {len(present)} rates "
+                                         f"(age={age}, gender={gender}).")
+                    # NaN and rates <= 0 mean no migration
+                    kept = modified > 0
+                    new_layer[present[kept]] = np.minimum(1.0, modified[kept])
+                else:
+                    for entry, base_rate in zip(present.tolist(), base_rates[present].tolist()):
+                        new_rate = modifier_fn(base_rate, age, gender)
+                        if new_rate > 0:
+                            new_layer[entry] = min(1.0, new_rate)
 
         result = MigrationData()
         result._idref = self._idref
         result._gender_data_type = self._gender_data_type
         result._ages = ages
-        result._layers = new_layers
+        result._set_sparse(base.with_rates(new_rates))
         return result
 
     @classmethod
@@ -320,13 +695,13 @@ class MigrationData:
                 if key not in layers_dict:
                     raise ValueError(f"Missing layer for (gender={gender}, age={age}). "
                                      f"All gender/age combinations must be provided.")
-                new_layers.append(dict(layers_dict[key]._layers[0]))
+                new_layers.append(layers_dict[key]._sparse().layer_arrays(0))
 
         result = cls()
         result._idref = idrefs.pop()
         result._gender_data_type = gender_data_type
         result._ages = ages
-        result._layers = new_layers
+        result._set_sparse(MigrationLayers.from_layer_arrays(new_layers))
         return result
 
     @classmethod
@@ -340,69 +715,16 @@ class MigrationData:
 
         Returns:
             MigrationData
+
+        To inspect some nodes or layers of a large file without loading all of it, use ``MigrationFile``.
         """
-        binary_path = Path(binary_path).absolute()
-        metafile = Path(metafile) if metafile else binary_path.parent / (binary_path.name + ".json")
-
-        if not binary_path.exists():
-            raise FileNotFoundError(f"Binary file not found: {binary_path}")
-        if not metafile.exists():
-            raise FileNotFoundError(f"Metadata file not found: {metafile}")
-
-        with metafile.open("r") as f:
-            jason = json.load(f)
-
-        metadata = jason["Metadata"]
-        node_count = metadata["NodeCount"]
-        datavalue_count = metadata["DatavalueCount"]
-        gender_data_type = metadata.get("GenderDataType", SAME_FOR_BOTH_GENDERS)
-        ages = metadata.get("AgesYears", [])
-        idref = metadata.get("IdReference", "")
-
-        # NodeOffsets is a hex string: each node is 8 hex chars for ID + 8 hex chars for byte offset
-        node_offsets_str = jason["NodeOffsets"]
-        offsets = {}
-        for i in range(node_count):
-            base = 16 * i
-            node_id = int(node_offsets_str[base:base + 8], 16)
-            offset = int(node_offsets_str[base + 8:base + 16], 16)
-            offsets[node_id] = offset
-
-        num_genders = 2 if gender_data_type == ONE_FOR_EACH_GENDER else 1
-        num_ages = len(ages) if ages else 1
-        # Each node's data is datavalue_count entries of (uint32 dest + float64 rate) = 12 bytes each
-        age_data_size = node_count * datavalue_count * 12
-        # Binary layout: [gender0_age0, gender0_age1, ..., gender1_age0, gender1_age1, ...]
-        gender_data_size = num_ages * age_data_size
-
-        # Skip default node (ID=0) — it must never appear as source or destination
-        offsets.pop(0, None)
-
-        layers = []
-        with binary_path.open("rb") as f:
-            for gender in range(num_genders):
-                for age_idx in range(num_ages):
-                    layer = {}
-                    for node_id, node_offset in offsets.items():
-                        file_offset = gender * gender_data_size + age_idx * age_data_size + node_offset
-                        f.seek(file_offset)
-                        destinations = np.fromfile(f, dtype=np.uint32, count=datavalue_count)
-                        rates = np.fromfile(f, dtype=np.float64, count=datavalue_count)
-                        for dest, rate in zip(destinations, rates):
-                            if rate > 0 and dest > 0:
-                                layer[(node_id, int(dest))] = float(rate)
-                    layers.append(layer)
+        from emodpy.migration.migration_file import MigrationFile
 
-        data = cls()
-        data._idref = idref
-        data._gender_data_type = gender_data_type
-        data._ages = ages
-        data._layers = layers
-        data._user_notes = metadata.get("USER_NOTES", None)
-        return data
+        with MigrationFile(binary_path, metafile) as migration_file:
+            return migration_file.to_migration_data()
 
     @classmethod
-    def from_csv(cls, csv_path, idref=""):
+    def from_csv(cls, csv_path, idref="", chunk_rows: int = 1_000_000):
         """Load migration data from a CSV file.
 
         Accepts CSV files with or without a header row. The expected column formats are:
@@ -421,9 +743,13 @@ class MigrationData:
         ``source_node, destination_node, rate``. For 4+ columns without a header,
         raises ValueError with the expected format.
 
+        The rows are parsed by NumPy ``chunk_rows`` at a time and only the arrays of the non-zero rates are kept,
+        so large origin-destination exports are read in memory proportional to their number of non-zero rates.
+
         Args:
             csv_path: path to the CSV file
             idref: IdReference string to assign to the resulting MigrationData
+            chunk_rows: number of rows parsed at once
 
         Returns:
             MigrationData
@@ -433,79 +759,127 @@ class MigrationData:
         csv_path = Path(csv_path)
         if not csv_path.exists():
             raise FileNotFoundError(f"CSV file not found: {csv_path}")
+        if chunk_rows < 1:
+            raise ValueError(f"chunk_rows must be positive, got {chunk_rows}.")
 
         with csv_path.open('r', newline='') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-
-        if not rows:
-            raise ValueError("CSV file is empty.")
-
-        # Detect whether the first row is a header
-        header = None
-        first_row = rows[0]
-        try:
-            [float(v) for v in first_row]
-        except ValueError:
-            header = [c.strip().lower() for c in first_row]
-            rows = rows[1:]
-
-        if not rows:
-            raise ValueError("CSV file has no data rows.")
-
-        num_cols = len(rows[0])
-
-        if header is not None:
-            has_gender = 'gender' in header
-            has_age = 'age' in header
+            lines = iter(f)
+            first_line = next(lines, None)
+            if first_line is None:
+                raise ValueError("CSV file is empty.")
+
+            # Detect whether the first row is a header
+            header = None
+            first_row = next(csv.reader([first_line]), [])
             try:
-                src_idx = header.index('source_node')
-                dst_idx = header.index('destination_node')
-                rate_idx = header.index('rate')
+                [float(v) for v in first_row]
+                lines = chain([first_line], lines)
             except ValueError:
-                raise ValueError(
-                    f"CSV header must contain 'source_node', 'destination_node', and 'rate'. "
-                    f"Got: {header}")
-            gender_idx = header.index('gender') if has_gender else None
-            age_idx = header.index('age') if has_age else None
-        else:
-            if num_cols == 3:
-                src_idx, dst_idx, rate_idx = 0, 1, 2
-                has_gender = False
-                has_age = False
-                gender_idx = None
-                age_idx = None
+                header = [c.strip().lower() for c in first_row]
+
+            first_data_line = next(lines, None)
+            if first_data_line is None:
+                raise ValueError("CSV file has no data rows.")
+            num_cols = len(next(csv.reader([first_data_line]), []))
+            lines = chain([first_data_line], lines)
+
+            if header is not None:
+                has_gender = 'gender' in header
+                has_age = 'age' in header
+                try:
+                    src_idx = header.index('source_node')
+                    dst_idx = header.index('destination_node')
+                    rate_idx = header.index('rate')
+                except ValueError:
+                    raise ValueError(
+                        f"CSV header must contain 'source_node', 'destination_node', and 'rate'. "
+                        f"Got: {header}")
+                gender_idx = header.index('gender') if has_gender else None
+                age_idx = header.index('age') if has_age else None
             else:
-                raise ValueError(
-                    f"CSV has {num_cols} columns but no header row. Cannot determine format.\n"
-                    f"Expected CSV formats:\n"
-                    f"  3 columns: source_node, destination_node, rate\n"
-                    f"  4 columns: source_node, gender, destination_node, rate\n"
-                    f"       -or-: source_node, age, destination_node, rate\n"
-                    f"  5 columns: source_node, gender, age, destination_node, rate\n"
-                    f"Add a header row to specify the format.")
-
-        # Parse rows into structured records
-        records = []
-        for row_num, row in enumerate(rows, start=2 if header else 1):
-            if len(row) != num_cols:
-                raise ValueError(f"Row {row_num} has {len(row)} columns, expected {num_cols}.")
-            src = int(row[src_idx])
-            dst = int(row[dst_idx])
-            rate = float(row[rate_idx])
-            gender = int(row[gender_idx]) if gender_idx is not None else 0
-            age = float(row[age_idx]) if age_idx is not None else 0.0
-
-            if src == 0 or dst == 0:
-                raise ValueError(f"Row {row_num}: migration to/from default node (ID=0) is not allowed.")
-            if rate < 0 or rate > 1.0:
-                raise ValueError(f"Row {row_num}: rate must be in [0.0, 1.0], got {rate}.")
-
-            records.append((src, dst, rate, gender, age))
+                if num_cols == 3:
+                    src_idx, dst_idx, rate_idx = 0, 1, 2
+                    has_gender = False
+                    has_age = False
+                    gender_idx = None
+                    age_idx = None
+                else:
+                    raise ValueError(
+                        f"CSV has {num_cols} columns but no header row. Cannot determine format.\n"
+                        f"Expected CSV formats:\n"
+                        f"  3 columns: source_node, destination_node, rate\n"
+                        f"  4 columns: source_node, gender, destination_node, rate\n"
+                        f"       -or-: source_node, age, destination_node, rate\n"
+                        f"  5 columns: source_node, gender, age, destination_node, rate\n"
+                        f"Add a header row to specify the format.")
+
+            # Only the columns used are parsed, others may hold text
+            used_cols = sorted({src_idx, dst_idx, rate_idx} | {i for i in (gender_idx, age_idx) if i is not None})
+            src_idx, dst_idx, rate_idx, gender_idx, age_idx = (
+                None if i is None else used_cols.index(i) for i in (src_idx, dst_idx, rate_idx, gender_idx, age_idx))
+
+            # Parse chunks of rows into arrays, keeping the rows with a rate. The (gender, age) of the rows are
+            # coded as indices into the (gender, age) combinations seen.
+            combinations = {}
+            sources, destinations, rates, codes = [], [], [], []
+            row_num = 2 if header else 1
+            while True:
+                chunk = list(islice(lines, chunk_rows))
+                if not chunk:
+                    break
+                # Every row has num_cols columns, blank rows included, so the row numbers below are line numbers.
+                # Counting the commas is enough unless a row is blank, malformed or has quoted commas.
+                num_commas = np.fromiter(map(str.count, chunk, repeat(",")), dtype=np.int64, count=len(chunk))
+                if np.any(num_commas != num_cols - 1):
+                    num_cols_per_row = np.fromiter(map(len, csv.reader(chunk)), dtype=np.int64, count=len(chunk))
+                    if np.any(num_cols_per_row != num_cols):
+                        i = int(np.argmax(num_cols_per_row != num_cols))
+                        raise ValueError(f"Row {row_num + i} has {num_cols_per_row[i]} columns, expected {num_cols}.")
+                try:
+                    values = np.loadtxt(chunk, delimiter=",", quotechar='"', comments=None, usecols=used_cols,
+                                        dtype=np.float64, ndmin=2)
+                except ValueError as e:
+                    raise ValueError(f"Rows {row_num} to {row_num + len(chunk) - 1}: {e}")
+
+                chunk_sources, chunk_destinations, chunk_rates = (values[:, i] for i in (src_idx, dst_idx, rate_idx))
+                bad_node = (chunk_sources == 0) | (chunk_destinations == 0)
+                bad_rate = ~((chunk_rates >= 0) & (chunk_rates <= 1.0))
+                bad_id = ~((chunk_sources > 0) & (chunk_sources <= np.iinfo(NODE_ID_DTYPE).max)
+                           & (chunk_destinations > 0) & (chunk_destinations <= np.iinfo(NODE_ID_DTYPE).max)
+                           & (chunk_sources % 1 == 0) & (chunk_destinations % 1 == 0))
+                if np.any(bad_node | bad_rate | bad_id):
+                    i = int(np.argmax(bad_node | bad_rate | bad_id))
+                    if bad_node[i]:
+                        raise ValueError(f"Row {row_num + i}: migration to/from default node (ID=0) is not allowed.")
+                    if bad_rate[i]:
+                        raise ValueError(f"Row {row_num + i}: rate must be in [0.0, 1.0], got {chunk_rates[i]}.")
+                    raise ValueError(f"Row {row_num + i}: node IDs must be integers in [1, "
+                                     f"{np.iinfo(NODE_ID_DTYPE).max}].")
+
+                chunk_genders, gender_codes = np.unique(
+                    values[:, gender_idx].astype(np.int64) if gender_idx is not None else np.zeros(len(values), int),
+                    return_inverse=True)
+                chunk_ages, age_codes = np.unique(values[:, age_idx] if age_idx is not None else np.zeros(len(values)),
+                                                  return_inverse=True)
+                chunk_codes = gender_codes.ravel() * len(chunk_ages) + age_codes.ravel()
+                code_map = np.zeros(len(chunk_genders) * len(chunk_ages), dtype=np.int32)
+                for code in np.flatnonzero(np.bincount(chunk_codes, minlength=len(code_map))):
+                    gender, age = int(chunk_genders[code // len(chunk_ages)]), float(chunk_ages[code % len(chunk_ages)])
+                    code_map[code] = combinations.setdefault((gender, age), len(combinations))
+
+                kept = chunk_rates > 0
+                sources.append(chunk_sources[kept].astype(NODE_ID_DTYPE))
+                destinations.append(chunk_destinations[kept].astype(NODE_ID_DTYPE))
+                rates.append(chunk_rates[kept])
+                codes.append(code_map[chunk_codes[kept]])
+                row_num += len(chunk)
+
+        if not combinations:
+            raise ValueError("CSV file has no data rows.")
 
         # Determine structure
-        genders = sorted(set(r[3] for r in records))
-        ages = sorted(set(r[4] for r in records))
+        genders = sorted(set(gender for gender, _ in combinations))
+        ages = sorted(set(age for _, age in combinations))
 
         if has_gender or genders == [MALE, FEMALE]:
             gender_data_type = ONE_FOR_EACH_GENDER
@@ -516,23 +890,21 @@ class MigrationData:
         if not has_age:
             ages = []
 
-        # Build layers in gender-major, age-minor order
+        # Layers in gender-major, age-minor order
         num_ages = max(len(ages), 1)
-        layers = [{} for _ in range(len(genders) * num_ages)]
-        age_list = ages if ages else [0.0]
-
-        for src, dst, rate, gender, age in records:
-            g_idx = genders.index(gender) if gender in genders else 0
-            a_idx = age_list.index(age) if age in age_list else 0
-            layer_idx = g_idx * num_ages + a_idx
-            if rate > 0:
-                layers[layer_idx][(src, dst)] = rate
+        gender_index = {gender: i for i, gender in enumerate(genders)}
+        age_index = {age: i for i, age in enumerate(ages if ages else [0.0])}
+        combination_layers = np.zeros(len(combinations), dtype=np.int64)
+        for (gender, age), code in combinations.items():
+            combination_layers[code] = gender_index.get(gender, 0) * num_ages + age_index.get(age, 0)
 
         data = cls()
         data._idref = idref
         data._gender_data_type = gender_data_type
         data._ages = ages
-        data._layers = layers
+        data._set_sparse(MigrationLayers.from_entries(combination_layers[np.concatenate(codes)],
+                                                      np.concatenate(sources), np.concatenate(destinations),
+                                                      np.concatenate(rates), len(genders) * num_ages))
         return data
 
     def to_migration_file(self, path, migration_type: Union[MigrationType, str] = MigrationType.LOCAL,
@@ -573,19 +945,16 @@ class MigrationData:
 
         mig_type_str = _MIGRATION_TYPE_STRINGS[migration_type]
 
-        source_nodes = set()
-        for layer in self._layers:
-            source_nodes |= set(from_id for from_id, _ in layer)
-        source_nodes = sorted(source_nodes)
+        layers = self._sparse()
+        # Number of destinations of each node in each layer
+        present = np.zeros((layers.num_layers, layers.nnz + 1), dtype=np.int64)
+        np.cumsum(~np.isnan(layers.rates), axis=1, out=present[:, 1:])
+        dests_per_node = present[:, layers.indptr[1:]] - present[:, layers.indptr[:-1]]
+        is_source = dests_per_node.any(axis=0)
+        source_nodes = layers.node_ids[is_source].tolist()
 
         # DatavalueCount = max destinations per source node, capped by value_limit
-        max_dests = 0
-        for layer in self._layers:
-            dests_per_node = defaultdict(int)
-            for from_id, _ in layer:
-                dests_per_node[from_id] += 1
-            if dests_per_node:
-                max_dests = max(max_dests, max(dests_per_node.values()))
+        max_dests = int(dests_per_node.max()) if dests_per_node.size else 0
         actual_dvc = min(max_dests, value_limit)
         if actual_dvc == 0:
             actual_dvc = 1
@@ -620,28 +989,34 @@ class MigrationData:
         # Write binary: layers in gender-major, age-minor order.
         # Per layer, per source node: N×uint32 destination IDs then N×float64 rates.
         # Destinations are truncated to top actual_dvc by rate, then sorted ascending by rate.
+        # Equal rates are ordered by destination ID. Unused slots are zeros.
+        chunk_dtype = np.dtype([("destinations", NODE_ID_DTYPE, (actual_dvc,)), ("rates", RATE_DTYPE, (actual_dvc,))])
+        source_rows = np.flatnonzero(is_source)
+        row_chunks = list(_row_chunks(np.diff(layers.indptr)[source_rows]))
         with path.open("wb") as f:
-            for layer in self._layers:
-                rates_by_source = defaultdict(list)
-                for (from_id, to_id), rate in layer.items():
-                    rates_by_source[from_id].append((to_id, rate))
-
-                for node in source_nodes:
-                    pairs = rates_by_source.get(node, [])
-                    # Keep only the highest-rate destinations if exceeding value_limit
-                    pairs.sort(key=lambda x: x[1], reverse=True)
-                    if len(pairs) > actual_dvc:
-                        pairs = pairs[:actual_dvc]
-                    pairs.sort(key=lambda x: x[1])
-
-                    destinations = np.zeros(actual_dvc, dtype=np.uint32)
-                    rates = np.zeros(actual_dvc, dtype=np.float64)
-                    for i, (dest, rate) in enumerate(pairs):
-                        destinations[i] = dest
-                        rates[i] = rate
-
-                    destinations.tofile(f)
-                    rates.tofile(f)
+            for layer_rates in layers.rates:
+                chunks = np.zeros(len(source_nodes), dtype=chunk_dtype)
+                for positions, width in row_chunks:
+                    # Padded rows of the chunk, pairs in destination ID order, NaN where absent
+                    rows = source_rows[positions]
+                    columns = np.arange(width)
+                    entries = layers.indptr[rows, None] + columns
+                    padding = columns >= np.diff(layers.indptr)[rows, None]
+                    entries[padding] = 0
+                    rates = layer_rates[entries]
+                    rates[padding] = np.nan
+                    # Stable sorts order equal rates by destination ID, NaN last
+                    top = np.argsort(-rates, axis=1, kind="stable")[:, :actual_dvc]
+                    top = np.take_along_axis(top, np.argsort(np.take_along_axis(rates, top, axis=1), axis=1,
+                                                             kind="stable"), axis=1)
+                    top_rates = np.take_along_axis(rates, top, axis=1)
+                    absent = np.isnan(top_rates)
+                    top_destinations = layers.node_ids[np.take_along_axis(layers.indices[entries], top, axis=1)]
+                    top_rates[absent] = 0.0
+                    top_destinations[absent] = 0
+                    chunks["destinations"][positions, :top.shape[1]] = top_destinations
+                    chunks["rates"][positions, :top.shape[1]] = top_rates
+                chunks.tofile(f)
 
         return path
 
@@ -668,14 +1043,15 @@ class MigrationData:
 
         num_genders = 2 if by_gender else 1
         ages = self._ages if by_age else [None]
+        layers = self._sparse()
 
         with path.open('w', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(columns)
             for gender in range(num_genders):
                 for age_idx, age in enumerate(ages):
-                    layer = self._layers[gender * max(len(self._ages), 1) + age_idx]
-                    for (from_id, to_id), rate in sorted(layer.items()):
+                    sources, destinations, rates = layers.layer_arrays(gender * max(len(self._ages), 1) + age_idx)
+                    for from_id, to_id, rate in zip(sources.tolist(), destinations.tolist(), rates.tolist()):
                         row = [from_id]
                         if by_gender:
                             row.append(gender)
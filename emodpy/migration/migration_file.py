@@ -0,0 +1,157 @@
+import json
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from emodpy.migration.migration_data import MigrationData, ONE_FOR_EACH_GENDER, SAME_FOR_BOTH_GENDERS
+from emodpy.migration.migration_layers import NODE_ID_DTYPE, RATE_DTYPE, MigrationLayers
+
+# Value of each ASCII hex digit, 255 for the other characters
+_HEX_VALUES = np.full(256, 255, dtype=np.uint8)
+_HEX_VALUES[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+_HEX_VALUES[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+_HEX_VALUES[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+
+
+def parse_node_offsets(node_offsets: str, node_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode the NodeOffsets string of a migration metadata file.
+
+    Each node is 8 hex characters for its ID followed by 8 hex characters for the byte offset of its data.
+
+    Args:
+        node_offsets: NodeOffsets string
+        node_count: NodeCount of the metadata
+
+    Returns:
+        (node_ids, offsets) arrays
+    """
+    digits = _HEX_VALUES[np.frombuffer(node_offsets.encode("ascii"), dtype=np.uint8)]
+    if len(digits) != 16 * node_count:
+        raise ValueError(f"NodeOffsets has {len(digits)} characters, expected 16 per node for {node_count} nodes.")
+    if np.any(digits == 255):
+        raise ValueError("NodeOffsets must only contain hexadecimal digits.")
+    values = digits.reshape(node_count, 2, 8).astype(np.int64) @ (16 ** np.arange(7, -1, -1, dtype=np.int64))
+    return values[:, 0].astype(NODE_ID_DTYPE), values[:, 1]
+
+
+class MigrationFile:
+    """Lazy, memory-mapped view of an EMOD binary migration file and its JSON metadata.
+
+    Only the metadata is read when the file is opened. The rates are read from the memory-mapped binary when a node,
+    a layer or all the data are requested, so inspecting a few nodes of a multi-GB file is fast and cheap.
+
+    Args:
+        binary_path: path to the binary migration file
+        metafile: path to JSON metadata file (default: binary_path + ".json")
+
+    Example:
+        >>> with MigrationFile("regional_migration.bin") as migration:
+        ...     rates = migration.get_node(1234, gender=MigrationData.FEMALE, age_index=2)
+    """
+
+    def __init__(self, binary_path, metafile=None):
+        binary_path = Path(binary_path).absolute()
+        metafile = Path(metafile) if metafile else binary_path.parent / (binary_path.name + ".json")
+
+        if not binary_path.exists():
+            raise FileNotFoundError(f"Binary file not found: {binary_path}")
+        if not metafile.exists():
+            raise FileNotFoundError(f"Metadata file not found: {metafile}")
+
+        with metafile.open("r") as f:
+            jason = json.load(f)
+
+        self.binary_path = binary_path
+        self.metadata = jason["Metadata"]
+        self.datavalue_count = self.metadata["DatavalueCount"]
+        self.gender_data_type = self.metadata.get("GenderDataType", SAME_FOR_BOTH_GENDERS)
+        self.ages = self.metadata.get("AgesYears", [])
+        self.idref = self.metadata.get("IdReference", "")
+        self.user_notes = self.metadata.get("USER_NOTES", None)
+
+        node_ids, offsets = parse_node_offsets(jason["NodeOffsets"], self.metadata["NodeCount"])
+        # Each node's data is datavalue_count entries of (uint32 dest + float64 rate) = 12 bytes each
+        self._chunk_dtype = np.dtype([("destinations", NODE_ID_DTYPE, (self.datavalue_count,)),
+                                      ("rates", RATE_DTYPE, (self.datavalue_count,))])
+        if np.any(offsets % self._chunk_dtype.itemsize):
+            raise ValueError(f"NodeOffsets of {binary_path} are not multiples of the node data size.")
+        # Skip default node (ID=0) — it must never appear as source or destination
+        keep = node_ids != 0
+        self.node_ids = node_ids[keep]
+        self._chunk_indices = offsets[keep] // self._chunk_dtype.itemsize
+        self._node_index = {node_id: i for i, node_id in enumerate(self.node_ids.tolist())}
+        self._chunks = None
+
+    @property
+    def num_layers(self) -> int:
+        """Total number of rate layers: num_genders * max(len(ages), 1)."""
+        return (2 if self.gender_data_type == ONE_FOR_EACH_GENDER else 1) * max(len(self.ages), 1)
+
+    @property
+    def chunks(self) -> np.ndarray:
+        """Memory-mapped node data, shape (num_layers, node_count) of (destinations, rates) records.
+
+        Binary layout: [gender0_age0, gender0_age1, ..., gender1_age0, gender1_age1, ...]
+        """
+        if self._chunks is None:
+            node_count = self.metadata["NodeCount"]
+            if self.binary_path.stat().st_size == 0:
+                self._chunks = np.zeros((self.num_layers, node_count), dtype=self._chunk_dtype)
+            else:
+                self._chunks = np.memmap(self.binary_path, dtype=self._chunk_dtype, mode="r",
+                                         shape=(self.num_layers, node_count))
+        return self._chunks
+
+    def close(self):
+        """Release the memory map, it is mapped again if data is requested later."""
+        self._chunks = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _layer_index(self, gender: int, age_index: int) -> int:
+        num_ages = max(len(self.ages), 1)
+        if not 0 <= age_index < num_ages or not 0 <= gender * num_ages < self.num_layers:
+            raise IndexError(f"No layer for gender={gender}, age_index={age_index} in {self.binary_path}.")
+        return gender * num_ages + age_index
+
+    def get_node(self, node_id: int, gender: int = 0, age_index: int = 0) -> Dict[int, float]:
+        """Return the rates of one source node as a dict of ``{to_id: rate}``, reading only this node's data.
+
+        Args:
+            node_id: ID of the source node
+            gender: MALE (0) or FEMALE (1)
+            age_index: index into self.ages (0 if no age dependence)
+        """
+        if node_id not in self._node_index:
+            raise KeyError(f"Node {node_id} is not a source node of {self.binary_path}.")
+        chunk = self.chunks[self._layer_index(gender, age_index), self._chunk_indices[self._node_index[node_id]]]
+        keep = (chunk["rates"] > 0) & (chunk["destinations"] > 0)
+        return dict(zip(chunk["destinations"][keep].tolist(), chunk["rates"][keep].tolist()))
+
+    def layer_arrays(self, gender: int = 0, age_index: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the (source IDs, destination IDs, rates) of one layer, reading only this layer's data."""
+        return self._layer_arrays(self._layer_index(gender, age_index))
+
+    def get_layer(self, gender: int = 0, age_index: int = 0) -> Dict[Tuple[int, int], float]:
+        """Return one layer as a dict of ``{(from_id, to_id): rate}``, like ``MigrationData.get_layer``."""
+        sources, destinations, rates = self.layer_arrays(gender, age_index)
+        return dict(zip(zip(sources.tolist(), destinations.tolist()), rates.tolist()))
+
+    def _layer_arrays(self, layer: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        chunks = self.chunks[layer][self._chunk_indices]
+        keep = (chunks["rates"] > 0) & (chunks["destinations"] > 0)
+        sources = np.repeat(self.node_ids, np.count_nonzero(keep, axis=1))
+        return sources, chunks["destinations"][keep], chunks["rates"][keep]
+
+    def to_migration_data(self) -> MigrationData:
+        """Read all the layers into a MigrationData."""
+        layers = MigrationLayers.from_layer_arrays([self._layer_arrays(layer) for layer in range(self.num_layers)])
+        data = MigrationData._from_layers(layers, idref=self.idref, gender_data_type=self.gender_data_type,
+                                          ages=self.ages)
+        data._user_notes = self.user_notes
+        return data
@@ -0,0 +1,167 @@
+"""Compressed sparse row (CSR) storage of the rate layers of a MigrationData.
+
+All layers of a MigrationData (one per gender and age) share one sparsity pattern:
+
+- ``node_ids``: sorted unique IDs of the nodes appearing as source or destination, the "node index"
+- ``indptr``: row pointers; the entries of the node at index i are ``indptr[i]:indptr[i + 1]``
+- ``indices``: node index of the destination of each entry, ascending within a row
+- ``rates``: one row of rates per layer, shape ``(num_layers, nnz)``. NaN marks a pair missing from that layer,
+  so a rate of 0.0 given explicitly is kept.
+
+A layer takes 12 bytes per (source, destination) pair instead of the ~200 bytes of a dict entry with a tuple key.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# dtypes of the binary migration file, also used for the arrays read from and written to it
+NODE_ID_DTYPE = np.uint32
+RATE_DTYPE = np.float64
+INDEX_DTYPE = np.int64
+
+
+def _index_ids(ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the sorted unique IDs and the index of each ID in them."""
+    if len(ids) and 0 <= ids.min() and ids.max() < max(4 * len(ids), 1 << 16):
+        # IDs small enough for a lookup table, faster than sorting
+        present = np.zeros(int(ids.max()) + 1, dtype=bool)
+        present[ids] = True
+        return np.flatnonzero(present), (np.cumsum(present) - 1)[ids]
+    return np.unique(ids, return_inverse=True)
+
+
+class MigrationLayers:
+    """Rates of one or more layers sharing one CSR sparsity pattern.
+
+    Args:
+        node_ids: sorted unique node IDs
+        indptr: row pointers, ``len(node_ids) + 1`` values
+        indices: destination node index of each entry
+        rates: 2D array of shape (num_layers, len(indices)), NaN where a layer has no rate for the pair
+    """
+
+    __slots__ = ("node_ids", "indptr", "indices", "rates")
+
+    def __init__(self, node_ids: np.ndarray, indptr: np.ndarray, indices: np.ndarray, rates: np.ndarray):
+        self.node_ids = node_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.rates = rates
+
+    @classmethod
+    def empty(cls, num_layers: int = 1) -> "MigrationLayers":
+        """Return layers without any rate."""
+        return cls(np.zeros(0, dtype=NODE_ID_DTYPE), np.zeros(1, dtype=INDEX_DTYPE), np.zeros(0, dtype=INDEX_DTYPE),
+                   np.zeros((num_layers, 0), dtype=RATE_DTYPE))
+
+    @classmethod
+    def from_layer_arrays(cls, layers: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> "MigrationLayers":
+        """Build the layers from one (source IDs, destination IDs, rates) triplet of arrays per layer.
+
+        A pair repeated within a layer keeps its last rate, like assigning to a dict.
+        """
+        if not layers:
+            raise ValueError("At least one layer is required.")
+        sources = [np.asarray(src, dtype=np.int64).ravel() for src, _, _ in layers]
+        destinations = [np.asarray(dst, dtype=np.int64).ravel() for _, dst, _ in layers]
+        values = [np.asarray(rate, dtype=RATE_DTYPE).ravel() for _, _, rate in layers]
+        for src, dst, rate in zip(sources, destinations, values):
+            if not len(src) == len(dst) == len(rate):
+                raise ValueError("Sources, destinations and rates of a layer must have the same length.")
+        entry_layers = np.repeat(np.arange(len(layers)), [len(rate) for rate in values])
+        return cls.from_entries(entry_layers, np.concatenate(sources), np.concatenate(destinations),
+                                np.concatenate(values), len(layers))
+
+    @classmethod
+    def from_entries(cls, layers: np.ndarray, sources: np.ndarray, destinations: np.ndarray, rates: np.ndarray,
+                     num_layers: int) -> "MigrationLayers":
+        """Build the layers from arrays with the layer index, source ID, destination ID and rate of each entry.
+
+        A pair repeated within a layer keeps its last rate, like assigning to a dict.
+        """
+        node_ids, node_index = _index_ids(np.concatenate([sources, destinations]))
+        num_nodes = len(node_ids)
+        keys = node_index[:len(sources)] * num_nodes + node_index[len(sources):]
+        pair_keys, pair_of_entry = np.unique(keys, return_inverse=True)
+
+        # Last entry of each (pair, layer), the order of repeated assignments to an array is not defined
+        entry_keys = pair_of_entry * num_layers + layers
+        order = np.argsort(entry_keys, kind="stable")
+        last = order[np.r_[entry_keys[order][1:] != entry_keys[order][:-1], True]] if len(order) else order
+        layer_rates = np.full((num_layers, len(pair_keys)), np.nan, dtype=RATE_DTYPE)
+        layer_rates[layers[last], pair_of_entry[last]] = rates[last]
+
+        rows = pair_keys // max(num_nodes, 1)
+        indptr = np.zeros(num_nodes + 1, dtype=INDEX_DTYPE)
+        np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+        return cls(node_ids.astype(NODE_ID_DTYPE), indptr, (pair_keys % max(num_nodes, 1)).astype(INDEX_DTYPE),
+                   layer_rates)
+
+    @classmethod
+    def from_dicts(cls, layers: Sequence[Dict[Tuple[int, int], float]]) -> "MigrationLayers":
+        """Build the layers from dicts of ``{(from_id, to_id): rate}``."""
+        arrays = []
+        for layer in layers:
+            count = len(layer)
+            sources = np.fromiter((key[0] for key in layer), dtype=np.int64, count=count)
+            destinations = np.fromiter((key[1] for key in layer), dtype=np.int64, count=count)
+            rates = np.fromiter(layer.values(), dtype=RATE_DTYPE, count=count)
+            arrays.append((sources, destinations, rates))
+        return cls.from_layer_arrays(arrays) if arrays else cls.empty()
+
+    @property
+    def num_layers(self) -> int:
+        return self.rates.shape[0]
+
+    @property
+    def nnz(self) -> int:
+        """Number of (source, destination) pairs of the shared sparsity pattern."""
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays."""
+        return self.node_ids.nbytes + self.indptr.nbytes + self.indices.nbytes + self.rates.nbytes
+
+    def entry_rows(self) -> np.ndarray:
+        """Node index of the source of each entry."""
+        return np.repeat(np.arange(len(self.node_ids), dtype=INDEX_DTYPE), np.diff(self.indptr))
+
+    def source_ids(self) -> np.ndarray:
+        """Sorted IDs of the nodes with at least one destination."""
+        return self.node_ids[np.diff(self.indptr) > 0]
+
+    def layer_arrays(self, layer: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the (source IDs, destination IDs, rates) of the pairs of a layer, by source then destination."""
+        rates = self.rates[layer]
+        present = ~np.isnan(rates)
+        return (self.node_ids[self.entry_rows()[present]], self.node_ids[self.indices[present]], rates[present])
+
+    def to_dict(self, layer: int) -> Dict[Tuple[int, int], float]:
+        """Return a layer as a dict of ``{(from_id, to_id): rate}``."""
+        sources, destinations, rates = self.layer_arrays(layer)
+        return dict(zip(zip(sources.tolist(), destinations.tolist()), rates.tolist()))
+
+    def to_dicts(self) -> List[Dict[Tuple[int, int], float]]:
+        """Return all layers as dicts of ``{(from_id, to_id): rate}``."""
+        return [self.to_dict(layer) for layer in range(self.num_layers)]
+
+    def with_rates(self, rates: np.ndarray) -> "MigrationLayers":
+        """Return layers with the same pattern and new rates (NaN where missing), without the pairs left empty."""
+        return MigrationLayers(self.node_ids, self.indptr, self.indices, rates).compact()
+
+    def compact(self) -> "MigrationLayers":
+        """Return these layers without the pairs missing from all layers and the nodes left without pairs."""
+        keep = ~np.all(np.isnan(self.rates), axis=0)
+        rows = self.entry_rows()[keep]
+        used = np.zeros(len(self.node_ids), dtype=bool)
+        used[rows] = True
+        used[self.indices[keep]] = True
+        if keep.all() and used.all():
+            return self
+        new_index = np.cumsum(used) - 1
+        num_nodes = int(used.sum())
+        indptr = np.zeros(num_nodes + 1, dtype=INDEX_DTYPE)
+        np.cumsum(np.bincount(new_index[rows], minlength=num_nodes), out=indptr[1:])
+        return MigrationLayers(self.node_ids[used], indptr, new_index[self.indices[keep]].astype(INDEX_DTYPE),
+                               self.rates[:, keep])
@@ -1,9 +1,14 @@
+import copy
 import json
 from abc import ABCMeta, abstractmethod
 from emod_api import schema_to_class as s2c
 from emodpy.emod_file import InputFilesList
 from emodpy.utils import (validate_key_value_pair, validate_value_range, validate_node_ids, validate_intervention_name)
 from emodpy.utils.emod_constants import MAX_FLOAT, MAX_AGE_YEARS
+from emodpy.utils.copy_on_write import share_schema_nodes
+from emodpy.utils.schema_cache import load_schema
+from emodpy.utils.schema_index import (INDIVIDUAL, NODE, COORDINATOR, SchemaIndex, get_class_with_defaults,
+                                       get_schema_index)
 
 import typing
 
@@ -264,7 +269,8 @@ class BuiltInReporter(AbstractBaseReporter):
                  reporter_class_name: str,
                  report_filter: ReportFilter = None):
         super().__init__()
-        self.parameters: s2c.ReadOnlyDict = s2c.get_class_with_defaults(reporter_class_name, schema_json=reporters_object.get_schema_json())
+        self.parameters: s2c.ReadOnlyDict = get_class_with_defaults(reporter_class_name,
+                                                                    schema_json=reporters_object.get_schema_json())
         if report_filter is not None:
             self._set_report_filter_parameters(report_filter=report_filter, reporter_class_name=reporter_class_name)
 
@@ -371,12 +377,22 @@ class Reporters(InputFilesList):
         self._schema_json = None
 
         if self.schema_path:
-            with open(self.schema_path) as schema_file:
-                self._schema_json = json.load(schema_file)
+            self._schema_json = load_schema(self.schema_path)
 
     def __len__(self):
         return len(self.builtin_reporters) + len(self.config_reporters)
 
+    def __deepcopy__(self, memo):
+        # The schema and the schema nodes of the reporter parameters are read-only, so copies share them
+        if self._schema_json is not None:
+            memo.setdefault(id(self._schema_json), self._schema_json)
+        for reporter in self.builtin_reporters:
+            share_schema_nodes(reporter.parameters, memo)
+        result = self.__class__.__new__(self.__class__)
+        memo[id(self)] = result
+        result.__setstate__(copy.deepcopy(self.__getstate__(), memo))
+        return result
+
     def get_schema_json(self) -> dict:
         if not self._schema_json:
             raise ValueError("schema_path is not set.")
@@ -398,50 +414,15 @@ class Reporters(InputFilesList):
 
         self._register_listening_events(reporter)
 
-    @staticmethod
-    def _find_builtin_events(schema, reporter_key, events_key):
-        if isinstance(schema, dict):
-            if reporter_key in schema:
-                events_entry = schema[reporter_key]
-                if isinstance(events_entry, dict):
-                    events_param = events_entry.get(events_key)
-                    if isinstance(events_param, dict):
-                        builtin = events_param.get("Built-in")
-                        if isinstance(builtin, list):
-                            return builtin
-                        enum = events_param.get("enum")
-                        if isinstance(enum, list):
-                            return enum
-                return None
-            for value in schema.values():
-                result = Reporters._find_builtin_events(value, reporter_key, events_key)
-                if result is not None:
-                    return result
-        elif isinstance(schema, list):
-            for item in schema:
-                result = Reporters._find_builtin_events(item, reporter_key, events_key)
-                if result is not None:
-                    return result
-        return None
+    def get_schema_index(self) -> SchemaIndex:
+        """
+        Return the precomputed lookups (built-in events, class definitions, ...) for this object's schema.
+        """
+        return get_schema_index(self.get_schema_json())
 
     def get_builtin_events(self) -> dict:
-        schema_json = self.get_schema_json()
-        result = {
-            "individual": [],
-            "node": [],
-            "coordinator": [],
-        }
-        found = self._find_builtin_events(schema_json, "ReportEventRecorder", "Report_Event_Recorder_Events")
-        if found:
-            result["individual"] = found
-        found = self._find_builtin_events(schema_json, "ReportEventRecorderNode", "Report_Node_Event_Recorder_Events")
-        if found:
-            result["node"] = found
-        found = self._find_builtin_events(schema_json, "ReportEventRecorderCoordinator",
-                                          "Report_Coordinator_Event_Recorder_Events")
-        if found:
-            result["coordinator"] = found
-        return result
+        schema_index = self.get_schema_index()
+        return {level: schema_index.get_builtin_events(level) for level in (INDIVIDUAL, NODE, COORDINATOR)}
 
     def _register_listening_events(self, reporter: AbstractBaseReporter) -> None:
         if not hasattr(reporter, '_event_level') or not hasattr(reporter, '_event_list'):
@@ -0,0 +1,144 @@
+"""
+Content-addressed deduplication of the transient (per-simulation) assets of a sweep.
+
+A sweep over config parameters still creates a campaign.json and a custom_reports.json for every simulation, and most
+of them are identical. With ``EMODTask.deduplicate_transient_assets = True`` every simulation copied from the task
+passes its transient assets through one `TransientAssetStore`. The store keys assets by file name and MD5 checksum and
+hands back the first asset it saw with that content, so identical files are held, and checksummed, once.
+
+`EMODTask.promote_shared_transient_assets` goes one step further: it gathers the transient assets of all simulations
+of an experiment before the experiment is created and moves the files that are identical in every simulation to the
+experiment's common assets. EMOD finds them in the Assets directory through the ``--input-path`` of the command line.
+
+Both return an `AssetDeduplicationReport` with the number of bytes saved.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from idmtools.assets import Asset, AssetCollection
+
+
+@dataclass
+class AssetDeduplicationReport:
+    """
+    Summary of the transient assets of a sweep.
+
+    Attributes:
+        simulations: Number of simulations whose transient assets went through the store.
+        assets: Number of transient assets of all simulations, counting identical files once per simulation.
+        unique_assets: Number of distinct (file name, content) pairs.
+        total_bytes: Size of the transient assets of all simulations.
+        stored_bytes: Size of the distinct assets, i.e. what is held after deduplication.
+        promoted: File names moved to the common assets because all simulations have the same content.
+        promoted_bytes: Size of the promoted files, counted once.
+    """
+    simulations: int = 0
+    assets: int = 0
+    unique_assets: int = 0
+    total_bytes: int = 0
+    stored_bytes: int = 0
+    promoted: List[str] = field(default_factory=list)
+    promoted_bytes: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes not held (or uploaded) again because the content was identical to another simulation's."""
+        return self.total_bytes - self.stored_bytes
+
+    def __str__(self):
+        return (f"{self.simulations} simulations, {self.assets} transient assets ({self.total_bytes} bytes), "
+                f"{self.unique_assets} unique ({self.stored_bytes} bytes), {self.bytes_saved} bytes saved, "
+                f"{len(self.promoted)} promoted to common assets ({self.promoted_bytes} bytes)")
+
+
+def _asset_key(asset: Asset) -> Tuple[str, str]:
+    return asset.relative_path or "", asset.filename
+
+
+class TransientAssetStore:
+    """
+    Content-addressed store of the transient assets of the simulations copied from one task.
+
+    The store is shared, not copied, when the tasks are copied.
+    """
+
+    def __init__(self):
+        self._assets: Dict[Tuple[str, str, str], Asset] = {}
+        self._counts: Dict[Tuple[str, str, str], int] = {}
+        self._sizes: Dict[Tuple[str, str, str], int] = {}
+        self._checksums: Dict[Tuple[str, str], set] = {}
+        self._promoted: Dict[Tuple[str, str], str] = {}
+        self._promoted_bytes = 0
+        self.simulations = 0
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def deduplicate(self, assets: AssetCollection) -> AssetCollection:
+        """
+        Replace the assets of one simulation with the stored assets of identical content, and drop the ones promoted
+        to the common assets.
+
+        Args:
+            assets: The transient assets of a simulation. Modified in place.
+
+        Returns:
+            assets
+        """
+        self.simulations += 1
+        deduplicated = []
+        for asset in assets.assets:
+            key = _asset_key(asset)
+            checksum = asset.calculate_checksum()
+            content_key = key + (checksum,)
+            stored = self._assets.get(content_key)
+            if stored is None:
+                stored = self._assets[content_key] = asset
+                self._counts[content_key] = 0
+                self._sizes[content_key] = len(asset.bytes)
+                self._checksums.setdefault(key, set()).add(checksum)
+            self._counts[content_key] += 1
+            if self._promoted.get(key) != checksum:
+                deduplicated.append(stored)
+        assets.assets = deduplicated
+        return assets
+
+    def shared_assets(self, excluded: Tuple[str, ...] = ()) -> List[Asset]:
+        """
+        Return the assets that every simulation seen so far has, with the same content.
+
+        Args:
+            excluded: File names that must stay with the simulations.
+        """
+        shared = []
+        for (relative_path, filename, checksum), count in self._counts.items():
+            if (count == self.simulations and not relative_path and filename not in excluded
+                    and len(self._checksums[(relative_path, filename)]) == 1):
+                shared.append(self._assets[(relative_path, filename, checksum)])
+        return shared
+
+    def promote(self, asset: Asset) -> None:
+        """
+        Record that asset was moved to the common assets. Later calls to `deduplicate` drop it.
+        """
+        key = _asset_key(asset)
+        if key not in self._promoted:
+            self._promoted[key] = asset.calculate_checksum()
+            self._promoted_bytes += self._sizes[key + (self._promoted[key],)]
+
+    def is_promoted(self, asset: Asset) -> bool:
+        """Return True if asset, with this content, was moved to the common assets."""
+        return self._promoted.get(_asset_key(asset)) == asset.calculate_checksum()
+
+    def report(self) -> AssetDeduplicationReport:
+        """
+        Return the summary of the assets that went through the store.
+        """
+        return AssetDeduplicationReport(
+            simulations=self.simulations,
+            assets=sum(self._counts.values()),
+            unique_assets=len(self._assets),
+            total_bytes=sum(self._sizes[key] * count for key, count in self._counts.items()),
+            stored_bytes=sum(self._sizes.values()),
+            promoted=sorted(filename for _, filename in self._promoted),
+            promoted_bytes=self._promoted_bytes)
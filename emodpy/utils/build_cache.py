@@ -0,0 +1,411 @@
+"""
+On-disk cache of the tasks built by `EMODTask.from_defaults`.
+
+Calibration loops rebuild the same task many times: same schema, same builder functions, same arguments. With
+``EMODTask.from_defaults(..., build_cache=directory)`` the built task is stored in directory and the next build with
+the same inputs restores it without running the builders.
+
+An entry is keyed by a hash of:
+
+- the content of the schema,
+- the builder functions: their bytecode, constants, default arguments, closure values, the arguments bound with
+  ``functools.partial``, and the values of the global names they use, functions being fingerprinted the same way.
+  numpy arrays and pandas objects are keyed by their content, other objects by their repr and pickle,
+- the other arguments of ``from_defaults``, and the size and modification time of the files they point to,
+- the versions of Python, emodpy and emod-api.
+
+Modules and classes are keyed by name: changes to the functions a builder calls through a module (e.g.
+``helpers.add_vaccine(...)``) or to the attributes of a class are not detected; clear the cache after changing them.
+A builder whose arguments or globals have no stable representation (e.g. an object printed with its memory address
+or truncated) or cannot be pickled is not cached.
+
+Each entry is a pickle of the task holding the config, the campaign, the reporters and the input file lists. The
+parts of the schema the task references are stored as references and shared with the schema cache again when the
+entry is loaded, and the demographics and migration files generated by the demographics builder are stored by
+content. The cache is bounded: the least recently used entries are removed once the entries take more than
+``max_bytes``.
+"""
+import hashlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+import types
+from collections import namedtuple
+from functools import partial
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from idmtools.assets import Asset
+
+from emodpy.utils.schema_cache import load_schema_entry
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 ** 3
+_FORMAT_VERSION = 1
+_ENTRY_SUFFIX = ".pickle"
+
+BuildCacheInfo = namedtuple("BuildCacheInfo", ["hits", "misses", "entries", "bytes", "max_bytes"])
+
+
+class UncacheableBuildError(ValueError):
+    """Raised when the inputs of a build have no stable representation to key the cache with."""
+
+
+def _package_version(name: str) -> str:
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class _Fingerprint:
+    """
+    Feeds a stable representation of values and callables into a hash.
+    """
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self._seen = set()
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def _update(self, *parts: Any) -> None:
+        for part in parts:
+            self._hash.update(part if isinstance(part, bytes) else repr(part).encode())
+            self._hash.update(b"\0")
+
+    def add(self, value: Any) -> None:
+        # Not imported here: a value can only be an array or a DataFrame if they were imported by the caller
+        numpy = sys.modules.get("numpy")
+        pandas = sys.modules.get("pandas")
+        if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+            self._update(type(value).__name__, value)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+            self._update(type(value).__name__, len(items))
+            for item in items:
+                self.add(item)
+        elif isinstance(value, dict):
+            self._update("dict", len(value))
+            for key, item in value.items():
+                self.add(key)
+                self.add(item)
+        elif isinstance(value, Path):
+            self._update("path", str(value))
+        elif isinstance(value, types.ModuleType):
+            self._update("module", value.__name__)
+        elif isinstance(value, type):
+            self._update("class", value.__module__, value.__qualname__)
+        elif numpy is not None and isinstance(value, numpy.ndarray):
+            self._update("ndarray", value.dtype, value.shape)
+            if value.dtype.hasobject:
+                self.add(value.tolist())
+            else:
+                self._update(numpy.ascontiguousarray(value).tobytes())
+        elif pandas is not None and isinstance(value, pandas.DataFrame):
+            self._update("DataFrame", len(value.columns))
+            self.add(value.index)
+            for name, column in value.items():
+                self.add(name)
+                self._update(str(column.dtype))
+                self.add(column.to_numpy())
+        elif pandas is not None and isinstance(value, (pandas.Series, pandas.Index)):
+            self._update(type(value).__name__)
+            self.add(value.name if isinstance(value, pandas.Series) else value.names)
+            if isinstance(value, pandas.Series):
+                self.add(value.index)
+            self._update(str(value.dtype))
+            self.add(value.to_numpy())
+        elif callable(value):
+            self.add_callable(value)
+        else:
+            # An object printed with its memory address, or truncated like large containers, has no stable
+            # representation. The pickle holds the attributes the repr leaves out.
+            text = repr(value)
+            if " at 0x" in text or "..." in text:
+                raise UncacheableBuildError(f"{text} has no stable representation.")
+            try:
+                content = pickle.dumps(value, protocol=4)
+            except Exception as error:
+                raise UncacheableBuildError(f"{text} cannot be pickled: {error}")
+            self._update(type(value).__module__, type(value).__qualname__, text, content)
+
+    def add_callable(self, function: Any) -> None:
+        if isinstance(function, partial):
+            self._update("partial")
+            self.add_callable(function.func)
+            self.add(function.args)
+            self.add(function.keywords)
+        elif isinstance(function, types.MethodType):
+            self._update("method")
+            self.add_callable(function.__func__)
+            self.add(function.__self__)
+        elif isinstance(function, types.FunctionType):
+            self._add_function(function)
+        elif isinstance(function, types.BuiltinFunctionType):
+            self._update("builtin", function.__module__, function.__qualname__)
+        elif hasattr(type(function), "__call__") and isinstance(type(function).__call__, types.FunctionType):
+            self._update("callable object")
+            self.add(type(function))
+            self._add_function(type(function).__call__)
+            self.add(vars(function))
+        else:
+            raise UncacheableBuildError(f"{function!r} is not a function the build cache can fingerprint.")
+
+    def _add_function(self, function: types.FunctionType) -> None:
+        self._update("function", function.__module__, function.__qualname__)
+        if function in self._seen:
+            return
+        self._seen.add(function)
+        self._add_code(function.__code__)
+        self.add(function.__defaults__)
+        self.add(function.__kwdefaults__)
+        for cell in function.__closure__ or ():
+            self.add(cell.cell_contents)
+        # The globals the function uses: functions, imported or of the same module, constants and other objects.
+        # Names missing from the globals are builtins or attribute names.
+        for name in sorted(_global_names(function.__code__)):
+            if name in function.__globals__:
+                self._update(name)
+                self.add(function.__globals__[name])
+
+    def _add_code(self, code: types.CodeType) -> None:
+        self._update(code.co_code, code.co_names, code.co_varnames, code.co_argcount, code.co_kwonlyargcount)
+        for constant in code.co_consts:
+            if isinstance(constant, types.CodeType):
+                self._add_code(constant)
+            else:
+                self.add(constant)
+
+
+def _global_names(code: types.CodeType) -> set:
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            names |= _global_names(constant)
+    return names
+
+
+def _file_fingerprints(paths: Union[str, Path, Iterable[Union[str, Path]], None]) -> list:
+    """Return (path, size, modification time) of paths and of the files in the folders among them."""
+    if paths is None:
+        return []
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+    fingerprints = []
+    for path in paths:
+        path = os.path.abspath(os.fspath(path))
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for file in files:
+            stat = os.stat(file) if os.path.exists(file) else None
+            fingerprints.append((file, stat.st_size if stat else None, stat.st_mtime_ns if stat else None))
+    return fingerprints
+
+
+def _schema_node_paths(schema_json: dict) -> Dict[int, tuple]:
+    """Map id() of every dict and list of the schema to its path from the root."""
+    paths = {id(schema_json): ()}
+    stack = [(schema_json, ())]
+    while stack:
+        node, path = stack.pop()
+        items = node.items() if isinstance(node, dict) else enumerate(node)
+        for key, child in items:
+            if isinstance(child, (dict, list)) and id(child) not in paths:
+                paths[id(child)] = path + (key,)
+                stack.append((child, path + (key,)))
+    return paths
+
+
+class _EntryPickler(pickle.Pickler):
+
+    def __init__(self, file, references: Dict[int, tuple]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._references = references
+
+    def persistent_id(self, obj):
+        return self._references.get(id(obj))
+
+
+class _EntryUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, schema_json: dict, shared_objects: Dict[str, Any], assets: List[tuple]):
+        super().__init__(file)
+        self._schema_json = schema_json
+        self._shared_objects = shared_objects
+        self._assets = assets
+
+    def persistent_load(self, pid):
+        kind, value = pid
+        if kind == "schema":
+            node = self._schema_json
+            for key in value:
+                node = node[key]
+            return node
+        elif kind == "shared":
+            return self._shared_objects[value]
+        elif kind == "asset":
+            filename, relative_path, content = self._assets[value]
+            return Asset(filename=filename, relative_path=relative_path, content=content)
+        raise pickle.UnpicklingError(f"Unknown reference {pid!r} in build cache entry.")
+
+
+class BuildCache:
+    """
+    Directory of tasks built by `EMODTask.from_defaults`, bounded in size.
+
+    Args:
+        directory: Folder holding the entries. It is created if needed and may be shared by several processes.
+        max_bytes: Size above which the least recently used entries are removed.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be at least 1, got {max_bytes}.")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+
+    def make_key(self, schema_path: Union[str, Path], builders: Dict[str, Optional[Any]],
+                 arguments: Dict[str, Any], files: Dict[str, Any]) -> Optional[str]:
+        """
+        Return the key of a build, or None if its inputs cannot be fingerprinted.
+
+        Args:
+            schema_path: Path to the schema file; its content is part of the key.
+            builders: Builder functions (or None) by argument name.
+            arguments: Other arguments of the build; their values are part of the key.
+            files: Paths (or lists of paths) of input files and folders; their size and modification time are part
+                of the key.
+        """
+        fingerprint = _Fingerprint()
+        try:
+            fingerprint.add((_FORMAT_VERSION, sys.version_info[:2], _package_version("emodpy"),
+                             _package_version("emod-api")))
+            fingerprint.add(load_schema_entry(schema_path).digest)
+            for name in sorted(builders):
+                fingerprint.add(name)
+                fingerprint.add(builders[name])
+            fingerprint.add(arguments)
+            fingerprint.add({name: _file_fingerprints(paths) for name, paths in files.items()})
+        except UncacheableBuildError as error:
+            logger.debug(f"Not using the build cache: {error}")
+            return None
+        return fingerprint.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key + _ENTRY_SUFFIX)
+
+    def load(self, key: str, schema_path: Union[str, Path], shared_objects: Dict[str, Any] = None) -> Any:
+        """
+        Return the object stored under key, or None if there is no such entry.
+
+        Args:
+            key: The key returned by `make_key`.
+            schema_path: Path to the schema the object references.
+            shared_objects: The objects, by name, that were stored as references with `store`.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as entry_file:
+                assets, payload = pickle.load(entry_file)
+            schema_json = load_schema_entry(schema_path).schema_json
+            value = _EntryUnpickler(io.BytesIO(payload), schema_json, shared_objects or {}, assets).load()
+        except FileNotFoundError:
+            self._misses += 1
+            return None
+        except Exception as error:  # a truncated or stale entry is rebuilt
+            logger.warning(f"Ignoring build cache entry {path}: {error}")
+            self._misses += 1
+            return None
+        os.utime(path)
+        self._hits += 1
+        return value
+
+    def store(self, key: str, value: Any, schema_path: Union[str, Path], shared_objects: Dict[str, Any] = None,
+              generated_assets: Iterable[Asset] = ()) -> bool:
+        """
+        Store value under key.
+
+        Args:
+            key: The key returned by `make_key`.
+            value: The object to store, e.g. a task.
+            schema_path: Path to the schema whose nodes value references. They are stored as references.
+            shared_objects: Objects, by name, stored as references; `load` must be given equal ones.
+            generated_assets: Assets whose file may not exist anymore when the entry is loaded. Their content is
+                stored and they are loaded as assets with content.
+
+        Returns:
+            True if value was stored, False if it cannot be pickled.
+        """
+        schema_entry = load_schema_entry(schema_path)
+        references = {node_id: ("schema", path)
+                      for node_id, path in schema_entry.derived("schema_node_paths", _schema_node_paths).items()}
+        for name, shared in (shared_objects or {}).items():
+            references[id(shared)] = ("shared", name)
+        assets = []
+        for asset in generated_assets:
+            references[id(asset)] = ("asset", len(assets))
+            assets.append((asset.filename, asset.relative_path, asset.bytes))
+
+        buffer = io.BytesIO()
+        try:
+            _EntryPickler(buffer, references).dump(value)
+        except (pickle.PicklingError, TypeError, AttributeError) as error:
+            logger.debug(f"Not storing the build in the cache: {error}")
+            return False
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as entry_file:
+            pickle.dump((assets, buffer.getvalue()), entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(entry_file.name, self._path(key))
+        self._evict()
+        return True
+
+    def _entries(self) -> List[tuple]:
+        entries = []
+        if self.directory.is_dir():
+            for path in self.directory.glob("*" + _ENTRY_SUFFIX):
+                try:
+                    entries.append((path, path.stat()))
+                except FileNotFoundError:  # removed by another process
+                    pass
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime_ns)
+        total = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries[:-1]:  # the newest entry is kept even if it is larger than max_bytes
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+    def info(self) -> BuildCacheInfo:
+        """
+        Return the hit/miss counters of this object and the current size of the cache directory.
+
+        Returns:
+            BuildCacheInfo(hits, misses, entries, bytes, max_bytes)
+        """
+        entries = self._entries()
+        return BuildCacheInfo(self._hits, self._misses, len(entries), sum(stat.st_size for _, stat in entries),
+                              self.max_bytes)
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the hit/miss counters.
+        """
+        for path, _ in self._entries():
+            path.unlink(missing_ok=True)
+        self._hits = 0
+        self._misses = 0
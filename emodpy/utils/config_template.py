@@ -0,0 +1,179 @@
+"""
+Render config.json for the simulations of a sweep from one pre-serialized template.
+
+`EMODTask.gather_transient_assets` finalizes the config of every simulation and serializes it with
+``json.dumps(config, sort_keys=True)``, even when the sweep only changed ``Run_Number``. `ConfigTemplate` finalizes
+and serializes the config of the base simulation once, keeping the serialized text of each parameter. `render` then
+re-serializes only the parameters of a simulation's config that changed and joins the pieces. The result is
+byte-identical to finalizing and serializing the simulation's config.
+
+The changed parameters are found by comparing every parameter with the base config, however it was set: with
+``task.set_parameter()``, as an attribute, with item assignment (``config.parameters["Run_Number"] = 2``) or in place.
+The values a copied config shares with the base config are the same objects, so most comparisons are identity checks,
+much cheaper than finalizing and serializing the config.
+
+A change is only spliced into the template when finalize() would treat it exactly like it treated the base value. For
+anything else, e.g. a change to a parameter other parameters depend on, `render` returns None and the caller falls
+back to finalizing the config.
+"""
+import json
+from typing import Any, Optional
+
+from emod_api import schema_to_class as s2c
+
+from emodpy.utils.copy_on_write import deepcopy_sharing_schema
+
+# Keys of a ReadOnlyDict that finalize() removes
+_INTERNAL_KEYS = ("schema", "explicits", "implicits")
+
+# Parameters that finalize() may remove depending on the value of other parameters
+_INTERVENTION_CONFIGS = ("Actual_IndividualIntervention_Config", "Actual_NodeIntervention_Config")
+
+_UNINITIALIZED_STRING = "UNINITIALIZED STRING"
+
+_PARAMETERS_MARKER = "\0emodpy-config-template-parameters\0"
+
+_MISSING = object()
+
+
+def _same_json(first: Any, second: Any) -> bool:
+    """
+    Return True if first and second serialize to the same JSON. Unlike ==, 1, 1.0 and True are different.
+    """
+    if first is second:
+        return True
+    if type(first) is not type(second):
+        return False
+    if isinstance(first, (list, tuple)):
+        return len(first) == len(second) and all(map(_same_json, first, second))
+    if isinstance(first, dict):
+        return first.keys() == second.keys() and all(_same_json(value, second[key]) for key, value in first.items())
+    return first == second
+
+
+def _is_schema_object(value: Any) -> bool:
+    """
+    Return True if finalize() recurses into value: a ReadOnlyDict with a schema, or a list starting with one.
+    """
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return type(value) is s2c.ReadOnlyDict and "schema" in value
+
+
+def _num_parameters(parameters: s2c.ReadOnlyDict) -> int:
+    return len(parameters) - sum(key in parameters for key in _INTERNAL_KEYS)
+
+
+def _serialize_item(key: str, value: Any) -> str:
+    # Same separators as json.dumps(dict, sort_keys=True)
+    return f"{json.dumps(key)}: {json.dumps(value, sort_keys=True)}"
+
+
+class ConfigTemplate:
+    """
+    The finalized and serialized config of a base simulation, into which the parameters changed by a simulation are
+    spliced.
+
+    Args:
+        config: The schema-backed config of the base simulation, i.e. ``task.config`` of a task made by
+            `EMODTask.from_defaults`. It is copied, the template does not change when config changes afterward.
+
+    Raises:
+        ValueError: If config is not schema-backed, or if it cannot be finalized.
+    """
+
+    def __init__(self, config: s2c.ReadOnlyDict):
+        parameters = config.get("parameters") if isinstance(config, dict) else None
+        if type(parameters) is not s2c.ReadOnlyDict or "schema" not in parameters:
+            raise ValueError("ConfigTemplate needs a config built from a schema, e.g. by EMODTask.from_defaults.")
+
+        self._base = deepcopy_sharing_schema(config)
+        self._base_parameters = self._base["parameters"]
+
+        finalized = deepcopy_sharing_schema(config)
+        finalized_parameters = finalized["parameters"].finalize()
+        self._keys = sorted(finalized_parameters)
+        self._items = {key: _serialize_item(key, finalized_parameters[key]) for key in self._keys}
+
+        # Parameters whose change can make finalize() remove other parameters, or that it may remove itself
+        schema = parameters["schema"]
+        self._fixed = set(_INTERVENTION_CONFIGS)
+        for key in parameters:
+            definition = schema.get(key)
+            if isinstance(definition, dict) and "depends-on" in definition:
+                self._fixed.update(dict(definition["depends-on"]))
+            if key.startswith("logLevel_"):
+                self._fixed.add(key)
+        self._fixed.update(key for key in parameters if key not in self._items)
+        self._num_parameters = _num_parameters(parameters)
+
+        finalized["parameters"] = _PARAMETERS_MARKER
+        self._prefix, self._suffix = json.dumps(finalized, sort_keys=True).split(json.dumps(_PARAMETERS_MARKER))
+
+    def __deepcopy__(self, memo):
+        # The template is never modified, simulations share it
+        return self
+
+    def changed_parameters(self, config: s2c.ReadOnlyDict, parameters: Optional[dict] = None) -> Optional[dict]:
+        """
+        Return the parameters of config whose value differs from the base config, or None if config cannot be
+        rendered from the template.
+
+        Args:
+            config: The config of a simulation, before finalize() is called on it.
+            parameters: Optional parameters to count as set on config, e.g. those pre_creation() sets on a config
+                it has not copied yet. Their values must be those of the base config, or None is returned.
+        """
+        if not isinstance(config, dict) or config.keys() != self._base.keys():
+            return None
+        for key, value in config.items():
+            if key != "parameters" and not _same_json(value, self._base[key]):
+                return None
+        config_parameters = config["parameters"]
+        if type(config_parameters) is not s2c.ReadOnlyDict:
+            return None
+
+        base = self._base_parameters
+        parameters = parameters or {}
+        # Setting a parameter can set the parameters it depends on, only a value the base config has is safe. Like
+        # explicit parameters, finalize() must keep it.
+        if any(key not in self._items or not _same_json(value, base[key]) for key, value in parameters.items()):
+            return None
+        if _num_parameters(config_parameters) != self._num_parameters:
+            return None
+        explicits = config_parameters.get("explicits", ())
+        # finalize() raises when a parameter that was set explicitly is removed, let it do so
+        if any(key not in self._items for key in explicits):
+            return None
+
+        changed = {}
+        for key, value in config_parameters.items():
+            if key in parameters or key in _INTERNAL_KEYS:
+                continue
+            base_value = dict.get(base, key, _MISSING)
+            if value is base_value or _same_json(value, base_value):
+                continue
+            if base_value is _MISSING:
+                return None
+            if key in self._fixed or value == _UNINITIALIZED_STRING or _is_schema_object(value):
+                return None
+            changed[key] = value
+        return changed
+
+    def render(self, config: s2c.ReadOnlyDict, parameters: Optional[dict] = None) -> Optional[str]:
+        """
+        Return ``json.dumps(config, sort_keys=True)`` of config after finalize(), without finalizing config, or None
+        if the changes to config cannot be spliced into the template.
+
+        Args:
+            config: The config of a simulation, before finalize() is called on it. It is not modified.
+            parameters: Optional parameters to count as set on config, see `changed_parameters`.
+        """
+        changed = self.changed_parameters(config, parameters)
+        if changed is None:
+            return None
+        items = self._items
+        if changed:
+            items = dict(items)
+            items.update((key, _serialize_item(key, value)) for key, value in changed.items())
+        return f"{self._prefix}{{{', '.join(map(items.__getitem__, self._keys))}}}{self._suffix}"
@@ -0,0 +1,265 @@
+"""
+Helpers for copying simulations cheaply.
+
+`EMODTask.copy_simulation` runs once per simulation of a sweep. Two things made it expensive:
+
+- Every copy deep-copied read-only schema data: the "schema" nodes of the config and of the built-in reporter
+  parameters, and the whole schema held by `Reporters`. `share_schema_nodes` seeds a deepcopy memo so those nodes are
+  shared instead of copied.
+- Every copy deep-copied the config, campaign, reporters and input file lists, even when the sweep callback only
+  changed one config parameter. In copy-on-write mode (``EMODTask.copy_on_write = True``) these fields are wrapped in
+  a `DeferredCopy` instead and copied the first time the new task accesses them. The base task freezes the fields it
+  shares: it wraps them in a `DeferredCopy` too and copies them the next time it accesses them, so the copies keep
+  the values the fields had when they were made, as in deep copy mode. pre_creation() and
+  gather_transient_assets() read the fields they do not change from the shared objects, and defer the parameters
+  pre_creation() sets on the config until the config is copied. The fields the sweep callback does not change stay
+  shared, except the reporters, whose JSON is written from a copy, and the config, unless it is rendered from a
+  `ConfigTemplate`.
+
+Each copy made by `EMODTask.copy_simulation` carries a `SimulationCopyReport` in ``simulation.task.copy_report``.
+`summarize_copy_reports` aggregates the reports of a whole sweep.
+"""
+import copy
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+from emod_api import schema_to_class as s2c
+
+# EMODTask fields that are copied on first access in copy-on-write mode
+COPY_ON_WRITE_FIELDS = ("config", "campaign", "reporters", "demographics", "migrations", "climate",
+                        "simulation_demographics", "simulation_migrations")
+
+DEEP_COPY = "deep_copy"
+COPY_ON_WRITE = "copy_on_write"
+
+
+def share_schema_nodes(value: Any, memo: dict) -> dict:
+    """
+    Add the read-only "schema" nodes of the ReadOnlyDicts found in value to a deepcopy memo, so that
+    ``copy.deepcopy(value, memo)`` shares them instead of copying them.
+
+    Args:
+        value: A ReadOnlyDict (e.g. task.config or a reporter's parameters), or a dict or list holding them.
+        memo: The memo passed to copy.deepcopy().
+
+    Returns:
+        The memo
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, child in item.items():
+                if key == "schema" and isinstance(item, s2c.ReadOnlyDict):
+                    memo.setdefault(id(child), child)
+                elif isinstance(child, (dict, list)):
+                    stack.append(child)
+        elif isinstance(item, list):
+            stack.extend(child for child in item if isinstance(child, (dict, list)))
+    return memo
+
+
+def deepcopy_sharing_schema(value: Any) -> Any:
+    """
+    Deep copy value, sharing its read-only schema nodes. See `share_schema_nodes`.
+    """
+    return copy.deepcopy(value, share_schema_nodes(value, {}))
+
+
+def set_config_parameters(parameters: Dict[str, Any], config: Union[dict, s2c.ReadOnlyDict]) -> None:
+    """
+    Set parameters in config, a config built from a schema or the plain dict "from_files" reads. The values are
+    copied, parameters may be set in many configs.
+    """
+    for name, value in parameters.items():
+        value = copy.deepcopy(value)
+        if type(config) is dict:
+            config[name] = value
+        else:
+            setattr(config.parameters, name, value)
+
+
+@dataclass
+class SimulationCopyReport:
+    """
+    How a simulation was copied and what it cost.
+
+    Attributes:
+        mode: "deep_copy" or "copy_on_write".
+        copy_seconds: Time spent in copy_simulation.
+        copy_bytes: Memory allocated by copy_simulation, or None when tracemalloc is not tracing.
+        shared_fields: Task fields still shared with the base simulation (copy-on-write mode only).
+        materialized_seconds: Time spent copying each field on first access, by field name (copy-on-write mode only).
+        materialized_bytes: Memory allocated copying each field on first access, by field name. Only recorded while
+            tracemalloc is tracing.
+    """
+    mode: str
+    copy_seconds: float = 0.0
+    copy_bytes: Optional[int] = None
+    shared_fields: set = field(default_factory=set)
+    materialized_seconds: dict = field(default_factory=dict)
+    materialized_bytes: dict = field(default_factory=dict)
+
+    @property
+    def total_seconds(self) -> float:
+        """Time spent copying so far, including fields copied on first access."""
+        return self.copy_seconds + sum(self.materialized_seconds.values())
+
+    @property
+    def total_bytes(self) -> Optional[int]:
+        """Memory allocated copying so far, or None when it was not measured."""
+        if self.copy_bytes is None:
+            return None
+        return self.copy_bytes + sum(self.materialized_bytes.values())
+
+
+class CopyTimer:
+    """
+    Context manager timing a block and, while tracemalloc is tracing, measuring the memory it allocates.
+    """
+
+    def __enter__(self):
+        self.tracing = tracemalloc.is_tracing()
+        self.bytes = None
+        if self.tracing:
+            self._start_bytes = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        if self.tracing:
+            self.bytes = tracemalloc.get_traced_memory()[0] - self._start_bytes
+
+
+class DeferredCopy:
+    """
+    A task field that is still shared with the simulation it was copied from.
+
+    `materialize` returns the copy the field would have had in deep copy mode: a deep copy of source, set as persisted
+    when persisted is True, combined with the other deferred copy through ``getattr(value, merge[0])(other)``, passed
+    to update, then given the config parameters in parameters.
+
+    Reading a field does not need a copy: `shared` is the object the field still shares, which the task reads instead
+    of materializing the field, as long as the pending steps make no difference to what it reads.
+
+    Args:
+        source: The shared object, or another DeferredCopy when copying a copy or adding a step.
+        persisted: Call set_all_persisted() on the copy.
+        merge: Optional (method name, DeferredCopy), e.g. ("extend", experiment demographics).
+        update: Optional function called with the copy, e.g. to set the parameters pre_creation() sets.
+        copy: False when source already belongs to the task, to defer an update of a field that was copied already.
+        parameters: Optional config parameters to set on the copy with `set_config_parameters`.
+    """
+
+    def __init__(self, source: Any, persisted: bool = False, merge: Optional[tuple] = None,
+                 update: Optional[Callable[[Any], Any]] = None, copy: bool = True,
+                 parameters: Optional[Dict[str, Any]] = None):
+        self.source = source
+        self.persisted = persisted
+        self.merge = merge
+        self.update = update
+        self.copy = copy
+        self.parameters = parameters
+
+    def __repr__(self) -> str:
+        return f"DeferredCopy({self.shared!r})"
+
+    @property
+    def shared(self) -> Any:
+        """The object the field shares, not to be modified."""
+        source = self.source
+        while isinstance(source, DeferredCopy):
+            source = source.source
+        return source
+
+    @property
+    def copies(self) -> bool:
+        """False when materialize() only applies steps to an object the task owns."""
+        if isinstance(self.source, DeferredCopy):
+            return self.source.copies
+        return self.copy
+
+    @property
+    def pending_parameters(self) -> Optional[Dict[str, Any]]:
+        """
+        The config parameters materialize() sets on the copy of the shared config, or None when materialize() does
+        more than that.
+        """
+        if isinstance(self.source, DeferredCopy):
+            parameters = self.source.pending_parameters
+        else:
+            parameters = {} if self.copy else None
+        if parameters is None or self.persisted or self.merge is not None or self.update is not None:
+            return None
+        return {**parameters, **(self.parameters or {})}
+
+    def materialize(self) -> Any:
+        if isinstance(self.source, DeferredCopy):
+            value = self.source.materialize()
+        elif self.copy:
+            value = deepcopy_sharing_schema(self.source)
+        else:
+            value = self.source
+        if self.persisted:
+            value.set_all_persisted()
+        if self.merge is not None:
+            method, other = self.merge
+            getattr(value, method)(other.materialize())
+        if self.update is not None:
+            self.update(value)
+        if self.parameters is not None:
+            set_config_parameters(self.parameters, value)
+        return value
+
+    def __deepcopy__(self, memo):
+        if self.copies:
+            # The source is shared by every copy until it is materialized, copying it would defeat the purpose
+            return self
+        # The source belongs to the task being copied
+        result = DeferredCopy.__new__(DeferredCopy)
+        memo[id(self)] = result
+        result.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return result
+
+
+def summarize_copy_reports(reports: Iterable[Union[SimulationCopyReport, Any]]) -> dict:
+    """
+    Aggregate the copy reports of many simulations, e.g. all simulations of an experiment.
+
+    Args:
+        reports: SimulationCopyReport objects, or simulations whose task has a copy_report.
+
+    Returns:
+        Dictionary with the number of copies, their total and mean time, the total memory allocated (None when it was
+        not measured), how many copies materialized each field and how many still share it.
+    """
+    count = 0
+    total_seconds = 0.0
+    total_bytes = 0
+    measured = True
+    materialized = {}
+    shared = {}
+    for report in reports:
+        if not isinstance(report, SimulationCopyReport):
+            report = report.task.copy_report
+        count += 1
+        total_seconds += report.total_seconds
+        if report.total_bytes is None:
+            measured = False
+        else:
+            total_bytes += report.total_bytes
+        for name in report.materialized_seconds:
+            materialized[name] = materialized.get(name, 0) + 1
+        for name in report.shared_fields:
+            shared[name] = shared.get(name, 0) + 1
+    return {
+        "simulations": count,
+        "total_seconds": total_seconds,
+        "mean_seconds": total_seconds / count if count else 0.0,
+        "total_bytes": total_bytes if measured and count else None,
+        "materialized_fields": materialized,
+        "shared_fields": shared,
+    }
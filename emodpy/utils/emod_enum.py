@@ -72,3 +72,14 @@ class MigrationPattern(StrEnum):
 class InterpolationType(StrEnum):
     PIECEWISE_CONSTANT = 'PIECEWISE_CONSTANT'
     LINEAR_INTERPOLATION = 'LINEAR_INTERPOLATION'
+
+
+class DistanceMethod(StrEnum):
+    ELLIPSOIDAL = 'ELLIPSOIDAL'
+    HAVERSINE = 'HAVERSINE'
+
+
+class CoarseningMethod(StrEnum):
+    GRID = 'GRID'
+    ADMIN = 'ADMIN'
+    KMEANS = 'KMEANS'
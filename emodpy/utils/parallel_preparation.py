@@ -0,0 +1,150 @@
+"""
+Render the transient assets (config.json, campaign.json, custom_reports.json, ...) of many simulations in parallel.
+
+Finalizing and serializing the config, campaign and reporters of a simulation is CPU-bound Python, and idmtools does
+it one simulation at a time while it creates them. `prepare_simulations` renders them ahead of time in a pool of
+worker processes and stores the result in ``task.prepared_transient_assets``; `EMODTask.gather_transient_assets`
+then only wraps the prepared content in assets.
+
+Each simulation's task is pickled and sent to a worker. The parts all tasks share with the first one (the schema
+nodes of the config and of the reporters, the config template, and the fields still shared in copy-on-write mode)
+are sent to each worker once, when it starts, and are referenced by the task pickles instead of being copied into
+each of them.
+
+Results come back in the order of the simulations. With ``chunk_size`` the simulations are read, rendered and
+yielded that many at a time, so only one chunk of tasks and rendered assets is in flight at once.
+"""
+import io
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from idmtools.assets import Asset
+from idmtools.entities.simulation import Simulation
+
+from emodpy.utils.asset_deduplication import TransientAssetStore
+from emodpy.utils.copy_on_write import COPY_ON_WRITE_FIELDS, share_schema_nodes
+
+# Objects shared by all tasks, set in each worker process by _init_worker()
+_worker_shared_objects = []
+
+
+class _SharedObjectPickler(pickle.Pickler):
+    """
+    Pickles the objects of a shared table as references to their position in the table.
+    """
+
+    def __init__(self, file, shared_ids: dict):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._shared_ids = shared_ids
+
+    def persistent_id(self, obj):
+        return self._shared_ids.get(id(obj))
+
+
+class _SharedObjectUnpickler(pickle.Unpickler):
+
+    def persistent_load(self, pid):
+        return _worker_shared_objects[pid]
+
+
+def _shared_objects(task, include_fields: bool) -> list:
+    """
+    Return the objects of task that the tasks copied from it share instead of copying. The fields shared in
+    copy-on-write mode are only included with include_fields, as workers modify the task they render.
+    """
+    memo = {}
+    config = task.__dict__.get("config")
+    if config:
+        share_schema_nodes(config, memo)
+    reporters = task.__dict__.get("reporters")
+    if reporters is not None:
+        if reporters._schema_json is not None:
+            memo[id(reporters._schema_json)] = reporters._schema_json
+        for reporter in reporters.builtin_reporters:
+            share_schema_nodes(reporter.parameters, memo)
+    for name in COPY_ON_WRITE_FIELDS if include_fields else ():
+        if name in task.__dict__:
+            memo[id(task.__dict__[name])] = task.__dict__[name]
+    for value in (task.config_template, task.asset_store):
+        if value is not None:
+            memo[id(value)] = value
+    return list(memo.values())
+
+
+def _init_worker(shared_objects: bytes) -> None:
+    global _worker_shared_objects
+    _worker_shared_objects = pickle.loads(shared_objects)
+
+
+def _render_transient_assets(payload: bytes) -> List[Tuple[str, Optional[str], bytes]]:
+    """
+    Unpickle a task, prepare it like pre_creation() does and return its transient assets as
+    (filename, relative_path, content) tuples.
+    """
+    task = _SharedObjectUnpickler(io.BytesIO(payload)).load()
+    if not task._transient_assets_promoted:
+        task._prepare_inputs()
+    return [(asset.filename, asset.relative_path, asset.bytes) for asset in task.gather_transient_assets()]
+
+
+def _pickle_task(task, shared_ids: dict) -> bytes:
+    buffer = io.BytesIO()
+    _SharedObjectPickler(buffer, shared_ids).dump(task)
+    return buffer.getvalue()
+
+
+def prepare_simulations(simulations: Iterable[Simulation], max_workers: Optional[int] = None,
+                        chunk_size: Optional[int] = None, base_task=None) -> Iterator[Simulation]:
+    """
+    Render the transient assets of simulations in a pool of worker processes.
+
+    The simulations must not be changed after they are prepared; their assets are rendered from their state at
+    this point.
+
+    Args:
+        simulations: Simulations whose task is an EMODTask, e.g. ``experiment.simulations``. Simulations that were
+            already prepared or created are skipped.
+        max_workers: Number of worker processes. Defaults to the number of CPUs.
+        chunk_size: When set, read and render the simulations this many at a time, yielding each chunk before
+            reading the next one. When not set, all simulations are read first.
+        base_task: The task the simulations were copied from, not the task of one of the simulations. Defaults to
+            the task of the first simulation, whose copy-on-write fields are then not shared.
+
+    Returns:
+        Iterator over the simulations, in the same order, with ``task.prepared_transient_assets`` set.
+    """
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}.")
+    simulations = iter(simulations)
+    first_chunk = list(islice(simulations, chunk_size)) if chunk_size else list(simulations)
+    if not first_chunk:
+        return
+
+    # The store deduplicates in the main process; workers do not need it
+    if base_task is not None:
+        shared_objects = _shared_objects(base_task, include_fields=True)
+    else:
+        shared_objects = _shared_objects(first_chunk[0].task, include_fields=False)
+    shared_ids = {id(value): index for index, value in enumerate(shared_objects)}
+    worker_objects = [None if isinstance(value, TransientAssetStore) else value for value in shared_objects]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(pickle.dumps(worker_objects, protocol=pickle.HIGHEST_PROTOCOL),)) as executor:
+        chunk = first_chunk
+        while chunk:
+            pending = [simulation for simulation in chunk
+                       if simulation.status is None and simulation.task.prepared_transient_assets is None]
+            payloads = [_pickle_task(simulation.task, shared_ids) for simulation in pending]
+            batch = max(1, len(payloads) // (max_workers * 4))
+            results = executor.map(_render_transient_assets, payloads, chunksize=batch)
+            del payloads  # the pool holds the pickles until the workers take them
+            for simulation, assets in zip(pending, results):
+                simulation.task.prepared_transient_assets = [
+                    Asset(filename=filename, relative_path=relative_path, content=content)
+                    for filename, relative_path, content in assets]
+            yield from chunk
+            chunk = list(islice(simulations, chunk_size)) if chunk_size else []
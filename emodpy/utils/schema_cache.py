@@ -0,0 +1,252 @@
+"""
+Process-wide cache of parsed EMOD schema files.
+
+Building a task from defaults needs the schema in three places: the default config, the campaign module and the
+Reporters object. Each of those used to ``json.load`` the same multi-megabyte file. All of them now go through
+`load_schema`, which parses a given schema once and hands out the same dictionary afterwards.
+
+Entries are keyed by the schema's absolute path, modification time and a hash of its content, so editing or
+regenerating a schema file is picked up automatically, and two paths holding identical content share one parsed
+copy. The cache is bounded; the least recently used schema is dropped once ``maxsize`` distinct schemas are held.
+
+The parsed schema dictionaries are shared between every consumer and must be treated as read-only.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+from typing import Any, Callable, Union
+
+DEFAULT_MAXSIZE = 4
+
+SchemaCacheInfo = namedtuple("SchemaCacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class SchemaEntry:
+    """
+    One parsed schema held by the `SchemaCache`.
+
+    Args:
+        path: Absolute path of the file the schema was first read from.
+        digest: SHA-256 hex digest of the schema file content.
+        schema_json: The parsed schema dictionary.
+    """
+
+    def __init__(self, path: str, digest: str, schema_json: dict):
+        self.path = path
+        self.digest = digest
+        self.schema_json = schema_json
+        self.latest_copy = None
+        self._derived = {}
+        self._lock = threading.RLock()
+
+    def derived(self, key: str, factory: Callable[[dict], Any]) -> Any:
+        """
+        Return a value computed from this schema, computing it with factory(schema_json) on first use.
+
+        This lets consumers memoize expensive schema-derived structures (default config, lookup tables, ...) for
+        exactly as long as the schema itself stays cached.
+
+        Args:
+            key: Name of the derived value.
+            factory: Callable taking the schema dictionary and returning the value to store.
+
+        Returns:
+            The stored value.
+        """
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory(self.schema_json)
+            return self._derived[key]
+
+    def copy_schema(self) -> dict:
+        """
+        Return a new copy of the schema dictionary, for a consumer that may modify it.
+
+        The copy is made from a pickle of the schema, faster than parsing the file again. The latest copy is still
+        found by ``SchemaCache.find_entry``, so the values derived from the schema are shared with it; they are
+        derived from the unmodified schema.
+        """
+        copied = pickle.loads(self.derived("pickle", lambda schema_json: pickle.dumps(schema_json,
+                                                                                      pickle.HIGHEST_PROTOCOL)))
+        with self._lock:
+            self.latest_copy = copied
+        return copied
+
+
+class SchemaCache:
+    """
+    Bounded LRU cache of parsed schema files keyed by path, modification time and content hash.
+
+    Args:
+        maxsize: Maximum number of distinct schemas (by content) to hold. Must be at least 1.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}.")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # digest -> SchemaEntry, least recently used first
+        self._stat_keys = {}  # (path, mtime_ns, size) -> digest
+        self._ids = {}  # id(schema_json) -> SchemaEntry
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.RLock()
+
+    def get_entry(self, schema_path: Union[str, Path]) -> SchemaEntry:
+        """
+        Return the cache entry for the schema at schema_path, reading and parsing the file only if needed.
+
+        Args:
+            schema_path: Path to the schema.json file.
+
+        Returns:
+            SchemaEntry for the file's current content.
+        """
+        path = os.path.abspath(os.fspath(schema_path))
+        stat = os.stat(path)
+        stat_key = (path, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            digest = self._stat_keys.get(stat_key)
+            if digest is not None and digest in self._entries:
+                self._entries.move_to_end(digest)
+                self._hits += 1
+                return self._entries[digest]
+
+            with open(path, "rb") as schema_file:
+                content = schema_file.read()
+            digest = hashlib.sha256(content).hexdigest()
+
+            # The file changed (or was never seen); forget the stale key of this path.
+            for key in [k for k in self._stat_keys if k[0] == path]:
+                del self._stat_keys[key]
+            self._stat_keys[stat_key] = digest
+
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self._hits += 1
+                return self._entries[digest]
+
+            self._misses += 1
+            entry = SchemaEntry(path=path, digest=digest, schema_json=json.loads(content))
+            self._entries[digest] = entry
+            self._ids[id(entry.schema_json)] = entry
+            while len(self._entries) > self.maxsize:
+                self._evict_oldest()
+            return entry
+
+    def get(self, schema_path: Union[str, Path]) -> dict:
+        """
+        Return the parsed schema at schema_path.
+
+        Args:
+            schema_path: Path to the schema.json file.
+
+        Returns:
+            The parsed schema dictionary. It is shared and must not be modified.
+        """
+        return self.get_entry(schema_path).schema_json
+
+    def find_entry(self, schema_json: dict) -> Union[SchemaEntry, None]:
+        """
+        Return the entry owning an already parsed schema dictionary, or None if it was not loaded by this cache.
+
+        Args:
+            schema_json: A schema dictionary, e.g. the one returned by ``emod_api.campaign.get_schema()``. The
+                latest copy returned by ``SchemaEntry.copy_schema`` belongs to its entry.
+
+        Returns:
+            SchemaEntry or None
+        """
+        with self._lock:
+            entry = self._ids.get(id(schema_json))
+            if entry is not None and entry.schema_json is schema_json:
+                return entry
+            for entry in self._entries.values():
+                if entry.latest_copy is schema_json:
+                    return entry
+            return None
+
+    def info(self) -> SchemaCacheInfo:
+        """
+        Return the hit/miss counters and current size of the cache.
+
+        Returns:
+            SchemaCacheInfo(hits, misses, maxsize, currsize)
+        """
+        with self._lock:
+            return SchemaCacheInfo(self._hits, self._misses, self.maxsize, len(self._entries))
+
+    def clear(self) -> None:
+        """
+        Drop every cached schema and reset the hit/miss counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._stat_keys.clear()
+            self._ids.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def _evict_oldest(self) -> None:
+        digest, entry = self._entries.popitem(last=False)
+        self._ids.pop(id(entry.schema_json), None)
+        for key in [k for k, v in self._stat_keys.items() if v == digest]:
+            del self._stat_keys[key]
+
+
+_schema_cache = SchemaCache()
+
+
+def get_schema_cache() -> SchemaCache:
+    """
+    Return the process-wide SchemaCache shared by EMODTask, the campaign builder and Reporters.
+    """
+    return _schema_cache
+
+
+def load_schema(schema_path: Union[str, Path]) -> dict:
+    """
+    Return the parsed schema at schema_path from the process-wide cache.
+
+    Args:
+        schema_path: Path to the schema.json file.
+
+    Returns:
+        The parsed schema dictionary. It is shared and must not be modified.
+    """
+    return _schema_cache.get(schema_path)
+
+
+def load_schema_entry(schema_path: Union[str, Path]) -> SchemaEntry:
+    """
+    Return the process-wide cache entry for the schema at schema_path.
+
+    Args:
+        schema_path: Path to the schema.json file.
+
+    Returns:
+        SchemaEntry
+    """
+    return _schema_cache.get_entry(schema_path)
+
+
+def schema_cache_info() -> SchemaCacheInfo:
+    """
+    Return the hit/miss counters of the process-wide schema cache.
+
+    Returns:
+        SchemaCacheInfo(hits, misses, maxsize, currsize)
+    """
+    return _schema_cache.info()
+
+
+def clear_schema_cache() -> None:
+    """
+    Empty the process-wide schema cache and reset its counters.
+    """
+    _schema_cache.clear()
@@ -0,0 +1,296 @@
+"""
+Lookup tables derived from an EMOD schema.
+
+The schema is a deeply nested document, and questions such as "which built-in individual events exist?", "is this a
+config parameter?" or "where is the definition of class X?" used to be answered by walking it again every time.
+`SchemaIndex` walks it once and answers those questions with dictionary and set lookups.
+
+The index also keeps one default "prototype" object per class. `get_class_with_defaults` returns a copy of the
+prototype instead of resolving the class defaults from the schema again, which is what every intervention, event
+coordinator, event, waning config, targeting config and reporter does when it is created.
+
+Use `get_schema_index` or `load_schema_index` to get the index of a schema. The index of a schema loaded through
+`emodpy.utils.schema_cache` is built once and lives as long as the schema stays cached.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Union
+
+from emod_api import schema_to_class as s2c
+from emod_api.campaign import _find_builtin_events
+
+from emodpy.utils.schema_cache import DEFAULT_MAXSIZE, get_schema_cache, load_schema_entry
+
+INDIVIDUAL = "individual"
+NODE = "node"
+COORDINATOR = "coordinator"
+
+# (reporter class, parameter listing its events) used to find the built-in events of each level
+_BUILTIN_EVENT_SOURCES = {
+    INDIVIDUAL: ("ReportEventRecorder", "Report_Event_Recorder_Events"),
+    NODE: ("ReportEventRecorderNode", "Report_Node_Event_Recorder_Events"),
+    COORDINATOR: ("ReportEventRecorderCoordinator", "Report_Coordinator_Event_Recorder_Events"),
+}
+
+# Groups of idmTypes searched for a class definition, in the same order as
+# emod_api.schema_to_class.get_class_with_defaults() searches them.
+_CLASS_GROUPS = [
+    "idmAbstractType:CampaignEvent",
+    "idmAbstractType:EventCoordinator",
+    "idmAbstractType:IReport",
+    "idmType:IReport",
+    "idmAbstractType:NodeSet",
+    "idmAbstractType:WaningEffect",
+    "idmType:WaningEffect",
+    "idmAbstractType:AdditionalRestrictions",
+    "idmType:AdditionalRestrictions",
+    "idmAbstractType:IndividualIntervention",
+    "idmAbstractType:NodeIntervention",
+]
+_INTERVENTION_GROUP = "idmAbstractType:Intervention"
+_INDIVIDUAL_INTERVENTION_GROUP = "idmAbstractType:IndividualIntervention"
+_NODE_INTERVENTION_GROUP = "idmAbstractType:NodeIntervention"
+
+
+def _copy_prototype(value):
+    """
+    Copy a default object made by schema_to_class. Containers are copied all the way down, except the "schema" node of
+    each ReadOnlyDict, which is a read-only part of the schema and stays shared just like in the original.
+    """
+    if type(value) is s2c.ReadOnlyDict:
+        copied = s2c.ReadOnlyDict()
+        for key, item in value.items():
+            copied[key] = item if key == "schema" else _copy_prototype(item)
+        return copied
+    elif type(value) is dict:
+        return {key: _copy_prototype(item) for key, item in value.items()}
+    elif type(value) is list:
+        return [_copy_prototype(item) for item in value]
+    return value
+
+
+class SchemaIndex:
+    """
+    Precomputed lookups over one schema: class definitions, built-in events per level, config parameters and
+    intervention class names.
+
+    Args:
+        schema_json: The parsed schema. It is referenced, not copied, and must not be modified.
+    """
+
+    def __init__(self, schema_json: dict):
+        self.schema_json = schema_json
+        idm_types = schema_json.get("idmTypes", {})
+
+        self._class_definitions = {}
+        for group in _CLASS_GROUPS:
+            for class_name, definition in idm_types.get(group, {}).items():
+                self._class_definitions.setdefault(class_name, definition)
+        for type_name, definition in idm_types.items():
+            if type_name.startswith("idmType:"):
+                self._class_definitions.setdefault(type_name, definition)
+        for group in idm_types.get(_INTERVENTION_GROUP, {}).values():
+            for class_name, definition in group.items():
+                self._class_definitions.setdefault(class_name, definition)
+
+        interventions = idm_types.get(_INTERVENTION_GROUP, {})
+        self._individual_interventions = frozenset(interventions.get(_INDIVIDUAL_INTERVENTION_GROUP, {}))
+        self._node_interventions = frozenset(interventions.get(_NODE_INTERVENTION_GROUP, {}))
+
+        self._builtin_events = {}
+        for level, (reporter_key, events_key) in _BUILTIN_EVENT_SOURCES.items():
+            self._builtin_events[level] = tuple(_find_builtin_events(schema_json, reporter_key, events_key) or [])
+        self._builtin_event_sets = {level: frozenset(events) for level, events in self._builtin_events.items()}
+
+        self._prototypes = {}
+
+        # Later groups win, as in default_from_schema_no_validation.get_default_config_from_schema()
+        self._config_parameters = {}
+        for group in schema_json.get("config", {}).values():
+            for name, definition in group.items():
+                if name != "class":
+                    self._config_parameters[name] = definition
+
+    # Classes
+
+    def has_class(self, class_name: str) -> bool:
+        """
+        Return True if class_name is a campaign, reporter or idmType class defined in the schema.
+        """
+        return class_name in self._class_definitions
+
+    def get_class_definition(self, class_name: str) -> dict:
+        """
+        Return the schema definition of class_name.
+
+        Raises:
+            ValueError: If class_name is not in the schema.
+        """
+        try:
+            return self._class_definitions[class_name]
+        except KeyError:
+            raise ValueError(f"Failed to find {class_name} in schema.")
+
+    def class_has_parameter(self, class_name: str, parameter: str) -> bool:
+        """
+        Return True if class_name is in the schema and has the parameter.
+        """
+        definition = self._class_definitions.get(class_name)
+        return isinstance(definition, dict) and parameter in definition
+
+    def get_class_with_defaults(self, class_name: str) -> Union[s2c.ReadOnlyDict, dict, list, Any]:
+        """
+        Return a new object of class_name with the schema defaults set.
+
+        The result is equal to ``emod_api.schema_to_class.get_class_with_defaults(class_name, schema_json=...)``; the
+        defaults are resolved from the schema once per class and copied after that.
+
+        Raises:
+            ValueError: If class_name is not in the schema.
+        """
+        prototype = self._prototypes.get(class_name)
+        if prototype is None:
+            prototype = s2c.get_class_with_defaults(class_name, schema_json=self.schema_json)
+            self._prototypes[class_name] = prototype
+        return _copy_prototype(prototype)
+
+    @property
+    def class_names(self) -> frozenset:
+        """All class names that have a definition in the schema."""
+        return frozenset(self._class_definitions)
+
+    # Interventions
+
+    def is_individual_intervention(self, class_name: str) -> bool:
+        """Return True if class_name is an individual-level intervention."""
+        return class_name in self._individual_interventions
+
+    def is_node_intervention(self, class_name: str) -> bool:
+        """Return True if class_name is a node-level intervention."""
+        return class_name in self._node_interventions
+
+    @property
+    def individual_intervention_names(self) -> frozenset:
+        """Names of all individual-level interventions in the schema."""
+        return self._individual_interventions
+
+    @property
+    def node_intervention_names(self) -> frozenset:
+        """Names of all node-level interventions in the schema."""
+        return self._node_interventions
+
+    # Events
+
+    def get_builtin_events(self, level: str) -> list[str]:
+        """
+        Return the built-in events of a level in schema order.
+
+        Args:
+            level: "individual", "node" or "coordinator"
+        """
+        return list(self._builtin_events[level])
+
+    def builtin_event_set(self, level: str) -> frozenset:
+        """
+        Return the built-in events of a level as a frozenset.
+
+        Args:
+            level: "individual", "node" or "coordinator"
+        """
+        return self._builtin_event_sets[level]
+
+    def is_builtin_event(self, level: str, event: str) -> bool:
+        """
+        Return True if event is a built-in event of the level.
+        """
+        return event in self._builtin_event_sets[level]
+
+    # Config parameters
+
+    def has_config_parameter(self, name: str) -> bool:
+        """Return True if name is a config.json parameter in the schema."""
+        return name in self._config_parameters
+
+    def get_config_parameter(self, name: str) -> dict:
+        """
+        Return the schema definition (type, default, min, max, enum, depends-on, ...) of a config parameter.
+
+        Raises:
+            ValueError: If name is not a config parameter.
+        """
+        try:
+            return self._config_parameters[name]
+        except KeyError:
+            raise ValueError(f"Parameter '{name}' not a valid parameter based on schema.")
+
+    def get_config_parameter_type(self, name: str) -> Union[str, None]:
+        """Return the schema type of a config parameter, or None if the schema does not give one."""
+        return self.get_config_parameter(name).get("type")
+
+    def get_config_parameter_range(self, name: str) -> tuple:
+        """Return (min, max) of a config parameter; either is None when the schema does not give it."""
+        definition = self.get_config_parameter(name)
+        return definition.get("min"), definition.get("max")
+
+    @property
+    def config_parameter_names(self) -> frozenset:
+        """Names of all config.json parameters in the schema."""
+        return frozenset(self._config_parameters)
+
+
+# Indexes of schemas that did not come from the schema cache, e.g. a schema loaded by
+# emod_api.campaign.set_schema(). The schema is held with its index so its id cannot be reused.
+_uncached_indexes = OrderedDict()
+
+
+def get_schema_index(schema_json: dict) -> SchemaIndex:
+    """
+    Return the SchemaIndex of a parsed schema, building it only the first time it is asked for.
+
+    Args:
+        schema_json: The parsed schema, e.g. from ``campaign.get_schema()`` or ``Reporters.get_schema_json()``.
+
+    Returns:
+        SchemaIndex
+    """
+    entry = get_schema_cache().find_entry(schema_json)
+    if entry is not None:
+        return entry.derived("schema_index", SchemaIndex)
+
+    key = id(schema_json)
+    cached = _uncached_indexes.get(key)
+    if cached is not None and cached[0] is schema_json:
+        _uncached_indexes.move_to_end(key)
+        return cached[1]
+    index = SchemaIndex(schema_json)
+    _uncached_indexes[key] = (schema_json, index)
+    while len(_uncached_indexes) > DEFAULT_MAXSIZE:
+        _uncached_indexes.popitem(last=False)
+    return index
+
+
+def load_schema_index(schema_path: Union[str, Path]) -> SchemaIndex:
+    """
+    Return the SchemaIndex of the schema file at schema_path, loading the schema through the schema cache.
+
+    Args:
+        schema_path: Path to the schema.json file.
+
+    Returns:
+        SchemaIndex
+    """
+    return load_schema_entry(schema_path).derived("schema_index", SchemaIndex)
+
+
+def get_class_with_defaults(class_name: str, schema_json: dict) -> Union[s2c.ReadOnlyDict, dict, list, Any]:
+    """
+    Drop-in replacement for ``emod_api.schema_to_class.get_class_with_defaults`` that copies a per-schema prototype.
+
+    Args:
+        class_name: Name of the class, e.g. "SimpleVaccine" or "idmType:AgeAndProbability".
+        schema_json: The parsed schema, e.g. from ``campaign.get_schema()``.
+
+    Returns:
+        A new object with the schema defaults, equal to what emod_api would return.
+    """
+    return get_schema_index(schema_json).get_class_with_defaults(class_name)
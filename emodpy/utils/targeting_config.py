@@ -119,8 +119,8 @@ then you expect A_prime to be the inverse of A but you don't expect A to have ch
 import copy
 from abc import ABC
 from abc import abstractmethod
-import emod_api.schema_to_class as s2c
 from emodpy.utils import validate_key_value_pair, validate_intervention_name
+from emodpy.utils.schema_index import get_class_with_defaults
 
 
 class AbstractTargetingConfig(ABC):
@@ -204,7 +204,7 @@ class AbstractTargetingConfig(ABC):
         Returns:
             (ReadOnlyDict): Dict object created by schema_to_class
         """
-        tc_obj = s2c.get_class_with_defaults(self.class_name, schema_json=campaign.get_schema())
+        tc_obj = get_class_with_defaults(self.class_name, schema_json=campaign.get_schema())
         tc_obj.Is_Equal_To = self.is_equal_to
         return tc_obj
 
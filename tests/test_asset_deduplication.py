@@ -0,0 +1,161 @@
+import unittest
+
+import pytest
+import emod_api.campaign as api_campaign
+from idmtools.assets import Asset, AssetCollection
+from idmtools.builders import SimulationBuilder
+from idmtools.entities.experiment import Experiment
+from idmtools.entities.simulation import Simulation
+from idmtools.entities.templated_simulation import TemplatedSimulations
+
+from emodpy.emod_task import EMODTask
+from emodpy.reporters.common import ReportEventCounter
+from emodpy.utils.asset_deduplication import TransientAssetStore
+
+from tests import helpers
+
+
+class LinuxPlatform:
+    """The part of a platform used by Simulation.pre_creation()"""
+
+    def is_windows_platform(self, item=None):
+        return False
+
+    def get_platform_python(self):
+        return "python3"
+
+
+def _report_builder(reporters):
+    reporters.add(ReportEventCounter(reporters_object=reporters, event_list=["NewInfectionEvent"]))
+    return reporters
+
+
+def _filenames(assets):
+    return sorted(asset.filename for asset in assets)
+
+
+@pytest.mark.unit
+class TestTransientAssetStore(unittest.TestCase):
+
+    def test_identical_content_is_stored_once(self):
+        store = TransientAssetStore()
+        collections = []
+        for content in ["same", "same", "other"]:
+            assets = AssetCollection([Asset(filename="campaign.json", content=content),
+                                      Asset(filename="custom_reports.json", content="reports")])
+            collections.append(store.deduplicate(assets))
+        self.assertIs(collections[0].assets[0], collections[1].assets[0])
+        self.assertIsNot(collections[0].assets[0], collections[2].assets[0])
+        self.assertEqual(collections[2].assets[0].bytes, b"other")
+
+        report = store.report()
+        self.assertEqual(report.simulations, 3)
+        self.assertEqual(report.assets, 6)
+        self.assertEqual(report.unique_assets, 3)
+        self.assertEqual(report.total_bytes, 4 + 4 + 5 + 3 * 7)
+        self.assertEqual(report.bytes_saved, 4 + 2 * 7)
+
+        shared = store.shared_assets()
+        self.assertEqual(_filenames(shared), ["custom_reports.json"])
+        self.assertEqual(store.shared_assets(excluded=("custom_reports.json",)), [])
+
+    def test_promoted_assets_are_dropped(self):
+        store = TransientAssetStore()
+        store.deduplicate(AssetCollection([Asset(filename="campaign.json", content="same")]))
+        store.promote(store.shared_assets()[0])
+        assets = store.deduplicate(AssetCollection([Asset(filename="campaign.json", content="same")]))
+        self.assertEqual(assets.assets, [])
+        # A simulation with different content keeps its own file
+        assets = store.deduplicate(AssetCollection([Asset(filename="campaign.json", content="new")]))
+        self.assertEqual(_filenames(assets), ["campaign.json"])
+        self.assertEqual(store.report().promoted, ["campaign.json"])
+
+
+@pytest.mark.unit
+class TestEMODTaskAssetDeduplication(unittest.TestCase):
+
+    def setUp(self):
+        builders = helpers.BuildersCommon
+        self.task = EMODTask.from_defaults(schema_path=builders.schema_path,
+                                           eradication_path=builders.eradication_path,
+                                           config_builder=builders.config_builder,
+                                           campaign_builder=builders.campaign_builder,
+                                           report_builder=_report_builder)
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def make_experiment(self, values):
+        templated = TemplatedSimulations(base_task=self.task)
+        builder = SimulationBuilder()
+        builder.add_sweep_definition(EMODTask.set_parameter_partial("Run_Number"), values)
+        templated.add_builder(builder)
+        return Experiment.from_template(templated)
+
+    def test_copied_simulations_share_assets(self):
+        self.task.deduplicate_transient_assets = True
+        base_simulation = Simulation(task=self.task)
+        simulations = [self.task.copy_simulation(base_simulation) for _ in range(3)]
+        for i, simulation in enumerate(simulations):
+            simulation.task.set_parameter("Run_Number", i)
+            simulation.task.pre_creation(simulation, LinuxPlatform())
+            simulation.task.gather_transient_assets()
+        campaigns = [simulation.task.transient_assets.get_one(filename="campaign.json") for simulation in simulations]
+        self.assertIs(campaigns[0], campaigns[2])
+        report = self.task.asset_store.report()
+        self.assertEqual(report.simulations, 3)
+        self.assertEqual(report.unique_assets, 3 + 2)  # one config.json per simulation
+        self.assertGreater(report.bytes_saved, 0)
+
+    def test_promote_shared_transient_assets(self):
+        experiment = self.make_experiment([1, 2, 3])
+        report = self.task.promote_shared_transient_assets(experiment, LinuxPlatform())
+        self.assertEqual(report.simulations, 3)
+        self.assertEqual(report.promoted, ["campaign.json", "custom_reports.json"])
+        self.assertEqual(report.promoted_bytes,
+                         sum(len(asset.bytes) for asset in experiment.assets
+                             if asset.filename in report.promoted))
+        self.assertIn(self.task.executable_name, _filenames(experiment.assets))
+
+        simulations = list(experiment.simulations)
+        self.assertEqual(len(simulations), 3)
+        self.assertFalse(experiment.gather_common_assets_from_task)
+        for simulation in simulations:
+            self.assertEqual(_filenames(simulation.assets), ["config.json"])
+            # Preparing the simulation again, as the platform does, keeps it as it is
+            simulation.pre_creation(LinuxPlatform())
+            self.assertEqual(_filenames(simulation.assets), ["config.json"])
+        run_numbers = {simulation.assets.get_one(filename="config.json").bytes.count(b'"Run_Number": 2')
+                       for simulation in simulations}
+        self.assertEqual(run_numbers, {0, 1})
+
+    def test_pre_creation_is_repeated_without_promotion(self):
+        simulation = self.task.copy_simulation(Simulation(task=self.task))
+        simulation.task.pre_creation(simulation, LinuxPlatform())
+        simulation.task.is_linux = False
+        simulation.task.pre_creation(simulation, LinuxPlatform())
+        self.assertTrue(simulation.task.is_linux)
+
+    def test_experiment_does_not_gather_common_assets_of_listed_simulations(self):
+        experiment = self.make_experiment([1, 2])
+        self.task.promote_shared_transient_assets(experiment, LinuxPlatform())
+        gathered = []
+        for simulation in experiment.simulations:
+            simulation.task.gather_common_assets = lambda: gathered.append(1)
+        experiment.pre_creation(LinuxPlatform())
+        self.assertEqual(gathered, [])
+
+    def test_different_assets_are_not_promoted(self):
+        def set_campaign_start(simulation, value):
+            simulation.task.campaign.events[0]["Start_Day"] = value
+            return {"Start_Day": value}
+
+        templated = TemplatedSimulations(base_task=self.task)
+        builder = SimulationBuilder()
+        builder.add_sweep_definition(set_campaign_start, [2, 3])
+        templated.add_builder(builder)
+        experiment = Experiment.from_template(templated)
+        report = self.task.promote_shared_transient_assets(experiment, LinuxPlatform())
+        self.assertEqual(report.promoted, ["custom_reports.json"])
+        for simulation in experiment.simulations:
+            self.assertEqual(_filenames(simulation.assets), ["campaign.json", "config.json"])
@@ -0,0 +1,164 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from functools import partial
+
+import numpy as np
+import pytest
+import emod_api.campaign as api_campaign
+
+from emodpy.emod_task import EMODTask
+from emodpy.utils.build_cache import BuildCache
+
+from tests import helpers
+
+
+class _Counter:
+    # The build cache keys on the name of a class, not on the calls it records
+    calls = []
+
+
+_calls = _Counter.calls
+_settings = {"duration": 80}
+_durations = np.full(10000, 80.0)
+
+
+def _counting_config_builder(config, duration=80):
+    _Counter.calls.append(duration)
+    config = helpers.BuildersCommon.config_builder(config)
+    config.parameters.Simulation_Duration = duration
+    return config
+
+
+def _finalized_config(task):
+    return json.dumps(copy.deepcopy(task.config).parameters.finalize(), sort_keys=True)
+
+
+@pytest.mark.unit
+class TestBuildCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = BuildCache(self.directory)
+        _calls.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        api_campaign.reset()
+
+    def build(self, config_builder=_counting_config_builder, build_cache=None, **kwargs):
+        builders = helpers.BuildersCommon
+        return EMODTask.from_defaults(schema_path=kwargs.pop("schema_path", builders.schema_path),
+                                      eradication_path=builders.eradication_path,
+                                      config_builder=config_builder,
+                                      campaign_builder=builders.campaign_builder,
+                                      report_builder=builders.reports_builder,
+                                      build_cache=build_cache if build_cache is not None else self.cache,
+                                      **kwargs)
+
+    def test_hit_skips_builders(self):
+        built = self.build()
+        restored = self.build()
+        self.assertEqual(_calls, [80])
+        self.assertEqual(self.cache.info()[:3], (1, 1, 1))
+        self.assertIsNot(restored, built)
+        self.assertEqual(_finalized_config(restored), _finalized_config(built))
+        self.assertEqual(restored.campaign.json, built.campaign.json)
+        self.assertEqual(restored.reporters.json, built.reporters.json)
+        # The schema is shared with the schema cache again instead of being copied into each task
+        self.assertIs(restored.reporters._schema_json, built.reporters._schema_json)
+        restored.set_parameter("Run_Number", 5)
+        self.assertEqual(restored.config.parameters.Run_Number, 5)
+
+    def test_changed_inputs_miss(self):
+        self.build()
+        self.build(config_builder=partial(_counting_config_builder, duration=40))
+        self.build(config_builder=partial(_counting_config_builder, duration=40))
+        self.build(campaign_context=True)
+        self.assertEqual(_calls, [80, 40, 80])
+
+        schema_path = os.path.join(self.directory, "schema.json")
+        with open(helpers.BuildersCommon.schema_path) as source, open(schema_path, "w") as target:
+            target.write(source.read() + "\n")
+        self.build(schema_path=schema_path)
+        self.assertEqual(len(_calls), 4)
+
+    def test_changed_code_miss(self):
+        def make_builder(duration):
+            def builder(config):
+                return _counting_config_builder(config, duration)
+            return builder
+        self.build(config_builder=make_builder(10))
+        self.build(config_builder=make_builder(10))
+        self.build(config_builder=make_builder(20))
+        self.assertEqual(_calls, [10, 20])
+
+    def test_changed_globals_miss(self):
+        def builder(config):
+            return _counting_config_builder(config, _settings["duration"])
+        self.build(config_builder=builder)
+        _settings["duration"] = 30
+        try:
+            self.build(config_builder=builder)
+        finally:
+            _settings["duration"] = 80
+        self.build(config_builder=builder)
+        self.assertEqual(_calls, [80, 30])
+
+    def test_changed_array_miss(self):
+        # The repr of the array is the same, it is truncated
+        def builder(config):
+            return _counting_config_builder(config, int(_durations[5000]))
+        self.build(config_builder=builder)
+        _durations[5000] = 30
+        try:
+            self.build(config_builder=builder)
+        finally:
+            _durations[5000] = 80
+        self.build(config_builder=builder)
+        self.assertEqual(_calls, [80, 30])
+
+    def test_unstable_arguments_are_not_cached(self):
+        builder = partial(lambda config, marker: _counting_config_builder(config), marker=object())
+        self.build(config_builder=builder)
+        self.build(config_builder=builder)
+        self.assertEqual(len(_calls), 2)
+        self.assertEqual(self.cache.info().entries, 0)
+
+    def test_generated_files_are_stored(self):
+        built = self.build(demographics_builder=helpers.BuildersCommon.demographics_builder)
+        restored = self.build(demographics_builder=helpers.BuildersCommon.demographics_builder)
+        self.assertEqual(len(_calls), 1)
+        demographics = restored.common_assets.get_one(filename="demographics.json")
+        self.assertIsNone(demographics.absolute_path)
+        self.assertEqual(demographics.bytes, built.common_assets.get_one(filename="demographics.json").bytes)
+
+    def test_eviction(self):
+        self.build()
+        size = self.cache.info().bytes
+        cache = BuildCache(self.directory, max_bytes=size + size // 2)
+        self.build(config_builder=partial(_counting_config_builder, duration=40), build_cache=cache)
+        self.assertEqual(cache.info().entries, 1)
+        self.build(config_builder=partial(_counting_config_builder, duration=40), build_cache=cache)
+        self.build(build_cache=cache)
+        self.assertEqual(_calls, [80, 40, 80])
+        with self.assertRaises(ValueError):
+            BuildCache(self.directory, max_bytes=0)
+
+    def test_corrupt_entry_is_rebuilt(self):
+        self.build()
+        for name in os.listdir(self.directory):
+            with open(os.path.join(self.directory, name), "wb") as entry_file:
+                entry_file.write(b"not a pickle")
+        self.build()
+        self.build()
+        self.assertEqual(len(_calls), 2)
+        self.cache.clear()
+        self.assertEqual(self.cache.info(), (0, 0, 0, 0, self.cache.max_bytes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import emod_api.campaign as api_campaign
+
+from emodpy.campaign.campaign_context import CampaignContext, is_campaign
+from emodpy.campaign.distributor import add_intervention_triggered
+from emodpy.campaign.individual_intervention import BroadcastEvent
+from emodpy.emod_task import EMODTask
+
+from tests import helpers
+
+
+def _triggered_builder(campaign, event="Vaccinated"):
+    add_intervention_triggered(campaign, intervention_list=[BroadcastEvent(campaign, event)],
+                               triggers_list=["NewInfectionEvent"], start_day=1)
+    add_intervention_triggered(campaign, intervention_list=[BroadcastEvent(campaign, "Done")],
+                               triggers_list=[event], start_day=1)
+    return campaign
+
+
+def _from_defaults(campaign_builder, campaign_context):
+    builders = helpers.BuildersCommon
+    return EMODTask.from_defaults(schema_path=builders.schema_path,
+                                  eradication_path=builders.eradication_path,
+                                  config_builder=builders.config_builder,
+                                  campaign_builder=campaign_builder,
+                                  campaign_context=campaign_context)
+
+
+def _campaign_json(task):
+    return json.dumps(task.campaign.json, sort_keys=True)
+
+
+@pytest.mark.unit
+class TestCampaignContext(unittest.TestCase):
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def test_same_campaign_as_module(self):
+        for builder in [helpers.BuildersCommon.campaign_builder, _triggered_builder]:
+            with self.subTest(builder=builder.__name__):
+                tasks = [_from_defaults(builder, campaign_context) for campaign_context in [False, True]]
+                self.assertEqual(_campaign_json(tasks[0]), _campaign_json(tasks[1]))
+                self.assertEqual(sorted(tasks[0].config.parameters.Custom_Individual_Events),
+                                 sorted(tasks[1].config.parameters.Custom_Individual_Events))
+        self.assertIn("Vaccinated", tasks[1].config.parameters.Custom_Individual_Events)
+
+    def test_module_is_not_used(self):
+        api_campaign.campaign_dict["Events"].append({"class": "CampaignEvent"})
+        task = _from_defaults(_triggered_builder, campaign_context=True)
+        self.assertEqual(len(task.campaign.events), 2)
+        self.assertEqual(api_campaign.campaign_dict["Events"], [{"class": "CampaignEvent"}])
+        self.assertEqual(api_campaign.individual_events_broadcast, [])
+
+    def test_concurrent_campaigns(self):
+        events = [f"Event_{i}" for i in range(8)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            campaigns = list(executor.map(lambda event: _triggered_builder(
+                CampaignContext(helpers.BuildersCommon.schema_path), event), events))
+        for event, campaign in zip(events, campaigns):
+            self.assertEqual(len(campaign.campaign_dict["Events"]), 2)
+            self.assertEqual(sorted(campaign.validate_custom_individual_events()), sorted(["Done", event]))
+            self.assertEqual(campaign.individual_events_listened, ["NewInfectionEvent", event])
+        self.assertIs(campaigns[0].get_schema(), campaigns[1].get_schema())
+
+    def test_validation(self):
+        campaign = CampaignContext(helpers.BuildersCommon.schema_path)
+        self.assertIn("NewInfectionEvent", campaign.individual_builtin_events)
+        campaign.get_recv_trigger("Never_Broadcast", old=True)
+        with self.assertRaises(ValueError):
+            campaign.validate_custom_individual_events()
+        with self.assertRaises(ValueError):
+            campaign.set_broadcast_node_event("")
+        campaign.reset()
+        self.assertEqual(campaign.validate_custom_individual_events(), [])
+        self.assertIsNotNone(campaign.get_schema())
+
+    def test_save(self):
+        campaign = _triggered_builder(CampaignContext(helpers.BuildersCommon.schema_path))
+        with tempfile.TemporaryDirectory() as directory:
+            filename = campaign.save(os.path.join(directory, "campaign.json"))
+            with open(filename) as file:
+                self.assertEqual(len(json.load(file)["Events"]), 2)
+
+    def test_is_campaign(self):
+        self.assertTrue(is_campaign(api_campaign))
+        self.assertTrue(is_campaign(CampaignContext()))
+        self.assertFalse(is_campaign(None))
+        with self.assertRaises(ValueError):
+            _from_defaults(lambda campaign: None, campaign_context=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
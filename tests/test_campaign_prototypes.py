@@ -0,0 +1,124 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+import pytest
+import emod_api.campaign as api_campaign
+from emod_api import schema_to_class as s2c
+
+from emodpy.campaign.common import TargetDemographicsConfig, RepetitionConfig
+from emodpy.campaign.distributor import add_intervention_scheduled
+from emodpy.campaign.individual_intervention import BroadcastEvent, SimpleVaccine, CommonInterventionParameters
+import emodpy.campaign.waning_config as waning_config
+from emodpy.emod_task import EMODTask
+from emodpy.utils.schema_index import SchemaIndex, get_class_with_defaults, load_schema_index
+
+from tests import manifest
+from tests import helpers  # noqa: F401 - makes sure the schema files are downloaded
+
+
+def _emod_api_get_class_with_defaults(self, class_name):
+    return s2c.get_class_with_defaults(class_name, schema_json=self.schema_json)
+
+
+def _build_campaign(schema_path, num_events):
+    campaign = EMODTask.build_default_campaign(schema_path)
+    for i in range(num_events):
+        waning = waning_config.BoxExponential(box_duration=25, decay_time_constant=60, initial_effect=0.89)
+        vaccine = SimpleVaccine(campaign,
+                                waning_config=waning,
+                                common_intervention_parameters=CommonInterventionParameters(cost=0.5))
+        add_intervention_scheduled(campaign,
+                                   intervention_list=[vaccine, BroadcastEvent(campaign, "GotVaccine")],
+                                   start_day=i,
+                                   node_ids=[1, 2],
+                                   target_demographics_config=TargetDemographicsConfig(demographic_coverage=0.5),
+                                   repetition_config=RepetitionConfig(number_repetitions=2,
+                                                                      timesteps_between_repetitions=30))
+    campaign_json = json.dumps(campaign.campaign_dict)
+    api_campaign.reset()
+    return campaign_json
+
+
+class BasePrototypeTest:
+    schema_path = None
+
+    def setUp(self):
+        self.index = load_schema_index(self.schema_path)
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def test_every_class_matches_emod_api(self):
+        for class_name in sorted(self.index.class_names):
+            try:
+                expected = s2c.get_class_with_defaults(class_name, schema_json=self.index.schema_json)
+            except ValueError:
+                with self.assertRaises(ValueError):
+                    self.index.get_class_with_defaults(class_name)
+                continue
+            for _ in range(2):
+                observed = self.index.get_class_with_defaults(class_name)
+                self.assertEqual(type(observed), type(expected), class_name)
+                self.assertEqual(json.dumps(observed), json.dumps(expected), class_name)
+
+    def test_copies_are_independent(self):
+        first = get_class_with_defaults("SimpleVaccine", schema_json=self.index.schema_json)
+        first.Cost_To_Consumer = 5
+        first.Waning_Config["Initial_Effect"] = 0.1
+        first.Disqualifying_Properties.append("A:B")
+        second = get_class_with_defaults("SimpleVaccine", schema_json=self.index.schema_json)
+        self.assertNotEqual(second.Cost_To_Consumer, 5)
+        self.assertEqual(second.Disqualifying_Properties, [])
+        self.assertNotIn("explicits", second)
+        self.assertIs(first["schema"], second["schema"])
+        self.assertEqual(json.dumps(second),
+                         json.dumps(s2c.get_class_with_defaults("SimpleVaccine", schema_json=self.index.schema_json)))
+
+    def test_unknown_class_raises(self):
+        with self.assertRaises(ValueError):
+            self.index.get_class_with_defaults("NotAClass_XYZ")
+
+    def test_campaign_json_is_identical(self):
+        observed = _build_campaign(self.schema_path, num_events=20)
+        with mock.patch.object(SchemaIndex, "get_class_with_defaults", _emod_api_get_class_with_defaults):
+            expected = _build_campaign(self.schema_path, num_events=20)
+        self.assertEqual(observed, expected)
+
+
+@pytest.mark.unit
+class TestPrototypesCommon(BasePrototypeTest, unittest.TestCase):
+    schema_path = manifest.common_schema_path
+
+
+@pytest.mark.unit
+class TestPrototypesMalaria(BasePrototypeTest, unittest.TestCase):
+    schema_path = manifest.malaria_schema_path
+
+
+@pytest.mark.unit
+class TestPrototypesHIV(BasePrototypeTest, unittest.TestCase):
+    schema_path = manifest.hiv_schema_path
+
+
+@pytest.mark.long
+class TestPrototypesBenchmark(unittest.TestCase):
+
+    def test_benchmark_10k_event_campaign(self):
+        schema_path = manifest.common_schema_path
+        num_events = 10000
+        load_schema_index(schema_path)  # load the schema outside of the timed sections
+
+        start = time.perf_counter()
+        observed = _build_campaign(schema_path, num_events)
+        prototype_seconds = time.perf_counter() - start
+
+        with mock.patch.object(SchemaIndex, "get_class_with_defaults", _emod_api_get_class_with_defaults):
+            start = time.perf_counter()
+            expected = _build_campaign(schema_path, num_events)
+            emod_api_seconds = time.perf_counter() - start
+
+        print(f"\n{num_events} events: schema_to_class {emod_api_seconds:.2f}s, "
+              f"prototypes {prototype_seconds:.2f}s, speedup {emod_api_seconds / prototype_seconds:.1f}x")
+        self.assertEqual(observed, expected)
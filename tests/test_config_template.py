@@ -0,0 +1,164 @@
+import copy
+import json
+import unittest
+
+import pytest
+import emod_api.campaign as api_campaign
+from idmtools.entities.simulation import Simulation
+
+from emodpy.emod_task import EMODTask
+from emodpy.reporters.common import ReportEventCounter
+from emodpy.utils.config_template import ConfigTemplate
+
+from tests import helpers
+
+
+class LinuxPlatform:
+    """The part of a platform used by EMODTask.pre_creation()"""
+
+    def is_windows_platform(self, item=None):
+        return False
+
+
+def _report_builder(reporters):
+    reporters.add(ReportEventCounter(reporters_object=reporters, event_list=["NewInfectionEvent"]))
+    return reporters
+
+
+def _config_json(simulation):
+    simulation.task.pre_creation(simulation, LinuxPlatform())
+    simulation.task.gather_transient_assets()
+    return [asset.bytes for asset in simulation.task.transient_assets if asset.filename == "config.json"][0]
+
+
+@pytest.mark.unit
+class TestConfigTemplate(unittest.TestCase):
+
+    def setUp(self):
+        builders = helpers.BuildersCommon
+        self.task = EMODTask.from_defaults(schema_path=builders.schema_path,
+                                           eradication_path=builders.eradication_path,
+                                           config_builder=builders.config_builder,
+                                           campaign_builder=builders.campaign_builder,
+                                           report_builder=_report_builder)
+        self.base_simulation = Simulation(task=self.task)
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def copy(self, use_config_template):
+        self.task.use_config_template = use_config_template
+        return self.task.copy_simulation(self.base_simulation)
+
+    def assert_same_config_json(self, parameters):
+        simulations = [self.copy(use_config_template) for use_config_template in [False, True]]
+        for simulation in simulations:
+            for name, value in parameters.items():
+                simulation.task.set_parameter(name, value)
+        self.assertEqual(_config_json(simulations[0]), _config_json(simulations[1]))
+        # The config is finalized in both cases
+        self.assertEqual(simulations[0].task.config, simulations[1].task.config)
+        return simulations[1]
+
+    def test_sweep_produces_identical_config(self):
+        for parameters in [{},
+                           {"Run_Number": 12},
+                           {"Run_Number": 3, "Base_Infectivity": 0.123, "Simulation_Duration": 50},
+                           {"Incubation_Period_Constant": 8},
+                           {"Enable_Interventions": 0}]:
+            with self.subTest(parameters=parameters):
+                self.assert_same_config_json(parameters)
+
+    def test_changes_are_spliced(self):
+        simulation = self.copy(use_config_template=True)
+        simulation.task.set_parameter("Run_Number", 3)
+        simulation.task.set_parameter("Base_Infectivity", 0.5)
+        simulation.task.pre_creation(simulation, LinuxPlatform())
+        template = simulation.task.config_template
+        self.assertIs(template, self.task.config_template)
+        self.assertEqual(template.changed_parameters(simulation.task.config),
+                         {"Run_Number": 3, "Base_Infectivity": 0.5})
+        config_json = _config_json(simulation)
+        self.assertEqual(json.loads(config_json)["parameters"]["Run_Number"], 3)
+
+        # Like without a template, the config is finalized, when it is next accessed
+        self.assertIn("config", simulation.task._deferred_copies)
+        self.assertNotIn("schema", simulation.task.config.parameters)
+
+    def test_every_parameter_is_compared(self):
+        simulation = self.copy(use_config_template=True)
+        simulation.task.pre_creation(simulation, LinuxPlatform())
+        template = simulation.task.config_template
+        parameters = simulation.task.config.parameters
+        self.assertEqual(template.changed_parameters(simulation.task.config), {})
+
+        # Lists can change in place
+        parameters.Custom_Individual_Events.append("Extra_Event")
+        self.assertEqual(template.changed_parameters(simulation.task.config),
+                         {"Custom_Individual_Events": ["Extra_Event"]})
+
+        # Item assignment is not recorded in the explicits
+        parameters["Run_Number"] = 9
+        self.assertEqual(template.changed_parameters(simulation.task.config)["Run_Number"], 9)
+
+    def test_sweep_with_item_assignment(self):
+        for run_number in [42, 1]:
+            simulations = [self.copy(use_config_template) for use_config_template in [False, True]]
+            for simulation in simulations:
+                simulation.task.config.parameters["Run_Number"] = run_number
+                simulation.task.config.parameters["Base_Infectivity"] = 0.25
+            config_json = _config_json(simulations[1])
+            self.assertEqual(_config_json(simulations[0]), config_json)
+            self.assertEqual(json.loads(config_json)["parameters"]["Run_Number"], run_number)
+
+    def test_dependencies_are_not_spliced(self):
+        simulation = self.copy(use_config_template=True)
+        simulation.task.pre_creation(simulation, LinuxPlatform())
+        self.assertEqual(simulation.task.config_template.changed_parameters(simulation.task.config), {})
+        simulation.task.set_parameter("Incubation_Period_Distribution", "EXPONENTIAL_DISTRIBUTION")
+        self.assertIsNone(simulation.task.config_template.changed_parameters(simulation.task.config))
+
+        simulation = self.copy(use_config_template=True)
+        simulation.task.pre_creation(simulation, LinuxPlatform())
+        simulation.task.set_parameter("Run_Number", 2)
+        simulation.task.config.parameters["Not_A_Parameter"] = 1
+        self.assertIsNone(simulation.task.config_template.render(simulation.task.config))
+
+    def test_disabled_parameter_still_raises(self):
+        for use_config_template in [False, True]:
+            with self.subTest(use_config_template=use_config_template):
+                simulation = self.copy(use_config_template)
+                simulation.task.set_parameter("Incubation_Period_Exponential", 4)
+                with self.assertRaises(ValueError):
+                    simulation.task.gather_transient_assets()
+
+    def test_int_and_float_are_different(self):
+        simulation = self.copy(use_config_template=True)
+        simulation.task.set_parameter("Simulation_Duration", 5.0)
+        simulation.task.pre_creation(simulation, LinuxPlatform())
+        self.assertEqual(simulation.task.config_template.changed_parameters(simulation.task.config),
+                         {"Simulation_Duration": 5.0})
+        self.assertIn('"Simulation_Duration": 5.0', _config_json(simulation).decode())
+
+    def test_template_needs_schema(self):
+        with self.assertRaises(ValueError):
+            ConfigTemplate({"parameters": {"Run_Number": 1}})
+
+        task = EMODTask.from_files(config_path=helpers.BuildersCommon.config_file,
+                                   eradication_path=helpers.BuildersCommon.eradication_path)
+        task.use_config_template = True
+        simulation = task.copy_simulation(Simulation(task=task))
+        self.assertIsNone(simulation.task.config_template)
+        simulation.task.gather_transient_assets()
+
+    def test_template_is_built_with_common_assets(self):
+        # TemplatedSimulations copies the base simulation with copy.deepcopy() after gathering the common assets
+        self.task.use_config_template = True
+        self.task.gather_common_assets()
+        simulation = copy.deepcopy(self.base_simulation)
+        self.assertIs(simulation.task.config_template, self.task.config_template)
+        simulation.task.set_parameter("Run_Number", 5)
+        config_json = _config_json(simulation)
+        self.assertEqual(json.loads(config_json)["parameters"]["Run_Number"], 5)
+        # Rendered from the template, the config is finalized when it is next accessed
+        self.assertIn("config", simulation.task._deferred_copies)
@@ -0,0 +1,229 @@
+import copy
+import pickle
+import time
+import tracemalloc
+import unittest
+from functools import partial
+
+import pytest
+import emod_api.campaign as api_campaign
+from idmtools.entities.simulation import Simulation
+
+from emodpy.emod_task import EMODTask
+from emodpy.reporters.common import ReportEventCounter, ReportNodeDemographics
+from emodpy.utils.copy_on_write import (COPY_ON_WRITE, DEEP_COPY, SimulationCopyReport, deepcopy_sharing_schema,
+                                        summarize_copy_reports)
+
+from tests import helpers
+from tests import manifest
+
+
+class LinuxPlatform:
+    """The part of a platform used by EMODTask.pre_creation()"""
+
+    def is_windows_platform(self, item=None):
+        return False
+
+
+def _report_builder(reporters):
+    reporters.add(ReportEventCounter(reporters_object=reporters, event_list=["NewInfectionEvent"]))
+    reporters.add(ReportNodeDemographics(reporters_object=reporters))
+    return reporters
+
+
+def _transient_assets(simulation):
+    simulation.task.gather_transient_assets()
+    return sorted((asset.filename, asset.bytes) for asset in simulation.task.transient_assets)
+
+
+def _sweep(task, base_simulation, num_simulations):
+    simulations = []
+    for i in range(num_simulations):
+        simulation = task.copy_simulation(base_simulation)
+        simulation.task.set_parameter("Run_Number", i)
+        simulations.append(simulation)
+    return simulations
+
+
+@pytest.mark.unit
+class TestCopyOnWrite(unittest.TestCase):
+
+    def setUp(self):
+        builders = helpers.BuildersCommon
+        self.task = EMODTask.from_defaults(schema_path=builders.schema_path,
+                                           eradication_path=builders.eradication_path,
+                                           config_builder=builders.config_builder,
+                                           campaign_builder=builders.campaign_builder,
+                                           demographics_builder=builders.demographics_builder,
+                                           report_builder=_report_builder)
+        self.base_simulation = Simulation(task=self.task)
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def copy(self, copy_on_write):
+        self.task.copy_on_write = copy_on_write
+        return self.task.copy_simulation(self.base_simulation)
+
+    def test_modes_produce_identical_assets(self):
+        for copy_on_write in [False, True]:
+            with self.subTest(copy_on_write=copy_on_write):
+                deep = self.copy(copy_on_write=False)
+                other = self.copy(copy_on_write=copy_on_write)
+                for simulation in [deep, other]:
+                    simulation.task.set_parameter("Run_Number", 7)
+                self.assertEqual(_transient_assets(deep), _transient_assets(other))
+
+    def test_fields_are_copied_on_first_access(self):
+        simulation = self.copy(copy_on_write=True)
+        report = simulation.task.copy_report
+        self.assertEqual(report.mode, COPY_ON_WRITE)
+        self.assertIn("campaign", report.shared_fields)
+        self.assertNotIn("campaign", simulation.task.__dict__)
+
+        simulation.task.set_parameter("Run_Number", 3)
+        self.assertIn("config", report.materialized_seconds)
+        self.assertNotIn("config", report.shared_fields)
+        self.assertIsNot(simulation.task.config, self.task.config)
+        self.assertNotEqual(self.task.config.parameters.Run_Number, 3)
+
+        simulation.task.campaign.events.clear()
+        self.assertGreater(len(self.task.campaign.events), 0)
+
+    def test_replaced_field_is_not_copied(self):
+        simulation = self.copy(copy_on_write=True)
+        simulation.task.campaign = None
+        self.assertIsNone(simulation.task.campaign)
+        self.assertNotIn("campaign", simulation.task.copy_report.shared_fields)
+        self.assertNotIn("campaign", simulation.task.copy_report.materialized_seconds)
+
+    def test_fields_read_by_pre_creation_stay_shared(self):
+        self.task.use_config_template = True
+        deep = self.copy(copy_on_write=False)
+        simulation = self.copy(copy_on_write=True)
+        for copied in [deep, simulation]:
+            copied.task.pre_creation(copied, LinuxPlatform())
+        self.assertEqual(_transient_assets(deep), _transient_assets(simulation))
+
+        # The config is rendered from the template, the reporters are copied to write custom_reports.json
+        report = simulation.task.copy_report
+        self.assertEqual(set(report.materialized_seconds), {"reporters"})
+        for name in ["config", "campaign", "simulation_demographics", "simulation_migrations"]:
+            self.assertIn(name, report.shared_fields)
+            self.assertNotIn(name, simulation.task.__dict__)
+
+        # pre_creation() set the parameters of the shared config once it is copied
+        self.assertEqual(simulation.task.config.parameters.Custom_Reports_Filename, "custom_reports.json")
+        self.assertNotEqual(self.task.config.parameters.Custom_Reports_Filename, "custom_reports.json")
+
+    def test_copy_is_a_snapshot(self):
+        deep = self.copy(copy_on_write=False)
+        simulation = self.copy(copy_on_write=True)
+        self.task.config.parameters.Run_Number = 99
+        self.task.campaign.events.clear()
+        self.assertNotEqual(simulation.task.config.parameters.Run_Number, 99)
+        self.assertEqual(_transient_assets(deep), _transient_assets(simulation))
+
+        # Copies made after the change see it
+        later = self.copy(copy_on_write=True)
+        self.assertEqual(later.task.config.parameters.Run_Number, 99)
+
+    def test_repr_does_not_copy(self):
+        simulation = self.copy(copy_on_write=True)
+        self.assertIn("DeferredCopy(", repr(simulation.task))
+        self.assertEqual(simulation.task.copy_report.materialized_seconds, {})
+
+        # Comparing copies only the fields the tasks do not share
+        self.assertEqual(simulation.task, self.base_simulation.task)
+        for name in ["config", "campaign"]:
+            self.assertNotIn(name, simulation.task.copy_report.materialized_seconds)
+
+    def test_pending_parameters(self):
+        simulation = self.copy(copy_on_write=True)
+        simulation.task.pre_creation(simulation, LinuxPlatform())
+        deferred = simulation.task._deferred_copies
+        self.assertEqual(deferred["config"].pending_parameters["Custom_Reports_Filename"], "custom_reports.json")
+        self.assertIsNone(deferred["reporters"].pending_parameters)
+
+    def test_copy_of_copy(self):
+        first = self.copy(copy_on_write=True)
+        second = first.task.copy_simulation(first)
+        second.task.set_parameter("Run_Number", 11)
+        self.assertNotEqual(first.task.config.parameters.Run_Number, 11)
+        deep_copy = copy.deepcopy(first)
+        self.assertEqual(_transient_assets(deep_copy), _transient_assets(first))
+
+    def test_copied_task_can_be_pickled(self):
+        simulation = self.copy(copy_on_write=True)
+        task = pickle.loads(pickle.dumps(simulation.task))
+        self.assertEqual(task.campaign.json, self.task.campaign.json)
+
+    def test_schema_is_shared(self):
+        for copy_on_write in [False, True]:
+            with self.subTest(copy_on_write=copy_on_write):
+                simulation = self.copy(copy_on_write=copy_on_write)
+                self.assertIs(simulation.task.config.parameters.schema, self.task.config.parameters.schema)
+                self.assertIs(simulation.task.reporters.get_schema_json(), self.task.reporters.get_schema_json())
+                copied = simulation.task.reporters.builtin_reporters[0].parameters
+                original = self.task.reporters.builtin_reporters[0].parameters
+                self.assertIsNot(copied, original)
+                self.assertIs(copied.schema, original.schema)
+
+    def test_deepcopy_sharing_schema(self):
+        config = deepcopy_sharing_schema(self.task.config)
+        self.assertIs(config.parameters.schema, self.task.config.parameters.schema)
+        config.parameters.Run_Number = 5
+        self.assertNotEqual(self.task.config.parameters.Run_Number, 5)
+
+    def test_copy_report(self):
+        deep = self.copy(copy_on_write=False)
+        self.assertEqual(deep.task.copy_report.mode, DEEP_COPY)
+        self.assertGreater(deep.task.copy_report.copy_seconds, 0)
+        self.assertIsNone(deep.task.copy_report.total_bytes)
+
+        self.task.copy_on_write = True
+        tracemalloc.start()
+        try:
+            simulations = _sweep(self.task, self.base_simulation, 3)
+        finally:
+            tracemalloc.stop()
+        summary = summarize_copy_reports(simulations)
+        self.assertEqual(summary["simulations"], 3)
+        self.assertIsNotNone(summary["total_bytes"])
+        self.assertEqual(summary["materialized_fields"], {"config": 3})
+        self.assertEqual(summary["shared_fields"]["campaign"], 3)
+        self.assertEqual(summarize_copy_reports([SimulationCopyReport(mode=DEEP_COPY)])["total_bytes"], None)
+
+
+@pytest.mark.long
+class TestCopyOnWriteBenchmark(unittest.TestCase):
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def test_benchmark_10k_simulations(self):
+        num_simulations = 10000
+        task = EMODTask.from_defaults(schema_path=manifest.common_schema_path,
+                                      eradication_path=manifest.common_eradication_path,
+                                      campaign_builder=partial(helpers.BuildersCommon.campaign_builder),
+                                      report_builder=_report_builder)
+        base_simulation = Simulation(task=task)
+        results = {}
+        for copy_on_write in [False, True]:
+            task.copy_on_write = copy_on_write
+            tracemalloc.start()
+            start = time.perf_counter()
+            simulations = _sweep(task, base_simulation, num_simulations)
+            seconds = time.perf_counter() - start
+            retained_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            results[copy_on_write] = (seconds, retained_bytes, summarize_copy_reports(simulations),
+                                      _transient_assets(simulations[-1]))
+            del simulations
+
+        for copy_on_write, (seconds, retained_bytes, summary, _) in results.items():
+            mode = COPY_ON_WRITE if copy_on_write else DEEP_COPY
+            print(f"\n{mode}: {num_simulations} simulations in {seconds:.2f}s, "
+                  f"{retained_bytes / num_simulations / 1024:.1f} KiB per simulation, "
+                  f"materialized {summary['materialized_fields']}")
+        self.assertEqual(results[False][3], results[True][3])
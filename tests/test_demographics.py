@@ -1,8 +1,16 @@
+import json
+import os
+import tempfile
 import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
 import pytest
 from typing import List, Callable
 
 from emod_api.demographics.age_distribution import AgeDistribution
+from emod_api.demographics.demographic_exceptions import InvalidNodeIdException
 from emod_api.demographics.node import Node
 from emod_api.demographics.updateable import Updateable
 from emod_api.demographics.mortality_distribution import MortalityDistribution
@@ -10,6 +18,7 @@ from emod_api.demographics.susceptibility_distribution import SusceptibilityDist
 from emodpy.utils.distributions import UniformDistribution
 
 from emodpy.demographics.demographics import Demographics
+from emodpy.demographics.node_table import NodeTable
 
 
 @pytest.mark.unit
@@ -382,5 +391,146 @@ class TestDemographics(unittest.TestCase):
                         msg=str(context.exception))
 
 
+@pytest.mark.unit
+class TestDemographicsFromArrays(unittest.TestCase):
+    def setUp(self) -> None:
+        self.nodes = [Node(lat=1.5, lon=2.5, pop=100, name='one', forced_id=1),
+                      Node(lat=-3.0, lon=4.0, pop=2000, area=12.5, forced_id=7),
+                      Node(lat=0.0, lon=-8.0, pop=0, name='three', forced_id=3)]
+        self.nodes[0].birth_rate = 0.002
+        self.columns = {'node_ids': [1, 7, 3], 'lats': [1.5, -3.0, 0.0], 'lons': [2.5, 4.0, -8.0],
+                        'pops': [100, 2000, 0], 'names': ['one', None, 'three'], 'areas': [None, 12.5, None],
+                        'attributes': {'birth_rate': [0.002, np.nan, None]}}
+
+    def _assert_same_json(self, demographics, expected):
+        actual, expected = demographics.to_dict(), expected.to_dict()
+        for demographics_dict in (actual, expected):
+            demographics_dict['Metadata'].pop('DateCreated')
+        self.assertEqual(actual, expected)
+
+    def test_from_arrays_matches_nodes(self):
+        demographics = Demographics.from_arrays(**self.columns, idref='arrays')
+        self._assert_same_json(demographics, Demographics(nodes=self.nodes, idref='arrays'))
+        # Writing the json does not keep Node objects
+        self.assertIsNone(demographics._nodes)
+        self.assertEqual(demographics.node_ids, [1, 7, 3])
+
+    def test_from_dataframe_matches_nodes(self):
+        dataframe = pd.DataFrame({'id': self.columns['node_ids'], 'lat': self.columns['lats'],
+                                  'lon': self.columns['lons'], 'pop': self.columns['pops'],
+                                  'name': self.columns['names'], 'area': [np.nan, 12.5, np.nan],
+                                  'birth_rate': [0.002, np.nan, np.nan]})
+        demographics = Demographics.from_dataframe(dataframe, idref='arrays')
+        self._assert_same_json(demographics, Demographics(nodes=self.nodes, idref='arrays'))
+
+        with self.assertRaises(ValueError):
+            Demographics.from_dataframe(dataframe.drop(columns='pop'))
+        with self.assertRaises(ValueError):
+            Demographics.from_dataframe(dataframe.assign(colour='red'))
+
+    def test_node_table(self):
+        demographics = Demographics.from_arrays(**self.columns)
+        table = demographics.node_table
+        np.testing.assert_array_equal(table.ids, [1, 7, 3])
+        np.testing.assert_array_equal(table.pops, [100, 2000, 0])
+        with self.assertRaises(ValueError):
+            table.lats[0] = 0.0
+
+        # Same columns from the Node objects
+        from_nodes = Demographics(nodes=self.nodes).node_table
+        for column in ('ids', 'lats', 'lons', 'pops'):
+            np.testing.assert_array_equal(getattr(from_nodes, column), getattr(table, column))
+        self.assertEqual(from_nodes.names.tolist(), ['one', None, 'three'])
+        self.assertEqual(list(from_nodes.attributes), ['birth_rate'])
+
+    def test_nodes_are_built_once_then_kept(self):
+        demographics = Demographics.from_arrays(**self.columns)
+        node = demographics.get_node_by_id(7)
+        self.assertEqual((node.lat, node.lon, node.pop, node.node_attributes.area), (-3.0, 4.0, 2000, 12.5))
+        self.assertIs(demographics.get_node_by_id(7), node)
+
+        node.birth_rate = 0.5
+        self.assertEqual(demographics.to_dict()['Nodes'][1]['NodeAttributes']['BirthRate'], 0.5)
+        self.assertEqual(demographics.node_table.attributes['birth_rate'].tolist(), [0.002, 0.5, None])
+
+    def test_from_arrays_invalid(self):
+        with self.assertRaises(InvalidNodeIdException):
+            Demographics.from_arrays([1, 0], [0, 0], [0, 0], [1, 1])
+        with self.assertRaises(Demographics.DuplicateNodeIdException):
+            Demographics.from_arrays([1, 2, 1], [0, 0, 0], [0, 0, 0], [1, 1, 1])
+        with self.assertRaises(Demographics.DuplicateNodeNameException):
+            Demographics.from_arrays([1, 2], [0, 0], [0, 0], [1, 1], names=['a', 'a'])
+        with self.assertRaises(Demographics.DuplicateNodeNameException):
+            Demographics.from_arrays([1, 2], [0, 0], [0, 0], [1, 1], names=['a', Demographics.DEFAULT_NODE_NAME])
+        with self.assertRaises(ValueError):
+            Demographics.from_arrays([1, 2], [0, 0], [0], [1, 1])
+        with self.assertRaises(ValueError):
+            Demographics.from_arrays([1.5, 2], [0, 0], [0, 0], [1, 1])
+        with self.assertRaises(ValueError):
+            NodeTable([1], [0], [0], [1], attributes={'colour': ['red']})
+
+
+@pytest.mark.unit
+class TestDemographicsToFile(unittest.TestCase):
+    def setUp(self) -> None:
+        nodes = [Node(lat=1.123456789, lon=2.0, pop=100, name='one', forced_id=1),
+                 Node(lat=-3.0, lon=4.0, pop=2000, area=12.5, forced_id=7),
+                 Node(lat=0.0, lon=-8.0, pop=0, name='three', forced_id=3)]
+        self.demographics = Demographics(nodes=nodes, idref='to_file')
+        self.demographics.add_individual_property(property='Place', values=['A', 'B'],
+                                                  initial_distribution=[0.25, 0.75])
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'demographics.json')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _read(self, demographics, **kwargs) -> str:
+        demographics.to_file(self.path, **kwargs)
+        with open(self.path) as src:
+            return src.read()
+
+    def test_same_text_as_json_dump(self):
+        for kwargs, dump_kwargs in [({}, {'indent': 4}),
+                                    ({'indent': None}, {}),
+                                    ({'indent': 2, 'compact': True}, {'indent': 2, 'separators': (',', ':')}),
+                                    ({'indent': None, 'compact': True}, {'separators': (',', ':')})]:
+            with self.subTest(**kwargs):
+                expected = json.dumps(self.demographics.to_dict(), sort_keys=True, **dump_kwargs)
+                self.assertEqual(self._read(self.demographics, **kwargs), expected)
+                # Nodes written over several batches
+                with mock.patch('emodpy.demographics.demographics._NODES_PER_WRITE', 2):
+                    self.assertEqual(self._read(self.demographics, **kwargs), expected)
+
+    def test_no_nodes(self):
+        demographics = Demographics(nodes=[])
+        self.assertEqual(self._read(demographics), json.dumps(demographics.to_dict(), sort_keys=True, indent=4))
+        self.assertEqual(json.loads(self._read(demographics, indent=None))['Nodes'], [])
+
+    def test_from_arrays(self):
+        demographics = Demographics.from_arrays([1, 2], [1.5, 2.5], [3.5, 4.5], [10, 20], names=['a', 'b'])
+        self.assertEqual(self._read(demographics), json.dumps(demographics.to_dict(), sort_keys=True, indent=4))
+        self.assertIsNone(demographics._nodes)
+
+    def test_float_precision(self):
+        written = json.loads(self._read(self.demographics, float_precision=3))
+        expected = self.demographics.to_dict()
+        self.assertEqual(written['Nodes'][0]['NodeAttributes']['Latitude'], 1.12)
+        expected['Nodes'][0]['NodeAttributes']['Latitude'] = 1.12
+        self.assertEqual(written, expected)
+        with self.assertRaises(ValueError):
+            self.demographics.to_file(self.path, float_precision=0)
+
+    def test_subclass_to_dict(self):
+        class TaggedDemographics(Demographics):
+            def to_dict(self) -> dict:
+                demographics_dict = super().to_dict()
+                demographics_dict['Tag'] = 'tagged'
+                return demographics_dict
+
+        demographics = TaggedDemographics(nodes=[Node(lat=0, lon=0, pop=1, forced_id=1)])
+        self.assertEqual(json.loads(self._read(demographics))['Tag'], 'tagged')
+
+
 if __name__ == '__main__':
     unittest.main()
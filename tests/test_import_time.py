@@ -0,0 +1,72 @@
+import subprocess
+import sys
+import unittest
+
+import pytest
+
+# Number of emodpy modules imported by emodpy.emod_task. It is generous so that only real regressions, e.g. a
+# subpackage imported at module level again, make the tests fail.
+EMOD_TASK_EMODPY_MODULES_BUDGET = 25
+# Budgets in seconds, measured with ``python -X importtime``. They depend on the machine, so they are only checked
+# by the long tests.
+EMODPY_IMPORT_BUDGET = 0.1
+EMODPY_MODULES_IMPORT_BUDGET = 0.5
+
+# Dependencies that must only be imported when they are used
+DEFERRED_MODULES = ("matplotlib", "pyproj", "emod_api.demographics", "emodpy.demographics")
+
+
+def _import_times(statement: str) -> dict:
+    """
+    Run statement in a new interpreter and return {module: (self seconds, cumulative seconds)} of the imports.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return times
+
+
+def _deferred_imports(times: dict) -> list:
+    return sorted(name for name in times
+                  if any(name == module or name.startswith(module + ".") for module in DEFERRED_MODULES))
+
+
+@pytest.mark.unit
+class TestImportTime(unittest.TestCase):
+
+    def test_import_emodpy(self):
+        # Only emodpy itself is imported, besides the modules imported by the interpreter at startup
+        self.assertEqual(sorted(set(_import_times("import emodpy")) - set(_import_times("pass"))), ["emodpy"])
+
+    def test_import_emod_task(self):
+        times = _import_times("import emodpy.emod_task")
+        self.assertEqual(_deferred_imports(times), [])
+        self.assertLessEqual(len([name for name in times if name.startswith("emodpy")]),
+                             EMOD_TASK_EMODPY_MODULES_BUDGET)
+
+    def test_import_analyzers(self):
+        times = _import_times("import emodpy.analyzers.population_analyzer, emodpy.analyzers.adult_vectors_analyzer, "
+                              "emodpy.analyzers.timeseries_analyzer")
+        self.assertEqual([name for name in times if name.startswith("matplotlib")], [])
+
+
+@pytest.mark.long
+class TestImportTimeBudget(unittest.TestCase):
+
+    def test_import_emodpy(self):
+        self.assertLess(_import_times("import emodpy")["emodpy"][1], EMODPY_IMPORT_BUDGET)
+
+    def test_import_emod_task(self):
+        times = _import_times("import emodpy.emod_task")
+        emodpy_seconds = sum(self_seconds for name, (self_seconds, _) in times.items()
+                             if name.startswith("emodpy"))
+        self.assertLess(emodpy_seconds, EMODPY_MODULES_IMPORT_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
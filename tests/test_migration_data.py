@@ -1,12 +1,30 @@
+import copy
+import json
 import os
 import tempfile
+import time
+import tracemalloc
 import unittest
+from collections import Counter
+from itertools import groupby
 from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from geographiclib.geodesic import Geodesic
 
 from emod_api.demographics.node import Node
 from emodpy.demographics.demographics import Demographics
+from emodpy.migration.analytics import MigrationAnalytics
+from emodpy.migration.coarsening import coarsen
+from emodpy.migration.distance_cache import DistanceCache
+from emodpy.migration.distances import distance_function
+from emodpy.migration.gravity import GravityModel
+from emodpy.migration.migration_file import MigrationFile, parse_node_offsets
+from emodpy.migration.migration_layers import MigrationLayers
 from emodpy.migration.migration_data import MigrationData, MALE, FEMALE, SAME_FOR_BOTH_GENDERS, ONE_FOR_EACH_GENDER
-from emodpy.utils.emod_enum import MigrationType, MigrationPattern, InterpolationType
+from emodpy.utils.emod_enum import DistanceMethod, MigrationType, MigrationPattern, InterpolationType
 
 
 def _make_demographics(num_nodes=3):
@@ -50,6 +68,24 @@ class TestMigrationDataGravity(unittest.TestCase):
             self.assertIn(key, female_layer)
             self.assertAlmostEqual(female_layer[key], male_rate * 0.5, places=10)
 
+    def test_gravity_from_arrays(self):
+        # Same rates as with Node objects, the nodes of the array-backed demographics are never built
+        demog = _make_demographics(5)
+        table = demog.node_table
+        array_demog = Demographics.from_arrays(table.ids[::-1], table.lats[::-1], table.lons[::-1], table.pops[::-1],
+                                               idref="test_migration")
+        for model, params in ((MigrationData.from_gravity_model, [1e-4, 1, 1, -1]),
+                              (MigrationData.from_radiation_model, 0.1)):
+            self.assertEqual(model(array_demog, params).get_layer(), model(demog, params).get_layer())
+        batch = GravityModel(array_demog).migration_data([1e-4, 1, 1, -1])
+        self.assertEqual(batch.get_layer(), MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1]).get_layer())
+        analytics = MigrationAnalytics(batch, array_demog)
+        np.testing.assert_array_equal(analytics.populations, table.pops)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            array_demog.add_migration(batch, "REGIONAL", filename=os.path.join(tmp, "regional.bin"))
+        self.assertIsNone(array_demog._nodes)
+
     def test_gravity_too_few_nodes(self):
         nodes = [Node(lat=0, lon=0, pop=1000, forced_id=1)]
         demog = Demographics(nodes=nodes, idref="test")
@@ -61,6 +97,76 @@ class TestMigrationDataGravity(unittest.TestCase):
         with self.assertRaises(ValueError):
             MigrationData.from_gravity_model(demog, [1, 1, 1])
 
+    def test_gravity_matches_pairwise_geodesic(self):
+        rng = np.random.default_rng(3)
+        nodes = [Node(lat=float(lat), lon=float(lon), pop=int(pop), forced_id=int(node_id))
+                 for node_id, lat, lon, pop in zip(rng.permutation(np.arange(1, 81)), rng.uniform(-80, 80, 80),
+                                                   rng.uniform(-180, 180, 80), rng.integers(0, 50000, 80))]
+        nodes[1].lat, nodes[1].lon = -nodes[0].lat, nodes[0].lon + 180.0  # antipodal
+        nodes[3].lat, nodes[3].lon = nodes[2].lat, nodes[2].lon  # same location
+        demog = Demographics(nodes=nodes, idref="test")
+        params = [1e-4, 1, 0.8, -1.5]
+
+        expected = {}
+        for src in nodes:
+            for dst in nodes:
+                distance_km = Geodesic.WGS84.Inverse(src.lat, src.lon, dst.lat, dst.lon)["s12"] / 1000.0
+                if src is not dst and src.pop and dst.pop and distance_km:
+                    expected[(src.id, dst.id)] = min(1.0, params[0] * src.pop ** params[1] * dst.pop ** params[2]
+                                                     * distance_km ** params[3])
+
+        for method, tolerance in [(DistanceMethod.ELLIPSOIDAL, 1e-9 * abs(params[3])),
+                                  ("HAVERSINE", 0.006 * abs(params[3]))]:
+            for block_size in [1, 7, 256]:
+                layer = MigrationData.from_gravity_model(demog, params, distance_method=method,
+                                                         block_size=block_size).get_layer()
+                self.assertEqual(layer.keys(), expected.keys())
+                for key, rate in expected.items():
+                    self.assertLessEqual(abs(layer[key] - rate), tolerance * rate)
+
+    def test_gravity_nearby_destinations(self):
+        rng = np.random.default_rng(4)
+        nodes = [Node(lat=float(lat), lon=float(lon), pop=int(pop), forced_id=node_id)
+                 for node_id, (lat, lon, pop) in enumerate(zip(rng.uniform(-60, 60, 150), rng.uniform(-180, 180, 150),
+                                                               rng.integers(0, 50000, 150)), start=1)]
+        nodes[1].lat, nodes[1].lon = nodes[0].lat, nodes[0].lon  # same location
+        demog = Demographics(nodes=nodes, idref="test")
+        params = [1e-4, 1, 1, -1]
+        locations = {node.id: (node.lat, node.lon) for node in nodes}
+
+        for method in DistanceMethod:
+            all_rates = MigrationData.from_gravity_model(demog, params, distance_method=method).get_layer()
+            pairs = np.array([locations[src] + locations[dst] for src, dst in all_rates])
+            distances = dict(zip(all_rates, distance_function(method)(*pairs.T).tolist()))
+            for max_distance_km, max_destinations in [(3000, None), (None, 5), (4000, 2)]:
+                expected = {key: rate for key, rate in all_rates.items()
+                            if max_distance_km is None or distances[key] <= max_distance_km}
+                if max_destinations:
+                    # Destinations at the same distance are taken by ID
+                    nearest = sorted(expected, key=lambda key: (key[0], round(distances[key], 6), key[1]))
+                    expected = {key: expected[key] for _, keys in groupby(nearest, key=lambda key: key[0])
+                                for key in list(keys)[:max_destinations]}
+                    self.assertEqual(max(Counter(src for src, _ in expected).values()), max_destinations)
+
+                layer = MigrationData.from_gravity_model(demog, params, distance_method=method, block_size=16,
+                                                         max_distance_km=max_distance_km,
+                                                         max_destinations=max_destinations).get_layer()
+                self.assertEqual(layer.keys(), expected.keys())
+                for key, rate in expected.items():
+                    self.assertAlmostEqual(layer[key], rate, delta=1e-12 * rate)
+
+        with self.assertRaises(ValueError):
+            MigrationData.from_gravity_model(demog, params, max_destinations=0)
+        with self.assertRaises(ValueError):
+            MigrationData.from_gravity_model(demog, params, max_distance_km=-1)
+
+    def test_gravity_bad_distance_method(self):
+        demog = _make_demographics()
+        with self.assertRaises(ValueError):
+            MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1], distance_method="FLAT")
+        with self.assertRaises(ValueError):
+            MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1], block_size=0)
+
     def test_to_file_rejects_node_zero(self):
         # Manually inject node ID=0 into migration data; verify to_file rejects it
         demog = _make_demographics(3)
@@ -83,6 +189,188 @@ class TestMigrationDataGravity(unittest.TestCase):
             MigrationData.combine({(MALE, 0): male_data, (FEMALE, 0): female_data})
 
 
+class TestMigrationDataRadiation(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        # Coordinates on a 0.1 degree grid, with distance ties and nodes at the same location
+        self.lats = np.round(rng.uniform(0, 2, 30), 1)
+        self.lons = np.round(rng.uniform(0, 2, 30), 1)
+        self.pops = rng.integers(100, 5000, 30).astype(float)
+        self.pops[5] = 0
+        nodes = [Node(lat=float(lat), lon=float(lon), pop=float(pop), forced_id=i + 1)
+                 for i, (lat, lon, pop) in enumerate(zip(self.lats, self.lons, self.pops))]
+        self.demog = Demographics(nodes=nodes, idref="test_migration")
+
+    def _naive_rates(self, leaving_rate, max_distance_km=None):
+        """Sum the population within each circle pair by pair."""
+        distances = distance_function(DistanceMethod.HAVERSINE)(self.lats[:, None], self.lons[:, None],
+                                                                self.lats[None, :], self.lons[None, :])
+        pops, total = self.pops, self.pops.sum()
+        rates = {}
+        for i, j in zip(*np.nonzero((distances > 0) & (pops[:, None] > 0) & (pops[None, :] > 0))):
+            if max_distance_km is not None and distances[i, j] > max_distance_km:
+                continue
+            within = (distances[i] <= distances[i, j])
+            within[[i, j]] = False
+            s = pops[within].sum()
+            rate = leaving_rate * pops[i] * pops[j] / ((pops[i] + s) * (pops[i] + pops[j] + s)) / (1 - pops[i] / total)
+            rates[(i + 1, j + 1)] = min(1.0, rate)
+        return rates
+
+    def test_radiation_matches_naive(self):
+        for options in [{}, {"max_distance_km": 100}]:
+            expected = self._naive_rates(0.01, options.get("max_distance_km"))
+            data = MigrationData.from_radiation_model(self.demog, 0.01, distance_method="HAVERSINE", block_size=7,
+                                                      **options)
+            layer = data.get_layer()
+            self.assertEqual(set(layer), set(expected))
+            for key, rate in expected.items():
+                self.assertAlmostEqual(layer[key] / rate, 1.0, places=12)
+            self.assertNotIn(6, data.node_ids)
+
+    def test_radiation_options(self):
+        data = MigrationData.from_radiation_model(self.demog, 0.01, female_multiplier=0.5, max_destinations=4)
+        self.assertEqual(data.gender_data_type, ONE_FOR_EACH_GENDER)
+        male, female = data.get_layer(MALE), data.get_layer(FEMALE)
+        self.assertEqual(Counter(src for src, _ in male).most_common(1)[0][1], 4)
+        for key, rate in male.items():
+            self.assertAlmostEqual(female[key], rate * 0.5, places=15)
+
+        with self.assertRaises(ValueError):
+            MigrationData.from_radiation_model(self.demog, 0.0)
+        with self.assertRaises(ValueError):
+            MigrationData.from_radiation_model(_make_demographics(1), 0.01)
+
+
+class TestGravityModel(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.demog = Demographics(nodes=[Node(lat=float(lat), lon=float(lon), pop=int(pop), forced_id=node_id)
+                                         for node_id, (lat, lon, pop) in enumerate(zip(
+                                             rng.uniform(-30, 30, 60), rng.uniform(0, 60, 60),
+                                             rng.integers(0, 50000, 60)), start=1)],
+                                  idref="test_migration")
+        self.params = np.column_stack([rng.uniform(1e-5, 1e-1, 9), rng.uniform(0.5, 1.5, 9),
+                                       rng.uniform(0.5, 1.5, 9), rng.uniform(-2.5, -0.5, 9)])
+        self.params[2, 0] = 0.0
+
+    def assert_same_rates(self, data, expected):
+        self.assertEqual(data.idref, expected.idref)
+        self.assertEqual(data.gender_data_type, expected.gender_data_type)
+        for gender in range(expected.num_layers):
+            layer, expected_layer = data.get_layer(gender=gender), expected.get_layer(gender=gender)
+            self.assertEqual(layer.keys(), expected_layer.keys())
+            for key, rate in expected_layer.items():
+                self.assertAlmostEqual(layer[key], rate, delta=1e-12 * rate)
+
+    def test_batch_matches_from_gravity_model(self):
+        for options in [{}, {"max_destinations": 5, "distance_method": DistanceMethod.HAVERSINE}]:
+            model = GravityModel(self.demog, **options)
+            batch = list(model.migration_data_batch(self.params, female_multiplier=0.5, chunk_size=4))
+            self.assertEqual(len(batch), len(self.params))
+            for data, params in zip(batch, self.params):
+                self.assert_same_rates(data, MigrationData.from_gravity_model(self.demog, params,
+                                                                              female_multiplier=0.5, **options))
+            self.assertEqual(batch[2].node_ids, [])
+
+    def test_rates(self):
+        model = GravityModel(self.demog)
+        rates = model.rates(self.params)
+        self.assertEqual(rates.shape, (len(self.params), model.num_pairs))
+        np.testing.assert_allclose(model.rates(self.params[1]), rates[1], rtol=1e-14)
+        self.assertTrue(np.all(rates <= 1.0))
+        self.assert_same_rates(model.migration_data(self.params[0]),
+                               MigrationData.from_gravity_model(self.demog, self.params[0]))
+        with self.assertRaises(ValueError):
+            model.rates([1e-4, 1, 1])
+        with self.assertRaises(ValueError):
+            list(model.migration_data_batch(self.params[0]))
+
+
+class TestDistanceCache(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.lats = rng.uniform(-10, 10, 50)
+        self.lons = rng.uniform(-10, 10, 50)
+
+    def test_blocks_match_distances(self):
+        from emodpy.migration.distances import nearby_pair_blocks, pairwise_distance_blocks
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = DistanceCache(tmpdir)
+            expected = list(pairwise_distance_blocks(self.lats, self.lons, "HAVERSINE", 16))
+            for _ in range(2):
+                blocks = list(cache.pairwise_distance_blocks(self.lats, self.lons, "HAVERSINE", 16))
+                self.assertEqual([start for start, _ in blocks], [start for start, _ in expected])
+                for (_, block), (_, expected_block) in zip(blocks, expected):
+                    np.testing.assert_array_equal(block, expected_block)
+
+            expected = list(nearby_pair_blocks(self.lats, self.lons, "ELLIPSOIDAL", 16, 500, 5))
+            for block_size in [16, 16, 7]:
+                blocks = list(cache.nearby_pair_blocks(self.lats, self.lons, "ELLIPSOIDAL", block_size, 500, 5))
+                for array, expected_array in zip(zip(*blocks), zip(*expected)):
+                    np.testing.assert_array_equal(np.concatenate(array), np.concatenate(expected_array))
+            self.assertEqual(cache.info()[:3], (3, 2, 2))
+
+            # Other points, method or options are other entries
+            list(cache.nearby_pair_blocks(self.lats, self.lons, "ELLIPSOIDAL", 16, 500, 6))
+            list(cache.nearby_pair_blocks(self.lats + 1, self.lons, "ELLIPSOIDAL", 16, 500, 5))
+            list(cache.pairwise_distance_blocks(self.lats, self.lons, "ELLIPSOIDAL", 16))
+            self.assertEqual(cache.info().entries, 5)
+            cache.clear()
+            self.assertEqual(cache.info()[:3], (0, 0, 0))
+
+    @patch("emodpy.migration.distance_cache.EVICTION_GRACE_SECONDS", 0)
+    def test_partial_blocks_and_eviction(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Room for about one dense matrix of 50 points
+            cache = DistanceCache(tmpdir, max_bytes=30000)
+            next(cache.pairwise_distance_blocks(self.lats, self.lons, block_size=16))
+            self.assertEqual(cache.info().entries, 0)
+            self.assertEqual(os.listdir(tmpdir), [])
+
+            list(cache.pairwise_distance_blocks(self.lats, self.lons))
+            time.sleep(0.01)
+            list(cache.pairwise_distance_blocks(self.lats, self.lons, "HAVERSINE"))
+            info = cache.info()
+            self.assertEqual(info.entries, 1)
+            self.assertLessEqual(info.bytes, info.max_bytes)
+
+            # Larger than max_bytes, not stored
+            list(cache.pairwise_distance_blocks(np.zeros(100), np.arange(100.0)))
+            self.assertEqual(cache.info().entries, 1)
+
+    def test_recent_entries_are_kept(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = DistanceCache(tmpdir, max_bytes=30000)
+            list(cache.pairwise_distance_blocks(self.lats, self.lons))
+            list(cache.pairwise_distance_blocks(self.lats, self.lons, "HAVERSINE"))
+            self.assertEqual(cache.info().entries, 2)
+
+            # Removed by another process while it is read
+            other = DistanceCache(tmpdir)
+            blocks = cache.pairwise_distance_blocks(self.lats, self.lons, "HAVERSINE", 16)
+            with patch("emodpy.migration.distance_cache.os.utime", side_effect=lambda path: other.clear()):
+                start, block = next(blocks)
+            self.assertEqual(start, 0)
+            self.assertEqual(len(list(blocks)), 3)
+            self.assertEqual(cache.info().entries, 0)
+
+    def test_gravity_model_with_cache(self):
+        demog = _make_demographics(30)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for options in [{}, {"max_destinations": 5}]:
+                expected = MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1], **options)
+                for _ in range(2):
+                    data = MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1], distance_cache=tmpdir, **options)
+                    self.assertEqual(data.get_layer(), expected.get_layer())
+                model = GravityModel(demog, distance_cache=DistanceCache(tmpdir), **options)
+                self.assertEqual(model.migration_data([1e-4, 1, 1, -1]).get_layer(), expected.get_layer())
+            self.assertEqual(DistanceCache(tmpdir).info().entries, 2)
+
+
 class TestMigrationDataModifier(unittest.TestCase):
 
     def test_apply_modifier_ages(self):
@@ -120,6 +408,36 @@ class TestMigrationDataModifier(unittest.TestCase):
         self.assertEqual(modified.gender_data_type, ONE_FOR_EACH_GENDER)
         self.assertEqual(modified.num_layers, 4)  # 2 genders × 2 ages
 
+    def test_apply_modifier_vectorized(self):
+        demog = _make_demographics(4)
+        base = MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1], female_multiplier=0.8)
+
+        def mod_fn(base_rate, age, gender):
+            return base_rate * (0.5 if age < 15 else 1.0) * (1 + gender) * 2000
+
+        def array_mod_fn(base_rates, age, gender, from_ids, to_ids):
+            self.assertEqual(base_rates.shape, from_ids.shape)
+            self.assertEqual(base_rates.shape, to_ids.shape)
+            self.assertTrue(np.all(from_ids != to_ids))
+            return base_rates * (0.5 if age < 15 else 1.0) * (1 + gender) * 2000
+
+        expected = base.apply_modifier(ages=[0, 15], modifier_fn=mod_fn)
+        modified = base.apply_modifier(ages=[0, 15], modifier_fn=array_mod_fn, vectorized=True)
+        self.assertEqual(modified.num_layers, 4)
+        for gender in [MALE, FEMALE]:
+            for age_index in range(2):
+                self.assertEqual(modified.get_layer(gender, age_index), expected.get_layer(gender, age_index))
+                self.assertLessEqual(max(modified.get_layer(gender, age_index).values()), 1.0)
+
+        # Only migration out of node 1, none at all for the older ages
+        only_node_1 = base.apply_modifier(ages=[0, 15], vectorized=True,
+                                          modifier_fn=lambda r, a, g, f, t: np.where(f == 1, r, 0.0) * (a < 15))
+        self.assertEqual({key[0] for key in only_node_1.get_layer(MALE, 0)}, {1})
+        self.assertEqual(only_node_1.get_layer(MALE, 1), {})
+
+        with self.assertRaises(ValueError):
+            base.apply_modifier(ages=[0, 15], vectorized=True, modifier_fn=lambda r, a, g, f, t: r[:2])
+
 
 class TestMigrationDataCombine(unittest.TestCase):
 
@@ -321,6 +639,126 @@ class TestMigrationDataFileIO(unittest.TestCase):
             self.assertEqual(loaded.ages, [0, 15, 65])
             self.assertEqual(loaded.num_layers, 6)  # 2 genders × 3 ages
 
+    def test_binary_layout(self):
+        # Equal rates ordered by destination ID, lowest IDs kept when truncating equal rates
+        rates = {(1, 5): 0.2, (1, 2): 0.1, (1, 4): 0.2, (1, 3): 0.3, (1, 6): 0.2, (2, 1): 0.4}
+        data = MigrationData.from_rates(rates, idref="test", female_rates={(2, 1): 0.5, (2, 3): 0.0})
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            binpath = data.to_migration_file(Path(tmpdir) / "layout.bin", value_limit=3)
+            chunks = np.fromfile(binpath, dtype=[("destinations", np.uint32, 3), ("rates", np.float64, 3)])
+
+        self.assertEqual(chunks["destinations"].tolist(), [[4, 5, 3], [1, 0, 0], [0, 0, 0], [3, 1, 0]])
+        self.assertEqual(chunks["rates"].tolist(), [[0.2, 0.2, 0.3], [0.4, 0, 0], [0, 0, 0], [0.0, 0.5, 0]])
+
+
+class TestMigrationFile(unittest.TestCase):
+
+    def setUp(self):
+        demog = _make_demographics(5)
+        base = MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1], female_multiplier=0.7)
+        self.data = base.apply_modifier(ages=[0, 15], modifier_fn=lambda r, a, g: r * (0.5 if a < 15 else 1.0))
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.binpath = self.data.to_migration_file(Path(self.tmpdir.name) / "lazy.bin", user_notes="lazy")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lazy_views(self):
+        with MigrationFile(self.binpath) as migration:
+            self.assertIsNone(migration._chunks)
+            self.assertEqual(migration.node_ids.tolist(), [1, 2, 3, 4, 5])
+            self.assertEqual((migration.idref, migration.ages, migration.num_layers), ("test_migration", [0, 15], 4))
+            self.assertIsInstance(migration.chunks, np.memmap)
+
+            for gender in [MALE, FEMALE]:
+                for age_index in [0, 1]:
+                    expected = self.data.get_layer(gender=gender, age_index=age_index)
+                    self.assertEqual(migration.get_layer(gender, age_index), expected)
+                    self.assertEqual(migration.get_node(3, gender, age_index),
+                                     {dst: rate for (src, dst), rate in expected.items() if src == 3})
+
+            with self.assertRaises(KeyError):
+                migration.get_node(6)
+            with self.assertRaises(IndexError):
+                migration.layer_arrays(gender=FEMALE, age_index=2)
+        self.assertIsNone(migration._chunks)
+
+        loaded = MigrationFile(self.binpath).to_migration_data()
+        self.assertEqual(loaded.user_notes, "lazy")
+        self.assertEqual(loaded._layers, self.data._layers)
+
+    def test_node_offsets_in_any_order(self):
+        metafile = Path(str(self.binpath) + ".json")
+        metadata = json.loads(metafile.read_text())
+        offsets = metadata["NodeOffsets"]
+        metadata["NodeOffsets"] = "".join(offsets[i:i + 16] for i in reversed(range(0, len(offsets), 16))).upper()
+        metafile.write_text(json.dumps(metadata))
+
+        loaded = MigrationData.from_migration_file(self.binpath)
+        self.assertEqual(loaded._layers, self.data._layers)
+
+    def test_parse_node_offsets(self):
+        node_ids, offsets = parse_node_offsets("0000000100000000000000FF000004B0", 2)
+        self.assertEqual(node_ids.tolist(), [1, 255])
+        self.assertEqual(offsets.tolist(), [0, 1200])
+        with self.assertRaises(ValueError):
+            parse_node_offsets("0000000100000000", 2)
+        with self.assertRaises(ValueError):
+            parse_node_offsets("000000010000000g", 1)
+
+
+def _reference_migration_bytes(data, value_limit):
+    """Binary layers written pair by pair, like to_migration_file used to."""
+    layers = data._sparse()
+    sources = layers.source_ids().tolist()
+    layer_pairs = []
+    for layer in range(layers.num_layers):
+        by_source = {src: [] for src in sources}
+        for src, dst, rate in zip(*(values.tolist() for values in layers.layer_arrays(layer))):
+            by_source[src].append((dst, rate))
+        layer_pairs.append(by_source)
+    dvc = max(1, min(value_limit, max(len(pairs) for by_source in layer_pairs for pairs in by_source.values())))
+
+    chunks = []
+    for by_source in layer_pairs:
+        for src in sources:
+            pairs = sorted(sorted(by_source[src], key=lambda pair: pair[1], reverse=True)[:dvc],
+                           key=lambda pair: pair[1])
+            destinations = np.zeros(dvc, dtype=np.uint32)
+            rates = np.zeros(dvc, dtype=np.float64)
+            for i, (dst, rate) in enumerate(pairs):
+                destinations[i], rates[i] = dst, rate
+            chunks.append(destinations.tobytes() + rates.tobytes())
+    return b"".join(chunks)
+
+
+@pytest.mark.long
+class TestMigrationFileBenchmark(unittest.TestCase):
+
+    def test_write_large_networks(self):
+        rng = np.random.default_rng(6)
+        for num_nodes in [10000, 50000, 100000]:
+            sources = np.repeat(np.arange(1, num_nodes + 1), 30)
+            destinations = rng.integers(1, num_nodes + 1, len(sources))
+            keep = sources != destinations
+            rates = rng.choice(np.linspace(0.001, 0.1, 1000), len(sources))[keep]
+            data = MigrationData._from_layers(MigrationLayers.from_layer_arrays([
+                (sources[keep], destinations[keep], rates), (sources[keep], destinations[keep], rates / 2)]),
+                idref="test")
+
+            with tempfile.TemporaryDirectory() as tmpdir:
+                start = time.perf_counter()
+                binpath = data.to_migration_file(Path(tmpdir) / "large.bin", value_limit=20)
+                seconds = time.perf_counter() - start
+                written = binpath.read_bytes()
+
+            start = time.perf_counter()
+            expected = _reference_migration_bytes(data, value_limit=20)
+            reference_seconds = time.perf_counter() - start
+            self.assertEqual(written, expected)
+            self.assertLess(seconds, reference_seconds / 4, f"{num_nodes} nodes")
+
 
 class TestAddMigration(unittest.TestCase):
 
@@ -337,6 +775,49 @@ class TestAddMigration(unittest.TestCase):
             self.assertEqual(len(demog.migration_files), 1)
             self.assertEqual(len(demog.implicits), 1)
 
+    def test_content_hash(self):
+        demog = _make_demographics(4)
+        data = MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1])
+        same = MigrationData.from_rates(data.get_layer(), idref=data.idref)
+        self.assertEqual(data.content_hash(), same.content_hash())
+        self.assertEqual(len(data.content_hash()), 64)
+
+        changed = MigrationData.from_rates({**data.get_layer(), (1, 2): 0.5}, idref=data.idref)
+        self.assertNotEqual(data.content_hash(), changed.content_hash())
+        renamed = MigrationData.from_rates(data.get_layer(), idref="other")
+        self.assertNotEqual(data.content_hash(), renamed.content_hash())
+        aged = data.apply_modifier(ages=[0], modifier_fn=lambda r, a, g: r)
+        self.assertNotEqual(data.content_hash(), aged.content_hash())
+
+    def test_add_migration_cache_dir(self):
+        demog = _make_demographics(3)
+        data = MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            demog.add_migration(data, MigrationType.LOCAL, cache_dir=tmpdir)
+            path = demog.migration_files[0]
+            self.assertEqual(path.parent, Path(tmpdir).absolute())
+            self.assertTrue(path.name.startswith("local_migration_"))
+            content = path.read_bytes(), Path(str(path) + ".json").read_bytes()
+
+            # Identical data is not written again
+            other = _make_demographics(3)
+            time.sleep(1.1)
+            other.add_migration(MigrationData.from_gravity_model(other, [1e-4, 1, 1, -1]), MigrationType.LOCAL,
+                                cache_dir=tmpdir)
+            self.assertEqual(other.migration_files, [path])
+            self.assertEqual((path.read_bytes(), Path(str(path) + ".json").read_bytes()), content)
+
+            # Other data, or the same data written with other arguments, are other files
+            other.add_migration(MigrationData.from_gravity_model(other, [1e-9, 1, 1, -1]), MigrationType.LOCAL,
+                                cache_dir=tmpdir)
+            other.add_migration(data, MigrationType.REGIONAL, cache_dir=tmpdir)
+            other.add_migration(data, MigrationType.LOCAL, cache_dir=tmpdir, user_notes="notes")
+            self.assertEqual(len(set(other.migration_files)), 4)
+            self.assertEqual(sorted(p.name for p in Path(tmpdir).iterdir() if p.suffix == ".bin"),
+                             sorted(p.name for p in other.migration_files))
+            self.assertEqual(MigrationData.from_migration_file(other.migration_files[2]).get_layer(), data.get_layer())
+
     def test_add_migration_idref_mismatch_updates(self):
         demog = _make_demographics(3)
         nodes2 = [Node(lat=0, lon=0, pop=1000, forced_id=1),
@@ -540,6 +1021,275 @@ class TestMigrationDataCSV(unittest.TestCase):
             self.assertEqual(loaded.ages, [0, 15])
             self.assertEqual(loaded.num_layers, 4)
 
+    def test_from_csv_chunks(self):
+        demog = _make_demographics(6)
+        base = MigrationData.from_gravity_model(demog, [1e-4, 1, 1, -1], female_multiplier=0.7)
+        modified = base.apply_modifier(ages=[0, 15, 40], modifier_fn=lambda r, a, g: r * (0.5 if a < 15 else 1.0))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csvpath = os.path.join(tmpdir, "age_gender.csv")
+            modified.to_csv(csvpath)
+
+            loaded = MigrationData.from_csv(csvpath)
+            for chunk_rows in [1, 7, 1000]:
+                chunked = MigrationData.from_csv(csvpath, chunk_rows=chunk_rows)
+                self.assertEqual(chunked.ages, loaded.ages)
+                for gender in [MALE, FEMALE]:
+                    for age_index in range(3):
+                        self.assertEqual(chunked.get_layer(gender, age_index), loaded.get_layer(gender, age_index))
+            with self.assertRaises(ValueError):
+                MigrationData.from_csv(csvpath, chunk_rows=0)
+
+    def test_from_csv_error_row_in_later_chunk(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csvpath = os.path.join(tmpdir, "bad.csv")
+            with open(csvpath, 'w', newline='') as f:
+                f.write("source_node,destination_node,rate\n")
+                for i in range(1, 10):
+                    f.write(f"{i},{i + 1},0.1\n")
+                f.write("10,11,1.5\n")
+
+            with self.assertRaises(ValueError) as ctx:
+                MigrationData.from_csv(csvpath, chunk_rows=4)
+            self.assertIn("Row 11", str(ctx.exception))
+
+    def test_from_csv_extra_text_column(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csvpath = os.path.join(tmpdir, "notes.csv")
+            with open(csvpath, 'w', newline='') as f:
+                f.write("source_node,destination_node,rate,note\n")
+                f.write("1,2,0.1,a\n")
+                f.write('2,1,0.2,"b, c"\n')
+
+            loaded = MigrationData.from_csv(csvpath)
+            self.assertEqual(loaded.get_layer(), {(1, 2): 0.1, (2, 1): 0.2})
+
+    def test_from_csv_rejects_blank_rows(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csvpath = os.path.join(tmpdir, "blank.csv")
+            with open(csvpath, 'w', newline='') as f:
+                f.write("source_node,destination_node,rate\n")
+                f.write("1,2,0.1\n")
+                f.write("\n")
+                f.write("2,1,1.5\n")
+
+            with self.assertRaises(ValueError) as ctx:
+                MigrationData.from_csv(csvpath)
+            self.assertIn("Row 3 has 0 columns", str(ctx.exception))
+
+
+class TestMigrationAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        # Nodes 1-3 are strongly connected, 4 only leads to them and 5 has no rates
+        self.demog = _make_demographics(5)
+        self.data = MigrationData.from_rates({(1, 2): 0.1, (2, 1): 0.2, (2, 3): 0.05, (3, 2): 0.05, (4, 2): 0.3},
+                                             idref="test_migration")
+
+    def test_network_metrics(self):
+        analytics = MigrationAnalytics(self.data, self.demog)
+        np.testing.assert_array_equal(analytics.node_ids, [1, 2, 3, 4, 5])
+        self.assertEqual(analytics.rate_matrix()[3, 1], 0.3)
+        self.assertEqual([c.tolist() for c in analytics.strongly_connected_components()], [[1, 2, 3], [4], [5]])
+        np.testing.assert_array_equal(analytics.isolated_nodes(), [5])
+        np.testing.assert_allclose(analytics.out_rates(), [0.1, 0.25, 0.05, 0.3, 0.0])
+
+        outflows, inflows = analytics.daily_flows()
+        np.testing.assert_allclose(outflows, [1000, 5000, 1500, 12000, 0])
+        np.testing.assert_allclose(inflows, [4000, 1000 + 1500 + 12000, 1000, 0, 0])
+        with self.assertRaises(ValueError):
+            MigrationAnalytics(self.data).daily_flows()
+
+    def test_stationary_distribution(self):
+        analytics = MigrationAnalytics(self.data, self.demog)
+        distribution = analytics.stationary_distribution()
+        np.testing.assert_allclose(distribution, [0.5, 0.25, 0.25, 0, 0], atol=1e-12)
+        generator = analytics.rate_matrix().toarray()
+        generator -= np.diag(generator.sum(axis=1))
+        np.testing.assert_allclose(distribution @ generator, 0, atol=1e-12)
+
+        # Node 5 only receives migrants, like nodes 1-3
+        two_sinks = MigrationData.from_rates({**self.data.get_layer(), (4, 5): 0.1}, idref="test_migration")
+        with self.assertRaises(ValueError):
+            MigrationAnalytics(two_sinks).stationary_distribution()
+
+    def test_truncated_rates_match_file(self):
+        base = MigrationData.from_gravity_model(_make_demographics(8), [1e-6, 1, 1, -1], female_multiplier=0.5)
+        data = base.apply_modifier(ages=[0, 20], vectorized=True,
+                                   modifier_fn=lambda rates, age, gender, from_ids, to_ids: rates * (1 + to_ids))
+        analytics = MigrationAnalytics(data)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = data.to_migration_file(os.path.join(tmpdir, "mig.bin"), value_limit=3)
+            written = MigrationAnalytics(MigrationData.from_migration_file(path))
+            for gender in [MALE, FEMALE]:
+                for age_index in range(2):
+                    truncated = analytics.truncated_rates(3, gender, age_index)
+                    np.testing.assert_allclose(analytics.out_rates(gender, age_index) - truncated,
+                                               written.out_rates(gender, age_index), rtol=1e-12)
+                    self.assertTrue(np.all(truncated > 0))
+
+        summary = analytics.summary(value_limit=3)
+        self.assertEqual([(layer.gender, layer.age) for layer in summary], [(0, 0), (0, 20), (1, 0), (1, 20)])
+        self.assertEqual(summary[0].num_pairs, 56)
+        self.assertEqual(summary[0].largest_component, 8)
+        self.assertEqual(summary[0].truncated_nodes, 8)
+        self.assertIsNone(summary[0].daily_flow)
+
+
+class TestCoarsening(unittest.TestCase):
+
+    def setUp(self):
+        # Two groups of 3 nodes, 10 degrees apart
+        locations = [(0.1, 0.1, "A"), (0.2, 0.5, "A"), (0.6, 0.3, "A"),
+                     (10.1, 10.1, "B"), (10.4, 10.2, "B"), (10.2, 10.7, "B")]
+        self.nodes = [Node(lat=float(lat), lon=float(lon), pop=1000 * (i + 1), forced_id=i + 1, name=f"{region}:{i}")
+                      for i, (lat, lon, region) in enumerate(locations)]
+        self.demog = Demographics(nodes=self.nodes, idref="test_migration")
+        self.data = MigrationData.from_gravity_model(self.demog, [1e-9, 1, 1, -1], female_multiplier=0.5)
+
+    def _check_conserved(self, result):
+        self.assertEqual([node.id for node in result.demographics.nodes], [1, 2])
+        self.assertEqual([node.pop for node in result.demographics.nodes], [6000, 15000])
+        self.assertEqual(result.node_mapping.to_dict(), {1: 1, 2: 1, 3: 1, 4: 2, 5: 2, 6: 2})
+        populations = {node.id: node.pop for node in self.nodes}
+        for gender in [MALE, FEMALE]:
+            layer = self.data.get_layer(gender)
+            coarse = result.migration_data.get_layer(gender)
+            self.assertEqual(set(coarse), {(1, 2), (2, 1)})
+            flow = sum(populations[src] * rate for (src, dst), rate in layer.items() if src <= 3 < dst)
+            self.assertAlmostEqual(coarse[(1, 2)] * 6000, flow, places=9)
+
+    def test_grid(self):
+        result = coarsen(self.demog, self.data, method="GRID", cell_size=5.0)
+        self._check_conserved(result)
+        self.assertEqual(result.migration_data.gender_data_type, ONE_FOR_EACH_GENDER)
+        self.assertEqual(result.migration_data.idref, "test_migration_coarse")
+        self.assertEqual(result.demographics.idref, "test_migration_coarse")
+        lat = sum(node.lat * node.pop for node in self.nodes[:3]) / 6000
+        self.assertAlmostEqual(result.demographics.nodes[0].lat, lat, places=3)
+
+    def test_admin_and_kmeans(self):
+        result = coarsen(self.demog, self.data, method="ADMIN", admin_codes=lambda node: node.name.split(":")[0])
+        self._check_conserved(result)
+        self.assertEqual([node.name for node in result.demographics.nodes], ["A", "B"])
+        self._check_conserved(coarsen(self.demog, self.data, method="KMEANS", num_clusters=2))
+
+        with self.assertRaises(ValueError):
+            coarsen(self.demog, self.data, method="ADMIN", admin_codes={1: "A"})
+        with self.assertRaises(ValueError):
+            coarsen(self.demog, self.data, method="KMEANS")
+        with self.assertRaises(ValueError):
+            coarsen(self.demog, self.data, method="HEX")
+
+    def test_node_table(self):
+        demog = Demographics.from_arrays(node_ids=[1, 2, 3, 4], lats=[0.1, 0.2, 10.1, 10.4],
+                                         lons=[0.1, 0.5, 10.1, 10.2], pops=[100.4, 200.4, 300.0, 300.0],
+                                         names=["a", "b", "c", "d"],
+                                         areas=[1.0, 2.0, 3.0, None], attributes={"birth_rate": [1, 2, 3, 4]})
+        table = demog.node_table
+        result = coarsen(demog, method="GRID", cell_size=5.0)
+        self.assertIs(demog.node_table, table)
+        nodes = result.demographics.nodes
+        self.assertEqual([node.name for node in nodes], ["b", "c"])
+        self.assertEqual([node.pop for node in nodes], [301, 600])
+        self.assertEqual([node.node_attributes.area for node in nodes], [3.0, None])
+        self.assertEqual([node.node_attributes.birth_rate for node in nodes], [2, 3])
+
+    def test_node_mapping(self):
+        mapping = coarsen(self.demog, method="GRID", cell_size=5.0).node_mapping
+        projected = mapping.project({1: 60.0, 2: 150.0})
+        self.assertEqual(projected, {1: 10.0, 2: 20.0, 3: 30.0, 4: 40.0, 5: 50.0, 6: 60.0})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = mapping.to_csv(os.path.join(tmpdir, "mapping.csv"))
+            with open(path) as f:
+                rows = f.read().splitlines()
+        self.assertEqual(rows[0], "node_id,coarse_node_id,population,population_share")
+        self.assertEqual(len(rows), 7)
+
+
+class TestMigrationLayers(unittest.TestCase):
+
+    def test_shared_pattern(self):
+        male = {(1, 2): 0.1, (1, 3): 0.2, (3, 1): 0.0}
+        female = {(1, 2): 0.3, (2, 3): 0.4}
+        data = MigrationData.from_rates(male, idref="test", female_rates=female)
+
+        layers = data._sparse()
+        self.assertEqual(layers.node_ids.tolist(), [1, 2, 3])
+        self.assertEqual(layers.indptr.tolist(), [0, 2, 3, 4])
+        self.assertEqual(layers.indices.tolist(), [1, 2, 2, 0])
+        self.assertTrue(np.isnan(layers.rates[0, 2]))
+        self.assertTrue(np.isnan(layers.rates[1, 1]))
+        self.assertEqual(data.get_layer(gender=MALE), male)
+        self.assertEqual(data.get_layer(gender=FEMALE), female)
+
+    def test_arrays_smaller_than_dicts(self):
+        rng = np.random.default_rng(1)
+        sources = rng.integers(1, 500, 20000)
+        destinations = rng.integers(1, 500, 20000)
+        layers = MigrationLayers.from_layer_arrays([(sources, destinations, rng.random(20000))])
+
+        tracemalloc.start()
+        dicts = layers.to_dicts()
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.assertEqual(len(dicts[0]), layers.nnz)
+        self.assertLess(layers.nbytes * 5, dict_bytes)
+
+    def test_modified_dicts_are_used(self):
+        data = MigrationData.from_rates({(1, 2): 0.1, (2, 1): 0.2}, idref="test")
+        data.get_layer()[(1, 3)] = 0.5
+        del data.get_layer()[(2, 1)]
+        self.assertEqual(data.node_ids, [1, 2, 3])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = data.to_migration_file(Path(tmpdir) / "modified.bin")
+            loaded = MigrationData.from_migration_file(path)
+        self.assertEqual(loaded.get_layer(), {(1, 2): 0.1, (1, 3): 0.5})
+
+    def test_read_dicts_keep_arrays(self):
+        data = MigrationData.from_rates({(1, 2): 0.1, (2, 1): 0.2}, idref="test", female_rates={(1, 2): 0.3})
+        layers = data._sparse()
+        self.assertEqual(data.get_layer(FEMALE), {(1, 2): 0.3})
+        self.assertIs(data._sparse(), layers)
+
+        data.get_layer().pop((2, 1))
+        rebuilt = data._sparse()
+        self.assertIsNot(rebuilt, layers)
+        self.assertEqual(rebuilt.to_dicts(), [{(1, 2): 0.1}, {(1, 2): 0.3}])
+        self.assertIs(data._sparse(), rebuilt)
+        data.get_layer(FEMALE).update({(2, 1): 0.4})
+        self.assertEqual(data.node_ids, [1, 2])
+        self.assertEqual(data._sparse().to_dicts(), [{(1, 2): 0.1}, {(1, 2): 0.3, (2, 1): 0.4}])
+
+        # Dicts of a copy are the data of the copy only
+        copied = copy.deepcopy(data)
+        copied.get_layer()[(1, 3)] = 0.5
+        self.assertEqual(data.node_ids, [1, 2])
+        self.assertEqual(copied.node_ids, [1, 2, 3])
+
+    def test_file_roundtrip_random_network(self):
+        rng = np.random.default_rng(2)
+        rates = {(int(src), int(dst)): float(rate)
+                 for src, dst, rate in zip(rng.integers(1, 60, 1000), rng.integers(1, 60, 1000), rng.random(1000))
+                 if src != dst}
+        data = MigrationData.from_rates(rates, idref="test",
+                                        female_rates={key: rate / 2 for key, rate in rates.items()})
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = data.to_migration_file(Path(tmpdir) / "random.bin", value_limit=60)
+            loaded = MigrationData.from_migration_file(path)
+        self.assertEqual(loaded.get_layer(gender=MALE), rates)
+        self.assertEqual(loaded.get_layer(gender=FEMALE), data.get_layer(gender=FEMALE))
+
+    def test_compact(self):
+        layers = MigrationLayers.from_dicts([{(1, 2): 0.1, (3, 4): 0.2, (4, 3): 0.3}])
+        compacted = layers.with_rates(np.array([[0.1, np.nan, np.nan]]))
+        self.assertEqual(compacted.node_ids.tolist(), [1, 2])
+        self.assertEqual(compacted.indptr.tolist(), [0, 1, 1])
+        self.assertEqual(compacted.to_dict(0), {(1, 2): 0.1})
+        self.assertIs(compacted.compact(), compacted)
+
 
 if __name__ == "__main__":
     unittest.main()
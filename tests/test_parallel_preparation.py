@@ -0,0 +1,128 @@
+import copy
+import unittest
+
+import pytest
+import emod_api.campaign as api_campaign
+from idmtools.builders import SimulationBuilder
+from idmtools.entities.experiment import Experiment
+from idmtools.entities.simulation import Simulation
+from idmtools.entities.templated_simulation import TemplatedSimulations
+
+from emodpy.emod_task import EMODTask
+from emodpy.reporters.common import ReportEventCounter
+from emodpy.utils.parallel_preparation import prepare_simulations
+
+from tests import helpers
+
+
+class LinuxPlatform:
+    """The part of a platform used by Simulation.pre_creation()"""
+
+    def is_windows_platform(self, item=None):
+        return False
+
+    def get_platform_python(self):
+        return "python3"
+
+
+def _report_builder(reporters):
+    reporters.add(ReportEventCounter(reporters_object=reporters, event_list=["NewInfectionEvent"]))
+    return reporters
+
+
+def _assets(simulation):
+    simulation.pre_creation(LinuxPlatform())
+    return sorted((asset.filename, asset.bytes) for asset in simulation.assets)
+
+
+@pytest.mark.unit
+class TestParallelPreparation(unittest.TestCase):
+
+    def setUp(self):
+        builders = helpers.BuildersCommon
+        self.task = EMODTask.from_defaults(schema_path=builders.schema_path,
+                                           eradication_path=builders.eradication_path,
+                                           config_builder=builders.config_builder,
+                                           campaign_builder=builders.campaign_builder,
+                                           report_builder=_report_builder)
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def make_experiment(self, values):
+        templated = TemplatedSimulations(base_task=self.task)
+        builder = SimulationBuilder()
+        builder.add_sweep_definition(EMODTask.set_parameter_partial("Run_Number"), values)
+        templated.add_builder(builder)
+        return Experiment.from_template(templated)
+
+    def expected_assets(self, values):
+        return [_assets(simulation) for simulation in list(self.make_experiment(values).simulations)]
+
+    def test_prepared_assets_match_serial(self):
+        values = list(range(7))
+        expected = self.expected_assets(values)
+        for chunk_size in [None, 3]:
+            with self.subTest(chunk_size=chunk_size):
+                experiment = self.make_experiment(values)
+                simulations = self.task.prepare_experiment_simulations(experiment, max_workers=2,
+                                                                       chunk_size=chunk_size)
+                self.assertEqual(len(simulations), len(values))
+                self.assertEqual(list(experiment.simulations), simulations)
+                for simulation in simulations:
+                    self.assertIsNotNone(simulation.task.prepared_transient_assets)
+                self.assertEqual([_assets(simulation) for simulation in simulations], expected)
+                # The assets were rendered by the workers, the config of the simulation was not finalized
+                self.assertIn("schema", simulations[0].task.config.parameters)
+                # Once gathered, the tasks do not hold the prepared assets anymore
+                self.assertIsNone(simulations[0].task.prepared_transient_assets)
+
+    def test_simulations_are_generated_by_chunk(self):
+        generated = []
+
+        def set_run_number(simulation, value):
+            generated.append(value)
+            return simulation.task.set_parameter("Run_Number", value)
+
+        templated = TemplatedSimulations(base_task=self.task)
+        builder = SimulationBuilder()
+        builder.add_sweep_definition(set_run_number, list(range(7)))
+        templated.add_builder(builder)
+        experiment = Experiment.from_template(templated)
+        simulations = prepare_simulations(self.task._iter_experiment_simulations(experiment), max_workers=2,
+                                          chunk_size=3, base_task=self.task)
+        next(simulations)
+        self.assertEqual(generated, [0, 1, 2])
+        self.assertEqual(len(experiment.simulations), 3)
+        self.assertEqual(len(list(simulations)), 6)
+        self.assertEqual(len(experiment.simulations), 7)
+        self.assertFalse(experiment.gather_common_assets_from_task)
+
+    def test_prepared_with_other_modes(self):
+        values = [1, 2, 3]
+        expected = self.expected_assets(values)
+        self.task.copy_on_write = True
+        self.task.use_config_template = True
+        self.task.deduplicate_transient_assets = True
+        base_simulation = Simulation(task=self.task)
+        simulations = []
+        for value in values:
+            simulation = self.task.copy_simulation(base_simulation)
+            simulation.task.set_parameter("Run_Number", value)
+            simulations.append(simulation)
+        prepared = list(prepare_simulations(simulations, max_workers=2, base_task=self.task))
+        self.assertEqual(prepared, simulations)
+        self.assertEqual([_assets(simulation) for simulation in simulations], expected)
+        self.assertEqual(self.task.asset_store.report().simulations, 3)
+
+    def test_prepared_simulations_are_skipped(self):
+        simulation = Simulation(task=copy.deepcopy(self.task))
+        prepared = list(prepare_simulations([simulation], max_workers=1))
+        assets = prepared[0].task.prepared_transient_assets
+        self.assertIs(list(prepare_simulations([simulation], max_workers=1))[0].task.prepared_transient_assets,
+                      assets)
+        self.assertEqual(list(prepare_simulations([], max_workers=1)), [])
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            list(prepare_simulations([Simulation(task=self.task)], chunk_size=0))
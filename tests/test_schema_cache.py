@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytest
+import emod_api.campaign as api_campaign
+from emod_api.config import default_from_schema_no_validation as dfs
+
+from emodpy.emod_task import EMODTask
+from emodpy.reporters.base import Reporters
+from emodpy.utils.schema_cache import (SchemaCache, get_schema_cache, load_schema, schema_cache_info,
+                                       clear_schema_cache)
+from emodpy.utils.schema_index import get_class_with_defaults
+
+from tests import manifest
+from tests import helpers  # noqa: F401 - makes sure the schema files are downloaded
+
+
+@pytest.mark.unit
+class TestSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_schema(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w") as schema_file:
+            json.dump(content, schema_file)
+        return path
+
+    def test_hit_and_miss_counters(self):
+        cache = SchemaCache(maxsize=2)
+        path = self.write_schema("schema.json", {"a": 1})
+        first = cache.get(path)
+        second = cache.get(path)
+        self.assertIs(first, second)
+        info = cache.info()
+        self.assertEqual(info.hits, 1)
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.currsize, 1)
+
+    def test_same_content_different_path_shares_entry(self):
+        cache = SchemaCache()
+        path1 = self.write_schema("schema1.json", {"a": 1})
+        path2 = self.write_schema("schema2.json", {"a": 1})
+        self.assertIs(cache.get(path1), cache.get(path2))
+        self.assertEqual(cache.info().misses, 1)
+        self.assertEqual(cache.info().currsize, 1)
+
+    def test_changed_file_is_reloaded(self):
+        cache = SchemaCache()
+        path = self.write_schema("schema.json", {"a": 1})
+        self.assertEqual(cache.get(path), {"a": 1})
+        self.write_schema("schema.json", {"a": 2, "b": 3})
+        os.utime(path, ns=(1, 1))  # make sure the modification time differs
+        self.assertEqual(cache.get(path), {"a": 2, "b": 3})
+        self.assertEqual(cache.info().misses, 2)
+
+    def test_lru_eviction(self):
+        cache = SchemaCache(maxsize=2)
+        path1 = self.write_schema("schema1.json", {"a": 1})
+        path2 = self.write_schema("schema2.json", {"a": 2})
+        path3 = self.write_schema("schema3.json", {"a": 3})
+        cache.get(path1)
+        cache.get(path2)
+        cache.get(path1)  # path2 is now least recently used
+        cache.get(path3)
+        self.assertEqual(cache.info().currsize, 2)
+        cache.get(path1)
+        self.assertEqual(cache.info().misses, 3)
+        cache.get(path2)
+        self.assertEqual(cache.info().misses, 4)
+
+    def test_find_entry_and_derived(self):
+        cache = SchemaCache()
+        path = self.write_schema("schema.json", {"a": [1, 2, 3]})
+        schema_json = cache.get(path)
+        entry = cache.find_entry(schema_json)
+        self.assertIsNotNone(entry)
+        self.assertIsNone(cache.find_entry({"a": [1, 2, 3]}))
+        calls = []
+
+        def factory(schema):
+            calls.append(1)
+            return sum(schema["a"])
+
+        self.assertEqual(entry.derived("total", factory), 6)
+        self.assertEqual(entry.derived("total", factory), 6)
+        self.assertEqual(len(calls), 1)
+
+    def test_invalid_maxsize(self):
+        with self.assertRaises(ValueError):
+            SchemaCache(maxsize=0)
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            SchemaCache().get(os.path.join(self.tmp_dir, "nope.json"))
+
+
+@pytest.mark.unit
+class TestSchemaCacheConsumers(unittest.TestCase):
+
+    def setUp(self):
+        self.schema_path = manifest.common_schema_path
+        clear_schema_cache()
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def test_default_config_matches_emod_api(self):
+        expected = dfs.get_default_config_from_schema(path_to_schema=self.schema_path, as_rod=True)
+        expected["schema_path"] = self.schema_path
+        first = EMODTask.build_default_config(self.schema_path)
+        second = EMODTask.build_default_config(self.schema_path)
+        self.assertEqual(json.dumps(first, sort_keys=True), json.dumps(expected, sort_keys=True))
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.parameters, second.parameters)
+        first.parameters.Run_Number = 5
+        self.assertNotEqual(second.parameters.Run_Number, 5)
+
+    def test_default_campaign_matches_emod_api(self):
+        api_campaign.set_schema(self.schema_path)
+        expected = (list(api_campaign.individual_builtin_events), list(api_campaign.node_builtin_events),
+                    list(api_campaign.coordinator_builtin_events))
+        campaign = EMODTask.build_default_campaign(self.schema_path)
+        observed = (list(campaign.individual_builtin_events), list(campaign.node_builtin_events),
+                    list(campaign.coordinator_builtin_events))
+        self.assertEqual(observed, expected)
+        self.assertEqual(campaign.schema_path, self.schema_path)
+        self.assertEqual(campaign.get_schema(), api_campaign.get_schema())
+
+    def test_consumers_share_one_parse(self):
+        EMODTask.build_default_config(self.schema_path)
+        campaign = EMODTask.build_default_campaign(self.schema_path)
+        reporters = Reporters(schema_path=self.schema_path)
+        info = schema_cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 2)
+        # The campaign module has a copy of its own, of the same entry
+        self.assertIsNot(campaign.get_schema(), reporters.get_schema_json())
+        self.assertIs(get_schema_cache().find_entry(campaign.get_schema()).schema_json, reporters.get_schema_json())
+        self.assertIs(get_schema_cache().find_entry(reporters.get_schema_json()).schema_json,
+                      reporters.get_schema_json())
+
+    def test_campaign_schema_changes_are_not_cached(self):
+        def campaign_builder(campaign):
+            campaign.get_schema()["idmTypes"].clear()
+            campaign.get_schema()["Version"] = "changed"
+            return campaign
+
+        expected = json.dumps(load_schema(self.schema_path), sort_keys=True)
+        EMODTask.from_defaults(schema_path=self.schema_path, campaign_builder=campaign_builder)
+        self.assertEqual(json.dumps(load_schema(self.schema_path), sort_keys=True), expected)
+        campaign = EMODTask.build_default_campaign(self.schema_path)
+        self.assertEqual(json.dumps(campaign.get_schema(), sort_keys=True), expected)
+        self.assertIsNotNone(get_class_with_defaults("BroadcastEvent", schema_json=campaign.get_schema()))
@@ -0,0 +1,115 @@
+import unittest
+
+import pytest
+import emod_api.campaign as api_campaign
+from emod_api import schema_to_class as s2c
+
+from emodpy.emod_task import EMODTask
+from emodpy.reporters.base import Reporters
+from emodpy.utils.schema_cache import load_schema
+from emodpy.utils.schema_index import SchemaIndex, get_schema_index, load_schema_index
+
+from tests import manifest
+from tests import helpers  # noqa: F401 - makes sure the schema files are downloaded
+
+
+class BaseSchemaIndexTest:
+    schema_path = None
+
+    def setUp(self):
+        self.schema_json = load_schema(self.schema_path)
+        self.index = load_schema_index(self.schema_path)
+
+    def tearDown(self):
+        api_campaign.reset()
+
+    def test_index_is_built_once(self):
+        self.assertIs(load_schema_index(self.schema_path), self.index)
+        self.assertIs(get_schema_index(self.schema_json), self.index)
+
+    def test_builtin_events_match_emod_api(self):
+        api_campaign.set_schema(self.schema_path)
+        self.assertEqual(self.index.get_builtin_events("individual"), api_campaign.individual_builtin_events)
+        self.assertEqual(self.index.get_builtin_events("node"), api_campaign.node_builtin_events)
+        self.assertEqual(self.index.get_builtin_events("coordinator"), api_campaign.coordinator_builtin_events)
+        for event in api_campaign.individual_builtin_events:
+            self.assertTrue(self.index.is_builtin_event("individual", event))
+        self.assertFalse(self.index.is_builtin_event("individual", "NotAnEvent_XYZ"))
+
+    def test_reporters_builtin_events(self):
+        reporters = Reporters(schema_path=self.schema_path)
+        builtin = reporters.get_builtin_events()
+        self.assertEqual(set(builtin.keys()), {"individual", "node", "coordinator"})
+        self.assertEqual(builtin["individual"], self.index.get_builtin_events("individual"))
+        self.assertIs(reporters.get_schema_index(), self.index)
+
+    def test_config_parameters_match_default_config(self):
+        default_config = EMODTask.build_default_config(self.schema_path)
+        expected = set(default_config.parameters.keys()) - {"schema"}
+        self.assertEqual(self.index.config_parameter_names, expected)
+        self.assertTrue(self.index.has_config_parameter("Simulation_Duration"))
+        self.assertFalse(self.index.has_config_parameter("finalize"))
+        self.assertEqual(self.index.get_config_parameter_type("Simulation_Duration"), "float")
+        minimum, maximum = self.index.get_config_parameter_range("Simulation_Duration")
+        self.assertEqual(minimum, 0)
+        self.assertGreater(maximum, minimum)
+        with self.assertRaises(ValueError):
+            self.index.get_config_parameter("Not_A_Parameter")
+
+    def test_class_definitions_match_emod_api(self):
+        for class_name in ["CampaignEvent", "StandardInterventionDistributionEventCoordinator", "NodeSetAll",
+                           "BroadcastEvent", "idmType:AgeAndProbability"]:
+            self.assertTrue(self.index.has_class(class_name), class_name)
+            obj = s2c.get_class_with_defaults(class_name, schema_json=self.schema_json)
+            self.assertIs(obj["schema"], self.index.get_class_definition(class_name))
+        with self.assertRaises(ValueError):
+            self.index.get_class_definition("NotAClass")
+
+    def test_intervention_names(self):
+        self.assertTrue(self.index.is_individual_intervention("BroadcastEvent"))
+        self.assertFalse(self.index.is_node_intervention("BroadcastEvent"))
+        self.assertTrue(self.index.is_node_intervention("BroadcastNodeEvent"))
+        self.assertTrue(self.index.individual_intervention_names.isdisjoint(self.index.node_intervention_names))
+
+    def test_index_of_uncached_schema(self):
+        api_campaign.set_schema(self.schema_path)
+        index = get_schema_index(api_campaign.get_schema())
+        self.assertIsNot(index, self.index)
+        self.assertIs(get_schema_index(api_campaign.get_schema()), index)
+        self.assertEqual(index.config_parameter_names, self.index.config_parameter_names)
+
+    def test_set_parameter_uses_schema(self):
+        task = EMODTask.from_defaults(schema_path=self.schema_path)
+        task.set_parameter("Simulation_Duration", 10)
+        self.assertEqual(task.config.parameters.Simulation_Duration, 10)
+        with self.assertRaises(ValueError):
+            task.set_parameter("Not_A_Parameter", 1)
+        # A key of the config unknown to the schema is still accepted, as it was before the index
+        task.config.parameters["Custom_Config_Key"] = 0
+        task.config.parameters.schema["Custom_Config_Key"] = {"type": "integer", "min": 0, "max": 10}
+        task.set_parameter("Custom_Config_Key", 1)
+        self.assertEqual(task.config.parameters.Custom_Config_Key, 1)
+
+
+@pytest.mark.unit
+class TestSchemaIndexCommon(BaseSchemaIndexTest, unittest.TestCase):
+    schema_path = manifest.common_schema_path
+
+
+@pytest.mark.unit
+class TestSchemaIndexHIV(BaseSchemaIndexTest, unittest.TestCase):
+    schema_path = manifest.hiv_schema_path
+
+    def test_year_support(self):
+        self.assertTrue(self.index.class_has_parameter("CampaignEventByYear", "Start_Year"))
+
+
+@pytest.mark.unit
+class TestSchemaIndexStandalone(unittest.TestCase):
+
+    def test_empty_schema(self):
+        index = SchemaIndex({})
+        self.assertEqual(index.get_builtin_events("node"), [])
+        self.assertFalse(index.has_class("CampaignEvent"))
+        self.assertFalse(index.class_has_parameter("CampaignEvent", "Start_Day"))
+        self.assertEqual(index.config_parameter_names, frozenset())